@@ -1,61 +1,299 @@
-import codecs
+import gzip
+import hashlib
 import logging
 import os
 import os.path
-import shutil
+import threading
+import uuid
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
 
 import requests
-from git import Repo
+from django.conf import settings
+from git import Blob, Repo
 from git.exc import InvalidGitRepositoryError
+from git.index.typ import BaseIndexEntry, IndexEntry
+from gitdb import IStream
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 
 from regparser.notice.encoder import AmendmentEncoder
 from regparser.tree.struct import Node, NodeEncoder
 
 logger = logging.getLogger(__name__)
+# urllib3 1.26 renamed Retry's method_whitelist to allowed_methods (and 2.0
+# dropped the old name). False allows any method to be retried
+if hasattr(Retry, 'DEFAULT_ALLOWED_METHODS'):
+    RETRY_ALL_METHODS = {'allowed_methods': False}
+else:
+    RETRY_ALL_METHODS = {'method_whitelist': False}
 
 
 class AmendmentNodeEncoder(AmendmentEncoder, NodeEncoder):
     pass
 
 
+def encode_json(python_obj, compact=False):
+    """Serialize to (utf-8) JSON. By default, this is indented for
+    readability; `compact` drops the whitespace"""
+    if compact:
+        encoder = AmendmentNodeEncoder(sort_keys=True, separators=(',', ':'))
+    else:
+        encoder = AmendmentNodeEncoder(sort_keys=True, indent=4,
+                                       separators=(', ', ': '))
+    return encoder.encode(python_obj).encode('utf-8')
+
+
+def gzip_bytes(body):
+    """Compress the body. The timestamp is fixed so that the same input
+    always gives the same output"""
+    buf = BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', mtime=0) as gz:
+        gz.write(body)
+    return buf.getvalue()
+
+
+def write_atomically(path, body):
+    """Write the bytes to the path unless the file already has exactly that
+    content. Data goes to a temporary file which is then renamed, so readers
+    never see a partial file. Returns whether the file was written"""
+    if os.path.isfile(path) and os.path.getsize(path) == len(body):
+        with open(path, 'rb') as existing:
+            if existing.read() == body:
+                return False
+
+    dir_path = os.path.dirname(path)
+    if not os.path.isdir(dir_path):
+        try:
+            os.makedirs(dir_path)
+        except OSError:     # another thread created it first
+            if not os.path.isdir(dir_path):
+                raise
+    # Unlike mkstemp's (private) files, the usual permissions (i.e. subject
+    # to the umask) apply
+    tmp_path = os.path.join(dir_path, '.tmp-' + uuid.uuid4().hex)
+    handle = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(handle, 'wb') as out:
+            out.write(body)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return True
+
+
+class WriteError(Exception):
+    """One or more objects could not be written"""
+    def __init__(self, failures):
+        super(WriteError, self).__init__(
+            "{0} write(s) failed: {1}".format(
+                len(failures),
+                "; ".join("{0} ({1})".format(target, error)
+                          for target, error in failures)))
+        self.failures = failures
+
+
+class APIWriteError(WriteError):
+    """One or more objects could not be written to the API"""
+
+
+class BackgroundWriter(object):
+    """Sends queued writes from a pool of threads. Failures (i.e. the
+    exceptions in ERRORS) don't stop other writes; they're collected and
+    raised together by `flush`, which also waits for any in-flight writes.
+    Writes which must be ordered (e.g. layers after the tree they reference)
+    can wait on earlier ones via `after`; alternatively, call `flush`
+    between them"""
+    ERRORS = ()
+    ERROR_CLASS = WriteError
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self._pool = None   # created on first use
+        # Bound the number of encoded bodies waiting in memory
+        self._slots = threading.BoundedSemaphore(concurrency * 2)
+        self._pending = []
+        self._failures = []
+        self._lock = threading.Lock()
+
+    def send(self, target, body):
+        """Actually write the body"""
+        raise NotImplementedError()
+
+    def _send(self, target, body, after):
+        """Returns whether the write succeeded"""
+        try:
+            # Writes are started in order, so those we're waiting on have
+            # already been picked up by other threads
+            if not all(result.get() for result in after):
+                raise WriteError([(target, "a prerequisite write failed")])
+            self.send(target, body)
+            return True
+        except self.ERRORS + (WriteError,) as err:
+            with self._lock:
+                self._failures.append((target, err))
+            return False
+        finally:
+            self._slots.release()
+
+    def queue(self, target, body, after=()):
+        """Queue the (bytes) body to be written to the target, once the
+        writes in `after` (results of earlier calls) have succeeded. Blocks
+        if too many bodies are already waiting. Returns an AsyncResult"""
+        self._slots.acquire()
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.concurrency)
+            result = self._pool.apply_async(self._send,
+                                            (target, body, after))
+            self._pending.append(result)
+        return result
+
+    def flush(self):
+        """Wait for all queued writes, raising if any failed"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for result in pending:
+            result.get()    # re-raises anything unexpected
+        with self._lock:
+            failures, self._failures = self._failures, []
+        if failures:
+            raise self.ERROR_CLASS(failures)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+
+class FSExporter(BackgroundWriter):
+    """Writes files several at a time. Files are replaced atomically and only
+    if their contents have changed, so re-exporting after a small change
+    only touches the affected files. Output can optionally be compact (no
+    indentation) and/or gzipped (adding a .gz suffix)"""
+    ERRORS = (EnvironmentError,)
+
+    def __init__(self, concurrency=None, compact=False, compress=False):
+        if concurrency is None:
+            concurrency = settings.FS_WRITER_CONCURRENCY
+        super(FSExporter, self).__init__(concurrency)
+        self.compact = compact
+        self.compress = compress
+        self.written, self.skipped = 0, 0
+
+    def send(self, path, body):
+        if self.compress:
+            path, body = path + '.gz', gzip_bytes(body)
+        written = write_atomically(path, body)
+        with self._lock:
+            if written:
+                self.written += 1
+            else:
+                self.skipped += 1
+
+    def close(self):
+        super(FSExporter, self).close()
+        logger.info("Wrote %s files; %s were unchanged", self.written,
+                    self.skipped)
+
+
 class FSWriteContent:
-    """This writer places the contents in the file system """
+    """This writer places the contents in the file system. If an FSExporter
+    is provided, the write is queued with it"""
 
-    def __init__(self, *path_parts):
+    def __init__(self, *path_parts, **kwargs):
         self.path = os.path.join(*path_parts)
+        self.background = kwargs.get('background')
 
-    def write(self, python_obj):
-        """Write the object as json to disk"""
+    def write(self, python_obj, after=()):
+        """Write the object as json to disk. If writing in the background,
+        `after` lists writes to wait on and the AsyncResult is returned"""
         logger.debug("Writing %s", self.path)
-        dir_path = os.path.split(self.path)[0]
-        if not os.path.exists(dir_path):
-            os.makedirs(dir_path)
-
-        with open(self.path, 'w') as out:
-            text = AmendmentNodeEncoder(
-                sort_keys=True, indent=4,
-                separators=(', ', ': ')).encode(python_obj)
-            out.write(text)
+        if self.background:
+            return self.background.queue(
+                self.path, encode_json(python_obj, self.background.compact),
+                after)
+        else:
+            write_atomically(self.path, encode_json(python_obj))
+
+
+class APIUploader(BackgroundWriter):
+    """Sends POSTs to the API through a pooled session, several at a time.
+    Connection errors and 5XX responses are retried with backoff (writes to
+    the API are idempotent). Bodies can optionally be gzipped"""
+    ERRORS = (requests.RequestException,)
+    ERROR_CLASS = APIWriteError
+
+    def __init__(self, concurrency=None, compress=None):
+        if concurrency is None:
+            concurrency = settings.API_WRITER_CONCURRENCY
+        if compress is None:
+            compress = settings.API_WRITER_GZIP
+        super(APIUploader, self).__init__(concurrency)
+        self.compress = compress
+        self.session = requests.Session()
+        retry = Retry(total=settings.HTTP_RETRIES,
+                      backoff_factor=settings.HTTP_BACKOFF,
+                      status_forcelist=(500, 502, 503, 504),
+                      raise_on_status=False,
+                      **RETRY_ALL_METHODS)      # retry POSTs, too
+        adapter = HTTPAdapter(pool_maxsize=concurrency, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def send(self, url, body):
+        headers = {'content-type': 'application/json'}
+        if self.compress:
+            body = gzip_bytes(body)
+            headers['content-encoding'] = 'gzip'
+        response = self.session.post(url, data=body, headers=headers)
+        response.raise_for_status()
+
+    def close(self):
+        try:
+            super(APIUploader, self).close()
+        finally:
+            self.session.close()
 
 
 class APIWriteContent:
-    """This writer writes the contents to the specified API"""
-    def __init__(self, *path_parts):
+    """This writer writes the contents to the specified API. If an
+    APIUploader is provided, the write is queued with it; otherwise, the
+    object's sent immediately"""
+    def __init__(self, *path_parts, **kwargs):
         self.path = "/".join(path_parts)
+        self.background = kwargs.get('background')
 
-    def write(self, python_obj):
-        """Write the object (as json) to the API"""
+    def write(self, python_obj, after=()):
+        """Write the object (as json) to the API. If writing in the
+        background, `after` lists writes to wait on and the AsyncResult is
+        returned"""
         logger.debug("Writing %s", self.path)
-        requests.post(
-            self.path,
-            data=AmendmentNodeEncoder().encode(python_obj),
-            headers={'content-type': 'application/json'})
+        body = AmendmentNodeEncoder().encode(python_obj).encode('utf-8')
+        if self.background:
+            return self.background.queue(self.path, body, after)
+        else:
+            response = requests.post(
+                self.path, data=body,
+                headers={'content-type': 'application/json'})
+            response.raise_for_status()
 
 
 class GitWriteContent:
-    """This writer places the content in a git repo on the file system"""
-    def __init__(self, *path_parts):
+    """This writer places the content in a git repo on the file system. Only
+    files which differ from those in the repo's index are written, and
+    commits are built from blobs directly (rather than by scanning the
+    working tree). If `working_tree` is False, the working tree isn't
+    touched at all"""
+    FILE_MODE = 0o100644
+
+    def __init__(self, *path_parts, **kwargs):
         self.path = os.path.join(*path_parts)
+        self.working_tree = kwargs.get('working_tree', True)
 
     @staticmethod
     def folder_name(node):
@@ -68,32 +306,61 @@ class GitWriteContent:
         else:
             return node.label[-1]
 
-    def write_tree(self, root_path, node):
-        """Given a file system path and a node, write the node's contents and
-        recursively write its children to the provided location."""
-        if not os.path.exists(root_path):
-            os.makedirs(root_path)
-
+    @classmethod
+    def tree_files(cls, node, prefix=''):
+        """Generate (path, contents) pairs for the node and its descendants.
+        Each node's contents go in an index.md file; its children are in
+        sub-directories. Paths are relative to the root and '/'-separated,
+        as in a git index"""
         node_text = u"---\n"
         if node.title:
             node_text += 'title: "' + node.title + '"\n'
         node_text += 'node_type: ' + node.node_type + '\n'
-        child_folders = [self.folder_name(child) for child in node.children]
+        child_folders = [cls.folder_name(child) for child in node.children]
 
         node_text += 'children: ['
         node_text += ', '.join('"' + f + '"' for f in child_folders)
         node_text += ']\n'
 
         node_text += '---\n' + node.text
-        with codecs.open(root_path + os.sep + 'index.md', 'w', 'utf-8') as f:
-            f.write(node_text)
+        yield prefix + 'index.md', node_text.encode('utf-8')
+
+        for folder, child in zip(child_folders, node.children):
+            for pair in cls.tree_files(child, prefix + folder + '/'):
+                yield pair
 
-        for idx, child in enumerate(node.children):
-            child_path = root_path + os.sep + child_folders[idx]
-            shutil.rmtree(child_path, ignore_errors=True)
-            self.write_tree(child_path, child)
+    @staticmethod
+    def blob_sha(contents):
+        """The (binary) sha git would give a blob with these contents"""
+        header = '{0} {1}\0'.format(Blob.type, len(contents)).encode('ascii')
+        return hashlib.sha1(header + contents).digest()
 
-    def write(self, python_object):
+    @staticmethod
+    def _store_blob(repo, contents):
+        """Add the contents to the object database, returning its sha"""
+        istream = repo.odb.store(
+            IStream(Blob.type, len(contents), BytesIO(contents)))
+        return istream.binsha
+
+    def _update_working_tree(self, dir_path, changed, deleted):
+        for path, contents in changed.items():
+            write_atomically(os.path.join(dir_path, *path.split('/')),
+                             contents)
+        for path in deleted:
+            full_path = os.path.join(dir_path, *path.split('/'))
+            if os.path.exists(full_path):
+                os.remove(full_path)
+            # Prune any directories left empty
+            parent = os.path.dirname(full_path)
+            # The directory may never have been checked out (e.g. if
+            # previously written without a working tree)
+            while parent != dir_path and os.path.isdir(parent) and \
+                    not os.listdir(parent):
+                os.rmdir(parent)
+                parent = os.path.dirname(parent)
+
+    def write(self, python_object, after=()):
+        """Git writes happen immediately, so `after` is ignored"""
         logger.debug("Writing %s", self.path)
         if "regulation" in self.path:
             dir_path, version_id = os.path.split(self.path)
@@ -107,55 +374,90 @@ class GitWriteContent:
                 repo = Repo.init(dir_path)
                 repo.index.commit("Initial commit for " + cfr_part)
 
-            # Write all files (and delete any old ones)
-            self.write_tree(dir_path, python_object)
-            # Add and new files to git
-            repo.index.add(repo.untracked_files)
-            # Delete and modify files as needed
-            deleted, modified = [], []
-            for diff in repo.index.diff(None):
-                if diff.deleted_file:
-                    deleted.append(diff.a_blob.path)
-                else:
-                    modified.append(diff.a_blob.path)
-            if modified:
-                repo.index.add(modified)
-            if deleted:
-                repo.index.remove(deleted)
+            index = repo.index
+            existing = {path: entry.binsha
+                        for (path, stage), entry in index.entries.items()
+                        if stage == 0}
+            changed, seen = {}, set()
+            for path, contents in self.tree_files(python_object):
+                seen.add(path)
+                # Unchanged files needn't be compressed and stored again
+                binsha = self.blob_sha(contents)
+                if existing.get(path) != binsha:
+                    if not repo.odb.has_object(binsha):
+                        self._store_blob(repo, contents)
+                    changed[path] = contents
+                    index.entries[(path, 0)] = IndexEntry.from_base(
+                        BaseIndexEntry((self.FILE_MODE, binsha, 0, path)))
+            deleted = set(existing) - seen
+            for path in deleted:
+                del index.entries[(path, 0)]
+            logger.debug("%s files changed, %s deleted", len(changed),
+                         len(deleted))
+
+            if self.working_tree:
+                self._update_working_tree(dir_path, changed, deleted)
+            index.write()
             # Commit with the notice id as the commit message
-            repo.index.commit(version_id)
+            index.commit(version_id)
 
 
 class Client:
-    """A Client for writing regulation(s) and meta data."""
+    """A Client for writing regulation(s) and meta data. Writes to an API or
+    to the file system happen in the background; see `flush`. `compact` and
+    `compress` (gzip) affect the encoding of files; `compress` also applies
+    to API requests (defaulting to settings.API_WRITER_GZIP). Setting
+    `working_tree` to False builds git commits without checking files out"""
 
-    def __init__(self, base):
+    def __init__(self, base, compact=False, compress=None, working_tree=True):
         if base.startswith('file://'):
             base = base[len('file://'):]
 
+        self.background = None
+        self.writer_kwargs = {}
         if base.startswith('http://') or base.startswith('https://'):
             self.writer_class = APIWriteContent
             self.base = base    # keep the protocol, etc.
+            self.background = APIUploader(compress=compress or None)
         elif base.startswith('git://'):
             self.writer_class = GitWriteContent
             self.base = base[len('git://'):]
+            self.writer_kwargs['working_tree'] = working_tree
         else:
             self.writer_class = FSWriteContent
             self.base = base
+            self.background = FSExporter(compact=compact,
+                                         compress=bool(compress))
+        if self.background:
+            self.writer_kwargs['background'] = self.background
+
+    def _writer(self, *path_parts):
+        return self.writer_class(self.base, *path_parts, **self.writer_kwargs)
 
     def regulation(self, label, doc_number):
-        return self.writer_class(self.base, "regulation", label, doc_number)
+        return self._writer("regulation", label, doc_number)
 
     def layer(self, layer_name, doc_type, doc_id):
-        return self.writer_class(self.base, "layer", layer_name, doc_type,
-                                 doc_id)
+        return self._writer("layer", layer_name, doc_type, doc_id)
 
     def notice(self, doc_number):
-        return self.writer_class(self.base, "notice", doc_number)
+        return self._writer("notice", doc_number)
 
     def diff(self, label, old_version, new_version):
-        return self.writer_class(self.base, "diff", label, old_version,
-                                 new_version)
+        return self._writer("diff", label, old_version, new_version)
 
     def preamble(self, doc_number):
-        return self.writer_class(self.base, "preamble", doc_number)
+        return self._writer("preamble", doc_number)
+
+    def flush(self):
+        """Wait for all writes so far to complete (raising if any failed).
+        Needed between writes which must be ordered"""
+        if self.background:
+            self.background.flush()
+
+    def close(self):
+        """Flush and release any resources"""
+        if self.background:
+            self.background.close()
+            self.background = None
+            self.writer_kwargs.pop('background')
@@ -4,14 +4,16 @@ import click
 from django.conf import settings
 
 from regparser.index.http_cache import http_client
-from regparser.web.index.models import DependencyNode
+from regparser.web.index.models import (AnnualVolume, CheckedUrl,
+                                        DependencyNode, LayerCacheElement)
 
 
 @click.command()
 @click.argument('path', nargs=-1)
 def clear(path):
     """Delete intermediate and cache data. Only PATH arguments are cleared
-    unless no arguments are present, then everything is wiped.
+    unless no arguments are present, then everything (including cached layer
+    elements, annual edition volumes, and URL checks) is wiped.
 
     \b
     $ eregs clear                   # clears everything
@@ -27,5 +29,8 @@ def clear(path):
             DependencyNode.objects.filter(pk__startswith=path).delete()
     else:
         DependencyNode.objects.all().delete()
+        LayerCacheElement.objects.all().delete()
+        AnnualVolume.objects.all().delete()
+        CheckedUrl.objects.all().delete()
 
     http_client().cache.clear()
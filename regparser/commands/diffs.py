@@ -8,17 +8,17 @@ from regparser.index import dependency, entry
 logger = logging.getLogger(__name__)
 
 
-@click.command()
-@click.argument('cfr_title', type=int)
-@click.argument('cfr_part', type=int)
-def diffs(cfr_title, cfr_part):
-    """Construct diffs between known trees."""
-    logger.info("Build diffs - %s Part %s", cfr_title, cfr_part)
+def tree_ids(cfr_title, cfr_part):
+    """Version ids of the trees known for this regulation"""
+    return [tree_entry.path[-1] for tree_entry
+            in entry.FrozenTree(cfr_title, cfr_part).sub_entries()]
+
+
+def process_diffs(cfr_title, cfr_part, pairs):
+    """Calculate and write the diffs between each of the (lhs_id, rhs_id)
+    pairs of trees which are stale"""
     tree_dir = entry.FrozenTree(cfr_title, cfr_part)
     diff_dir = entry.Diff(cfr_title, cfr_part)
-    pairs = [(l.path[-1], r.path[-1])
-             for l in tree_dir.sub_entries()
-             for r in tree_dir.sub_entries()]
     deps = dependency.Graph()
     for lhs_id, rhs_id in pairs:
         deps.add(diff_dir / lhs_id / rhs_id, tree_dir / lhs_id)
@@ -35,3 +35,15 @@ def diffs(cfr_title, cfr_part):
                 trees[rhs_id] = (tree_dir / rhs_id).read()
 
             path.write(dict(changes_between(trees[lhs_id], trees[rhs_id])))
+
+
+@click.command()
+@click.argument('cfr_title', type=int)
+@click.argument('cfr_part', type=int)
+def diffs(cfr_title, cfr_part):
+    """Construct diffs between known trees."""
+    logger.info("Build diffs - %s Part %s", cfr_title, cfr_part)
+    version_ids = tree_ids(cfr_title, cfr_part)
+    process_diffs(cfr_title, cfr_part, [(lhs_id, rhs_id)
+                                        for lhs_id in version_ids
+                                        for rhs_id in version_ids])
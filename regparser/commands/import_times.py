@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+import click
+
+from regparser import grammar
+
+_TIMER = ("import time; start = time.time(); import {0}; "
+          "print(time.time() - start)")
+
+
+def import_time(module_name):
+    """Seconds needed to import this module in a fresh interpreter"""
+    output = subprocess.check_output(
+        [sys.executable, '-c', _TIMER.format(module_name)])
+    return float(output.decode('utf-8').strip().splitlines()[-1])
+
+
+@click.command()
+@click.argument('modules', nargs=-1)
+@click.option('--max-seconds', type=float,
+              help="Fail if any import takes longer than this")
+def import_times(modules, max_seconds):
+    """Time importing modules (by default, the grammars), each in a fresh
+    interpreter. Use --max-seconds to guard against regressions"""
+    too_slow = []
+    for module_name in modules or grammar.MODULES:
+        seconds = import_time(module_name)
+        click.echo('{0:.3f}s {1}'.format(seconds, module_name))
+        if max_seconds is not None and seconds > max_seconds:
+            too_slow.append(module_name)
+    if too_slow:
+        raise click.ClickException(
+            'Slower than {0}s: {1}'.format(max_seconds, ', '.join(too_slow)))
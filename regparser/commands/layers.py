@@ -1,10 +1,13 @@
 import logging
 
 import click
-from stevedore.extension import ExtensionManager
 
+from regparser import plugins
 from regparser.commands import utils
 from regparser.index import dependency, entry
+from regparser.index.layer_cache import LayerCache
+from regparser.layer import engine
+from regparser.layer.layer import Layer
 
 logger = logging.getLogger(__name__)
 
@@ -17,14 +20,14 @@ def _init_classes():
         namespace = 'eregs_ns.parser.layer.{0}'.format(doc_type)
         classes[doc_type] = {
             extension.name: extension.plugin
-            for extension in ExtensionManager(namespace)
+            for extension in plugins.extensions(namespace)
         }
 
     # For backwards compatibility. @todo - remove in later release
     old_namespace = 'eregs_ns.parser.layers'
     classes['cfr'].update({
         extension.plugin.shorthand: extension.plugin
-        for extension in ExtensionManager(old_namespace)
+        for extension in plugins.extensions(old_namespace)
     })
     return classes
 
@@ -53,16 +56,60 @@ def stale_layers(doc_entry, doc_type):
     return stale
 
 
-def process_cfr_layers(stale_names, cfr_title, version_entry):
+def seed_from_parent(cache, stale_names, cfr_title, parent_entry):
+    """Seed the cache with the layers already built for the parent version.
+    Nodes which haven't changed (and whose context, e.g. the set of known
+    citations, hasn't changed) will reuse the parent's layer elements rather
+    than being reprocessed. Parent layers which are stale are ignored"""
+    parent_tree_entry = entry.Tree(*parent_entry.path)
+    if not parent_tree_entry.exists():
+        return
+    parent_stale = set(stale_layers(parent_tree_entry, 'cfr'))
+    cacheable = [
+        layer_name for layer_name in stale_names
+        if layer_name not in parent_stale and
+        LAYER_CLASSES['cfr'][layer_name].cache_key is not Layer.cache_key]
+    if not cacheable:
+        return
+
+    parent_tree = parent_tree_entry.read()
+    parent_version = parent_entry.read()
+    parent_layer_dir = entry.Layer.cfr(*parent_entry.path)
+    for layer_name in cacheable:
+        parent_layer = LAYER_CLASSES['cfr'][layer_name](
+            parent_tree, cfr_title=int(cfr_title), version=parent_version)
+        cache.seed(parent_layer, (parent_layer_dir / layer_name).read())
+
+
+def process_cfr_layers(stale_names, cfr_title, version_entry,
+                       parent_entry=None):
     """Build all of the stale layers for this version, writing them into the
-    index. Assumes all dependencies have already been checked"""
+    index. Assumes all dependencies have already been checked. If the
+    `parent_entry` (a Version) is provided, unchanged nodes will reuse its
+    layers"""
     tree = entry.Tree(*version_entry.path).read()
     version = version_entry.read()
     layer_dir = entry.Layer.cfr(*version_entry.path)
-    for layer_name in stale_names:
-        layer_json = LAYER_CLASSES['cfr'][layer_name](
-            tree, cfr_title=int(cfr_title), version=version).build()
+    cache = LayerCache()
+    if parent_entry is not None:
+        seed_from_parent(cache, stale_names, cfr_title, parent_entry)
+    layers = [LAYER_CLASSES['cfr'][layer_name](
+        tree, cfr_title=int(cfr_title), version=version)
+        for layer_name in stale_names]
+    results = engine.build_layers(layers, cache)
+    for layer_name, layer_json in zip(stale_names, results):
         (layer_dir / layer_name).write(layer_json)
+    cache.save()
+
+
+def build_cfr_layers(tree_entry, parent_entry=None):
+    """Build whichever of the layers for this tree are stale. See
+    process_cfr_layers"""
+    tree_title, tree_part, version_id = tree_entry.path
+    stale = stale_layers(tree_entry, 'cfr')
+    if stale:
+        version_entry = entry.Version(tree_title, tree_part, version_id)
+        process_cfr_layers(stale, tree_title, version_entry, parent_entry)
 
 
 def process_preamble_layers(stale_names, preamble_entry):
@@ -70,25 +117,49 @@ def process_preamble_layers(stale_names, preamble_entry):
     index. Assumes all dependencies have already been checked"""
     tree = preamble_entry.read()
     layer_dir = entry.Layer.preamble(*preamble_entry.path)
-    for layer_name in stale_names:
-        layer_json = LAYER_CLASSES['preamble'][layer_name](tree).build()
+    cache = LayerCache()
+    layers = [LAYER_CLASSES['preamble'][layer_name](tree)
+              for layer_name in stale_names]
+    results = engine.build_layers(layers, cache)
+    for layer_name, layer_json in zip(stale_names, results):
         (layer_dir / layer_name).write(layer_json)
+    cache.save()
 
 
 @click.command()
 @click.option('--cfr_title', type=int, help="Limit to one CFR title")
 @click.option('--cfr_part', type=int, help="Limit to one CFR part")
+@click.option('--incremental', is_flag=True,
+              help="Reuse the parent version's layers for unchanged nodes")
 # @todo - allow layers to be passed as a parameter
-def layers(cfr_title, cfr_part):
+def layers(cfr_title, cfr_part, incremental):
     """Build all layers for all known versions."""
     logger.info("Build layers - %s CFR %s", cfr_title, cfr_part)
 
-    for tree_entry in utils.relevant_paths(entry.Tree(), cfr_title, cfr_part):
+    tree_entries = list(
+        utils.relevant_paths(entry.Tree(), cfr_title, cfr_part))
+    parents = {}
+    if incremental:
+        for tree_title, tree_part in {e.path[:2] for e in tree_entries}:
+            parents[(tree_title, tree_part)] = utils.parent_versions(
+                tree_title, tree_part)
+
+        def version_order(tree_entry):
+            tree_title, tree_part, version_id = tree_entry.path
+            in_order = list(parents[(tree_title, tree_part)])
+            position = (in_order.index(version_id) if version_id in in_order
+                        else len(in_order))
+            return tree_title, tree_part, position
+        # Parents must be built first for their layers to be reused
+        tree_entries.sort(key=version_order)
+
+    for tree_entry in tree_entries:
         tree_title, tree_part, version_id = tree_entry.path
-        version_entry = entry.Version(tree_title, tree_part, version_id)
-        stale = stale_layers(tree_entry, 'cfr')
-        if stale:
-            process_cfr_layers(stale, tree_title, version_entry)
+        parent_id = parents.get((tree_title, tree_part), {}).get(version_id)
+        parent_entry = None
+        if parent_id:
+            parent_entry = entry.Version(tree_title, tree_part, parent_id)
+        build_cfr_layers(tree_entry, parent_entry)
 
     if cfr_title is None and cfr_part is None:
         for preamble_entry in entry.Preamble().sub_entries():
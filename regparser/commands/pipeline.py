@@ -1,12 +1,105 @@
+from collections import OrderedDict
+from functools import partial
+
 import click
+from django.conf import settings
 
-from regparser.commands.annual_editions import annual_editions
+from regparser.commands import annual_editions, diffs, layers, utils
 from regparser.commands.annual_version import annual_version
-from regparser.commands.diffs import diffs
 from regparser.commands.fill_with_rules import fill_with_rules
-from regparser.commands.layers import layers
+from regparser.commands.preprocess_notices import preprocess_notices
+from regparser.commands.scheduler import Scheduler, Task
 from regparser.commands.versions import versions
 from regparser.commands.write_to import write_to
+from regparser.index import entry
+
+
+def layer_tasks(cfr_title, cfr_part, prefix, skip=()):
+    """One task per tree (other than those with version ids in `skip`),
+    building its layers"""
+    return [Task('{0}/{1}'.format(prefix, tree_entry.path[-1]),
+                 partial(layers.build_cfr_layers, tree_entry),
+                 ())
+            for tree_entry in utils.relevant_paths(entry.Tree(), cfr_title,
+                                                   cfr_part)
+            if tree_entry.path[-1] not in skip]
+
+
+def diff_tasks(cfr_title, cfr_part, prefix):
+    """One task per tree, building the diffs from it to every other tree"""
+    version_ids = diffs.tree_ids(cfr_title, cfr_part)
+    return [Task('{0}/{1}'.format(prefix, lhs_id),
+                 partial(diffs.process_diffs, cfr_title, cfr_part,
+                         [(lhs_id, rhs_id) for rhs_id in version_ids]),
+                 ())
+            for lhs_id in version_ids]
+
+
+def tree_tasks(ctx, cfr_title, cfr_part, prefix):
+    """One task per annual edition which needs parsing, each followed by a
+    task building the layers of its tree. Trees derived from rules are then
+    filled in (in sequence, as each builds atop its predecessor), after
+    which the remaining layers and all of the diffs (which compare every
+    pair of trees) are built"""
+    tree_dir = entry.Tree(cfr_title, cfr_part)
+    tasks, annual_names, annual_ids = [], [], set()
+    for last_version in annual_editions.last_versions(cfr_title, cfr_part):
+        name = '{0}annual_editions/{1}'.format(prefix, last_version.year)
+        tasks.append(Task(name,
+                          partial(annual_editions.process_if_needed,
+                                  cfr_title, cfr_part, [last_version]),
+                          ()))
+        tasks.append(Task('{0}layers/{1}'.format(prefix,
+                                                 last_version.version_id),
+                          partial(layers.build_cfr_layers,
+                                  tree_dir / last_version.version_id),
+                          [name]))
+        annual_names.append(name)
+        annual_ids.add(last_version.version_id)
+
+    fill = prefix + 'fill_with_rules'
+    tasks.append(Task(fill, partial(ctx.invoke, fill_with_rules,
+                                    cfr_title=cfr_title, cfr_part=cfr_part),
+                      annual_names))
+    tasks.append(Task(prefix + 'layers',
+                      partial(layer_tasks, cfr_title, cfr_part,
+                              prefix + 'layers', annual_ids),
+                      [fill]))
+    tasks.append(Task(prefix + 'diffs',
+                      partial(diff_tasks, cfr_title, cfr_part,
+                              prefix + 'diffs'),
+                      [fill]))
+    return tasks
+
+
+def add_part_tasks(scheduler, ctx, cfr_title, cfr_part, output, only_latest):
+    """Add the stages of the pipeline for a single CFR part. Trees, layers
+    and diffs expand into a task per year or version once those are known"""
+    params = {'cfr_title': cfr_title, 'cfr_part': cfr_part}
+    prefix = '{0} CFR {1}: '.format(cfr_title, cfr_part)
+
+    def add(stage, fn, deps=()):
+        scheduler.add(prefix + stage, fn, [prefix + dep for dep in deps])
+
+    def expand(stage, task_fn):
+        return partial(task_fn, cfr_title, cfr_part, prefix + stage)
+
+    if only_latest:
+        add('annual_version', partial(ctx.invoke, annual_version, **params))
+        add('layers', expand('layers', layer_tasks), ['annual_version'])
+        add('diffs', expand('diffs', diff_tasks), ['annual_version'])
+        outputs = ['layers', 'diffs']
+    else:
+        # Stages may run in threads, which mustn't be forked
+        add('preprocess_notices',
+            partial(ctx.invoke, preprocess_notices, processes=1, **params))
+        add('versions', partial(ctx.invoke, versions, **params),
+            ['preprocess_notices'])
+        add('trees', partial(tree_tasks, ctx, cfr_title, cfr_part, prefix),
+            ['versions'])
+        outputs = ['trees']
+    add('write_to', partial(ctx.invoke, write_to, output=output, **params),
+        outputs)
 
 
 @click.command()
@@ -15,11 +108,22 @@ from regparser.commands.write_to import write_to
 @click.argument('output', envvar='EREGS_OUTPUT_DIR')
 @click.option('--only-latest', is_flag=True, default=False,
               help="Don't derive history; use the latest annual edition")
+@click.option('--part', 'other_parts', type=int, multiple=True,
+              help="Another part of the same title to process alongside "
+                   "CFR_PART. May be repeated")
+@click.option('--workers', type=int,
+              help="Number of tasks to run at a time. Defaults to the "
+                   "PIPELINE_WORKERS setting")
 @click.pass_context
-def pipeline(ctx, cfr_title, cfr_part, output, only_latest):
+def pipeline(ctx, cfr_title, cfr_part, output, only_latest, other_parts,
+             workers):
     """Full regulation parsing pipeline. Consists of retrieving and parsing
     annual edition, attempting to parse final rules in between, deriving
-    layers and diffs, and writing them to disk or an API
+    layers and diffs, and writing them to disk or an API. Independent steps
+    (e.g. parsing each annual edition, building the layers and diffs for
+    each version, or processing different parts) can run concurrently.
+    Work already present in the index is skipped, so re-running resumes an
+    interrupted pipeline
 
     \b
     OUTPUT can be a
@@ -27,13 +131,7 @@ def pipeline(ctx, cfr_title, cfr_part, output, only_latest):
     * uri (the base url of an instance of regulations-core)
     * a directory prefixed with "git://". This will export to a git
       repository"""
-    params = {'cfr_title': cfr_title, 'cfr_part': cfr_part}
-    if only_latest:
-        ctx.invoke(annual_version, **params)
-    else:
-        ctx.invoke(versions, **params)
-        ctx.invoke(annual_editions, **params)
-        ctx.invoke(fill_with_rules, **params)
-    ctx.invoke(layers, **params)
-    ctx.invoke(diffs, **params)
-    ctx.invoke(write_to, output=output, **params)
+    scheduler = Scheduler()
+    for part in OrderedDict.fromkeys((cfr_part,) + other_parts):
+        add_part_tasks(scheduler, ctx, cfr_title, part, output, only_latest)
+    scheduler.run(workers or settings.PIPELINE_WORKERS)
@@ -6,6 +6,21 @@ from regparser.index import entry
 from regparser.notice.build import split_doc_num
 from regparser.notice.xml import TitlePartsRef, notice_xmls_for_url
 
+META_FIELDS = [
+    "agencies",
+    "docket_ids",
+    "effective_on",
+    "cfr_references",
+    "comments_close_on",
+    "end_page",
+    "full_text_xml_url",
+    "html_url",
+    "publication_date",
+    "regulation_id_numbers",
+    "start_page",
+    "volume"
+]
+
 
 def convert_cfr_refs(refs=None):
     """
@@ -36,29 +51,10 @@ def convert_cfr_refs(refs=None):
     return sorted(refs, key=lambda x: int(x.title))
 
 
-@click.command()
-@click.argument('document_number')
-def preprocess_notice(document_number):
-    """Preprocess notice XML. Either fetch from the Federal Register or read a
-    notice from disk. Apply some common transformations to it and output the
-    resulting file(s). There may be more than one as documents might be split
-    if they have multiple effective dates."""
-    meta = federalregister.meta_data(
-        document_number, [
-            "agencies",
-            "docket_ids",
-            "effective_on",
-            "cfr_references",
-            "comments_close_on",
-            "end_page",
-            "full_text_xml_url",
-            "html_url",
-            "publication_date",
-            "regulation_id_numbers",
-            "start_page",
-            "volume"
-        ])
-    notice_xmls = list(notice_xmls_for_url(meta['full_text_xml_url']))
+def annotate(document_number, meta, notice_xmls):
+    """Copy the Federal Register's metadata into each of the (preprocessed)
+    notice XMLs, naming them and deriving any remaining fields. Returns the
+    modified NoticeXMLs"""
     for notice_xml in notice_xmls:
         notice_xml.published = meta['publication_date']
         notice_xml.fr_volume = meta['volume']
@@ -89,8 +85,20 @@ def preprocess_notice(document_number):
 
         notice_xml.version_id = file_name
         notice_xml.derive_where_needed()
+    return notice_xmls
 
-        notice_entry = entry.Notice(file_name)
+
+@click.command()
+@click.argument('document_number')
+def preprocess_notice(document_number):
+    """Preprocess notice XML. Either fetch from the Federal Register or read a
+    notice from disk. Apply some common transformations to it and output the
+    resulting file(s). There may be more than one as documents might be split
+    if they have multiple effective dates."""
+    meta = federalregister.meta_data(document_number, META_FIELDS)
+    notice_xmls = list(notice_xmls_for_url(meta['full_text_xml_url']))
+    for notice_xml in annotate(document_number, meta, notice_xmls):
+        notice_entry = entry.Notice(notice_xml.version_id)
         notice_entry.write(notice_xml)
 
 
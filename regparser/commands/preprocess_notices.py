@@ -0,0 +1,121 @@
+import logging
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+
+import click
+from django.db import connections, transaction
+from lxml import etree
+
+from regparser import federalregister
+from regparser.commands.preprocess_notice import META_FIELDS, annotate
+from regparser.commands.versions import fetch_version_ids
+from regparser.index import entry
+from regparser.index.http_cache import host_limit
+from regparser.notice.xml import NoticeXML, notice_xml_sources
+
+logger = logging.getLogger(__name__)
+MAX_DOWNLOADS = 8
+
+
+def missing_document_numbers(cfr_title, cfr_part):
+    """Document numbers of final rules for this part which haven't been
+    preprocessed. Notices which are split locally are only reported if none
+    of their pieces are present"""
+    notice_dir = entry.Notice()
+    return [version_id
+            for version_id in fetch_version_ids(cfr_title, cfr_part,
+                                                notice_dir)
+            if not (notice_dir / version_id).exists()]
+
+
+def download(document_number):
+    """Fetch the metadata and raw XML(s) for a single document. Returns a
+    (metadata, [(contents, source)]) pair"""
+    with host_limit(federalregister.API_BASE):
+        meta = federalregister.meta_data(document_number, META_FIELDS)
+    xml_url = meta['full_text_xml_url']
+    with host_limit(xml_url):
+        sources = notice_xml_sources(xml_url)
+    return meta, sources
+
+
+def preprocess_xml(source_pair):
+    """Run the XML preprocessors over raw notice XML. Module-level (and
+    dealing only in bytes) so that it can be sent to worker processes"""
+    contents, source = source_pair
+    notice_xml = NoticeXML(contents, source).preprocess()
+    return etree.tostring(notice_xml.xml, encoding='UTF-8')
+
+
+def preprocess_all(source_pairs, processes):
+    """Preprocess each of the (contents, source) pairs, in order, using a
+    pool of worker processes if more than one is requested"""
+    if processes <= 1 or len(source_pairs) <= 1:
+        return [preprocess_xml(pair) for pair in source_pairs]
+    # Forked workers mustn't share the parent's database connections. Note
+    # that forking while other threads are running (e.g. when run by a
+    # concurrent pipeline) risks deadlocks; use a single process there
+    connections.close_all()
+    pool = Pool(min(processes, len(source_pairs)))
+    try:
+        return pool.map(preprocess_xml, source_pairs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def annotate_xml(args):
+    """Annotate the preprocessed XML(s) of a single document. lxml trees
+    shouldn't be modified outside of the thread which parsed them, so the
+    XML is parsed here and serialized before being handed back. Returns
+    (version_id, contents) pairs"""
+    document_number, meta, pairs = args
+    notice_xmls = [NoticeXML(contents, source) for contents, source in pairs]
+    return [(notice_xml.version_id,
+             etree.tostring(notice_xml.xml, encoding='UTF-8'))
+            for notice_xml in annotate(document_number, meta, notice_xmls)]
+
+
+@click.command()
+@click.argument('cfr_title', type=int)
+@click.argument('cfr_part', type=int)
+@click.option('--processes', type=int, default=cpu_count(),
+              help="Number of processes to run the XML preprocessors in")
+def preprocess_notices(cfr_title, cfr_part, processes):
+    """Preprocess all of the final rules for a regulation which haven't been
+    preprocessed already. Equivalent to running preprocess_notice for each,
+    but downloads happen concurrently, preprocessors run in a pool of
+    processes, and all of the notices are written in a single transaction"""
+    cfr_title, cfr_part = str(cfr_title), str(cfr_part)
+    doc_numbers = missing_document_numbers(cfr_title, cfr_part)
+    if not doc_numbers:
+        return
+    logger.info("Preprocessing %s notices", len(doc_numbers))
+
+    pool = ThreadPool(min(MAX_DOWNLOADS, len(doc_numbers)))
+    try:
+        downloads = pool.map(download, doc_numbers)
+    finally:
+        pool.close()
+        pool.join()
+
+    source_pairs = [pair for _, sources in downloads for pair in sources]
+    preprocessed = iter(preprocess_all(source_pairs, processes))
+    to_annotate = []
+    for doc_number, (meta, sources) in zip(doc_numbers, downloads):
+        pairs = [(next(preprocessed), source) for _, source in sources]
+        to_annotate.append((doc_number, meta, pairs))
+
+    # Deriving fields may involve requests to regulations.gov
+    pool = ThreadPool(min(MAX_DOWNLOADS, len(to_annotate)))
+    try:
+        annotated = pool.map(annotate_xml, to_annotate)
+    finally:
+        pool.close()
+        pool.join()
+
+    with transaction.atomic():
+        for version_id, contents in (pair for pairs in annotated
+                                     for pair in pairs):
+            notice_entry = entry.Notice(version_id)
+            notice_entry.write(NoticeXML(contents, str(notice_entry)))
@@ -1,11 +1,15 @@
 import logging
+import os
 import pkgutil
 from collections import namedtuple
 from copy import deepcopy
 from importlib import import_module
+from multiprocessing.pool import ThreadPool
 
 import click
 import pyparsing
+from django.conf import settings
+from django.db import connections
 
 from regparser import commands
 from regparser.commands.dependency_resolver import DependencyResolver
@@ -16,30 +20,43 @@ logger = logging.getLogger(__name__)
 SubCommand = namedtuple('SubCommand', ['name', 'fn'])
 
 
+def module_names():
+    """Names of the modules within regparser.commands, without importing
+    them"""
+    return [name for _, name, _ in pkgutil.iter_modules(commands.__path__)]
+
+
+def load_sub_command(command_name):
+    """Import only the module which would contain this sub-command, returning
+    the command (or None)"""
+    if command_name in module_names():
+        module = import_module('regparser.commands.{0}'.format(command_name))
+        return getattr(module, command_name, None)
+
+
 def sub_commands():
     """Walk through the regparser.commands module looking for the presence of
     sub-commands"""
     sub_cmds = []
-    for _, command_name, _ in pkgutil.iter_modules(commands.__path__):
+    for command_name in module_names():
         # Note - this import will also discover DependencyResolvers
-        module = import_module('regparser.commands.{0}'.format(command_name))
-        if hasattr(module, command_name):
-            sub_cmds.append(
-                SubCommand(command_name, getattr(module, command_name)))
+        command = load_sub_command(command_name)
+        if command is not None:
+            sub_cmds.append(SubCommand(command_name, command))
     return sub_cmds
 
 
 class RetryingCommand(click.MultiCommand):
     """Executes sub commands. If they fail due to a missing dependency,
-    attempt to resolve then retry."""
+    attempt to resolve then retry. Each sub-command's module is only imported
+    when that command is needed, as importing them all (with their grammars,
+    layers, etc.) is slow"""
 
     def list_commands(self, ctx):
         return [c.name for c in sub_commands()]
 
     def get_command(self, ctx, name):
-        for command in sub_commands():
-            if command.name == name:
-                return command.fn
+        return load_sub_command(name)
 
     def invoke(self, ctx):
         run_or_resolve(
@@ -47,24 +64,78 @@ class RetryingCommand(click.MultiCommand):
             lambda: super(RetryingCommand, self).invoke(deepcopy(ctx)))
 
 
+def resolver_for(dependency_path):
+    """The single DependencyResolver which can produce this dependency, or
+    None if there isn't exactly one"""
+    sub_commands()      # hack - creates DependencyResolver subclasses
+    resolvers = [resolver(dependency_path)
+                 for resolver in DependencyResolver.__subclasses__()]
+    resolvers = [r for r in resolvers if r.has_resolution()]
+    if len(resolvers) == 1:
+        return resolvers[0]
+
+
+def plan_resolutions(missing):
+    """A command failed due to a missing dependency. Rather than resolving
+    only that one, look through the dependency graph for every input which
+    the failing output's siblings (entries in the same directory, i.e.
+    those the command was likely building alongside it) are also missing.
+    Returns resolvers for those which can be produced, starting with the
+    dependency which caused the failure; returns an empty list if that one
+    can't be resolved"""
+    first = resolver_for(missing.dependency)
+    if first is None:
+        return []
+
+    deps = dependency.Graph()
+    siblings = deps.labels_in(os.path.dirname(missing.key))
+    resolvers = [first]
+    for dependency_path in deps.missing_inputs(siblings):
+        resolver = resolver_for(dependency_path)
+        if dependency_path != missing.dependency and resolver:
+            resolvers.append(resolver)
+    return resolvers
+
+
+def _resolve(resolver):
+    try:
+        return resolver.resolution()
+    finally:
+        # Each thread has its own database connection; don't leak them
+        connections.close_all()
+
+
+def resolve_all(resolvers):
+    """Run each resolution, settings.RESOLUTION_WORKERS at a time (most
+    involve fetching data from remote servers)"""
+    logger.info("Attempting to resolve %s dependencies", len(resolvers))
+    workers = min(settings.RESOLUTION_WORKERS, len(resolvers))
+    if workers <= 1:
+        for resolver in resolvers:
+            resolver.resolution()
+        return
+    pool = ThreadPool(workers)
+    try:
+        pool.map(_resolve, resolvers)
+    finally:
+        pool.close()
+        pool.join()
+
+
 def run_or_resolve(cmd, prev_dependency=None):
     """Wrapper around a click command or group, providing exception handling for
     dependency errors. When a dependency is missing, this will try to resolve
-    that dependency and then retry running cli(). When retrying, the
-    `prev_dependency` parameter indirectly tells us if we've progressed, due
-    to the dependency changing"""
+    it (and any others the command will also need) and then retry running
+    cli(). When retrying, the `prev_dependency` parameter indirectly tells us
+    if we've progressed, due to the dependency changing"""
     try:
         cmd()
     except dependency.Missing as e:
-        sub_commands()      # hack - creates DependencyResolver subclasses
-        resolvers = [resolver(e.dependency)
-                     for resolver in DependencyResolver.__subclasses__()]
-        resolvers = [r for r in resolvers if r.has_resolution()]
-        if e.dependency == prev_dependency or len(resolvers) != 1:
+        resolvers = plan_resolutions(e)
+        if e.dependency == prev_dependency or not resolvers:
             raise e
         else:
-            logger.info("Attempting to resolve dependency: %s", e.dependency)
-            resolvers[0].resolution()
+            resolve_all(resolvers)
             run_or_resolve(cmd, e.dependency)
     except pyparsing.ParseException as exc:
         logger.error(u"%s:\n'%s'", exc, exc.line)
@@ -0,0 +1,107 @@
+import logging
+import sys
+from collections import OrderedDict, defaultdict, namedtuple
+from multiprocessing.pool import ThreadPool
+
+import six
+from django.db import connections
+from six.moves.queue import Queue
+
+logger = logging.getLogger(__name__)
+
+Task = namedtuple('Task', ['name', 'fn', 'deps'])
+
+
+class Scheduler(object):
+    """Runs a DAG of named tasks, each after the tasks it depends on. A task
+    may return further Tasks (e.g. one per version, once the versions are
+    known); these are scheduled in turn and anything which depended on the
+    task which created them will also wait for them"""
+
+    def __init__(self):
+        self._fns = OrderedDict()
+        # Unfinished dependencies of each task which hasn't started
+        self._waiting_on = OrderedDict()
+        self._dependents = defaultdict(set)
+        self._started = set()
+        self.done = set()
+        self.failed = OrderedDict()
+
+    def add(self, name, fn, deps=()):
+        """Add a task. Its dependencies must already have been added"""
+        if name in self._fns:
+            raise ValueError("Duplicate task: {0}".format(name))
+        unknown = [dep for dep in deps if dep not in self._fns]
+        if unknown:
+            raise ValueError("Unknown dependencies of {0}: {1}".format(
+                name, ", ".join(unknown)))
+        self._fns[name] = fn
+        self._waiting_on[name] = {dep for dep in deps if dep not in self.done}
+        for dep in self._waiting_on[name]:
+            self._dependents[dep].add(name)
+
+    def _ready(self):
+        return [name for name, waiting_on in self._waiting_on.items()
+                if not waiting_on and name not in self._started]
+
+    def _call(self, name):
+        try:
+            return name, self._fns[name](), None
+        except Exception:
+            return name, None, sys.exc_info()
+
+    def _call_in_thread(self, name):
+        try:
+            return self._call(name)
+        finally:
+            # Each thread has its own database connection; don't leak them
+            connections.close_all()
+
+    def _finish(self, name, new_tasks, exc_info):
+        del self._waiting_on[name]
+        if exc_info:
+            logger.error("%s failed: %s", name, exc_info[1])
+            self.failed[name] = exc_info
+            return
+        self.done.add(name)
+        dependents = self._dependents.pop(name, set())
+        new_tasks = list(new_tasks or [])
+        for task in new_tasks:
+            self.add(*task)
+        for dependent in dependents:
+            self._waiting_on[dependent].discard(name)
+            for task in new_tasks:
+                self._waiting_on[dependent].add(task.name)
+                self._dependents[task.name].add(dependent)
+
+    def run(self, workers=1):
+        """Run all of the tasks, up to `workers` at a time (in threads, if
+        more than one). Tasks whose dependencies fail are skipped, but
+        everything else is run; the first failure is then re-raised"""
+        pool = ThreadPool(workers) if workers > 1 else None
+        finished = Queue()
+        try:
+            while True:
+                free = workers - (len(self._started) - len(self.done) -
+                                  len(self.failed))
+                for name in self._ready()[:free]:
+                    self._started.add(name)
+                    if pool:
+                        pool.apply_async(self._call_in_thread, (name,),
+                                         callback=finished.put)
+                    else:
+                        finished.put(self._call(name))
+                if len(self._started) == len(self.done) + len(self.failed):
+                    break
+                self._finish(*finished.get())
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        if self.failed:
+            skipped = list(self._waiting_on)
+            if skipped:
+                logger.warning("Skipped, as their dependencies failed: %s",
+                               ", ".join(skipped))
+            six.reraise(*next(iter(self.failed.values())))
@@ -0,0 +1,22 @@
+import json
+
+import click
+
+from regparser.index import entry
+from regparser.tree.struct import FullNodeEncoder
+
+
+@click.command()
+@click.argument('cfr_title', type=int)
+@click.argument('cfr_part', type=int)
+@click.argument('version_id')
+@click.argument('label_id')
+def subtree(cfr_title, cfr_part, version_id, label_id):
+    """Print a single node (and its descendants) of a parsed tree as JSON,
+    e.g. `eregs subtree 12 1026 2016-12345 1026-5-a`. Only the relevant
+    portion of the tree is decoded"""
+    node = entry.Tree(cfr_title, cfr_part, version_id).read_subtree(label_id)
+    if node is None:
+        raise click.ClickException("{0} not found".format(label_id))
+    click.echo(json.dumps(node, cls=FullNodeEncoder, indent=2,
+                          sort_keys=True))
@@ -1,12 +1,54 @@
+from collections import OrderedDict
+
+from regparser.history.versions import Version
+from regparser.index import entry
+
+
+def _is_relevant(root_dir, sub_entry, only_title, only_part):
+    suffix_path = sub_entry.path[len(root_dir.path):]
+    if only_title and suffix_path[0] != str(only_title):
+        return False
+    if only_part and suffix_path[1] != str(only_part):
+        return False
+    return True
+
+
+def _narrowed(root_dir, only_title, only_part):
+    """Entries under root_dir which could be relevant. As titles and parts
+    are the first path components, this lets the DB filter by label"""
+    if only_title:
+        root_dir = root_dir / only_title
+        if only_part:
+            root_dir = root_dir / only_part
+    return root_dir
+
+
 def relevant_paths(root_dir, only_title, only_part):
     """We may want to filter the paths we search in to those relevant to a
     particular cfr title/part. Most index entries encode this as their first
     two path components"""
-    prefix_path = root_dir.path
-    for sub_entry in root_dir.sub_entries():
-        suffix_path = sub_entry.path[len(prefix_path):]
-        if only_title and suffix_path[0] != str(only_title):
-            continue
-        if only_part and suffix_path[1] != str(only_part):
-            continue
-        yield sub_entry
+    for sub_entry in _narrowed(root_dir, only_title, only_part).sub_entries():
+        if _is_relevant(root_dir, sub_entry, only_title, only_part):
+            yield sub_entry
+
+
+def relevant_contents(root_dir, only_title, only_part):
+    """Like relevant_paths, but generates (sub_entry, serialized contents)
+    pairs. Contents are only loaded for relevant entries"""
+    narrowed = _narrowed(root_dir, only_title, only_part)
+    if only_part and not only_title:
+        # The part isn't a label prefix, so filter before loading contents
+        return narrowed.sub_entries_with_contents(
+            keep=lambda sub_entry: _is_relevant(
+                root_dir, sub_entry, only_title, only_part))
+    return narrowed.sub_entries_with_contents()
+
+
+def parent_versions(cfr_title, cfr_part):
+    """Map each version id of this CFR part to that of its parent (the
+    version it builds atop) or None. Ordered by version"""
+    versions = [version_entry.read() for version_entry
+                in entry.Version(cfr_title, cfr_part).sub_entries()]
+    return OrderedDict(
+        (version.identifier, parent and parent.identifier)
+        for version, parent in zip(versions, Version.parents_of(versions)))
@@ -1,6 +1,6 @@
 import logging
 import re
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
 from operator import attrgetter, itemgetter
 
 import click
@@ -12,11 +12,36 @@ from regparser.index import dependency, entry
 logger = logging.getLogger(__name__)
 
 
+def sync_final_rules(cfr_title, cfr_part):
+    """Final rules for this part, oldest first. Results from earlier runs are
+    kept in the index; only documents published on or after the most recent
+    of those are requested again (re-fetching the last date, as more may
+    have been published that day)"""
+    search_entry = entry.NoticeSearch(cfr_title, cfr_part, 'final')
+    previous = search_entry.read() if search_entry.exists() else {}
+    cursor = previous.get('cursor')
+    new_results = fetch_notice_json(cfr_title, cfr_part, only_final=True,
+                                    min_publication_date=cursor)
+
+    by_doc_number = OrderedDict()
+    for result in previous.get('results', []) + new_results:
+        by_doc_number[result['document_number']] = result
+    # Stable sort: documents published on the same day keep the API's order
+    results = sorted(by_doc_number.values(),
+                     key=lambda r: r.get('publication_date') or '')
+    dates = [r['publication_date'] for r in results
+             if r.get('publication_date')]
+    if new_results or not search_entry.exists():
+        search_entry.write({'cursor': max(dates) if dates else None,
+                            'results': results})
+    return results
+
+
 def fetch_version_ids(cfr_title, cfr_part, notice_dir):
     """Returns a list of version ids after looking them up between the federal
     register and the local filesystem"""
     present_ids = [v.path[-1] for v in notice_dir.sub_entries()]
-    final_rules = fetch_notice_json(cfr_title, cfr_part, only_final=True)
+    final_rules = sync_final_rules(cfr_title, cfr_part)
 
     version_ids = []
     pair_fn = itemgetter('document_number', 'full_text_xml_url')
@@ -1,57 +1,119 @@
 import logging
+from itertools import islice
+from multiprocessing.pool import ThreadPool
 
 import click
+from django.db import connections
 
 from regparser.api_writer import Client
 from regparser.commands import utils
-from regparser.history.versions import Version
 from regparser.index import entry
 from regparser.notice.build import add_footnotes, process_sxs
 
 logger = logging.getLogger(__name__)
+DECODE_THREADS = 4
+DECODE_BATCH = 50
+
+
+def _decode_all(pairs):
+    """Deserialize a chunk of (entry, serialized contents) pairs. Sectioned
+    trees query the database; each thread has its own connection, so close
+    it once done"""
+    try:
+        return [(index_entry, index_entry.deserialize(contents))
+                for index_entry, contents in pairs]
+    finally:
+        connections.close_all()
+
+
+def _chunks(batch):
+    """Split a batch into one contiguous chunk per decoding thread"""
+    size = -(-len(batch) // DECODE_THREADS)     # ceiling division
+    return [batch[start:start + size]
+            for start in range(0, len(batch), size)]
+
+
+def decoded(pairs):
+    """Deserialize (entry, serialized contents) pairs, generating (entry,
+    object) pairs in order. Each batch is decoded in a pool of threads while
+    the previous batch is being written, so that reading, decoding and
+    writing overlap; at most two batches are held in memory"""
+    pairs = iter(pairs)
+    pool = ThreadPool(DECODE_THREADS)
+    try:
+        pending = None
+        while True:
+            batch = list(islice(pairs, DECODE_BATCH))
+            upcoming = pool.map_async(_decode_all, _chunks(batch)) \
+                if batch else None
+            if pending is not None:
+                for chunk in pending.get():
+                    for result in chunk:
+                        yield result
+            if upcoming is None:
+                break
+            pending = upcoming
+    finally:
+        pool.close()
+        pool.join()
 
 
 def write_trees(client, only_title, only_part):
-    for tree_entry in utils.relevant_paths(entry.Tree(), only_title,
-                                           only_part):
+    """Returns the (in progress) writes, keyed by layer doc type and id"""
+    written = {}
+    for tree_entry, content in decoded(utils.relevant_contents(
+            entry.TreeWithoutXML(), only_title, only_part)):
         _, cfr_part, version_id = tree_entry.path
-        content = tree_entry.read()
-        client.regulation(cfr_part, version_id).write(content)
+        written[('cfr', version_id + '/' + cfr_part)] = client.regulation(
+            cfr_part, version_id).write(content)
+    return written
 
 
-def write_layers(client, only_title, only_part):
+def write_layers(client, only_title, only_part, written=None):
     """Write all layers that match the filtering criteria. If CFR title/part
     are used to filter, only process CFR layers. Otherwise, process all
-    layers."""
-    for layer_entry in utils.relevant_paths(entry.Layer.cfr(), only_title,
-                                            only_part):
+    layers. Each layer waits for the write of the document it references,
+    if that's found in `written`"""
+    written = written or {}
+
+    def write(doc_type, doc_id, layer_name, layer):
+        prerequisite = written.get((doc_type, doc_id))
+        after = [prerequisite] if prerequisite is not None else []
+        client.layer(layer_name, doc_type, doc_id).write(layer, after=after)
+
+    for layer_entry, layer in decoded(utils.relevant_contents(
+            entry.Layer.cfr(), only_title, only_part)):
         _, _, cfr_part, version_id, layer_name = layer_entry.path
-        layer = layer_entry.read()
-        doc_id = version_id + '/' + cfr_part
-        client.layer(layer_name, 'cfr', doc_id).write(layer)
+        write('cfr', version_id + '/' + cfr_part, layer_name, layer)
 
     if only_title is None and only_part is None:
-        for sub_entry in entry.Layer().sub_entries():
-            if sub_entry.path[0] == 'cfr':
-                continue
-            doc_type, doc_id, layer_name = sub_entry.path
-            layer = sub_entry.read()
-            client.layer(layer_name, doc_type, doc_id).write(layer)
+        doc_types = {sub_entry.path[0]
+                     for sub_entry in entry.Layer().sub_entries()}
+        for doc_type in sorted(doc_types - {'cfr'}):
+            for layer_entry, layer in decoded(
+                    entry.Layer(doc_type).sub_entries_with_contents()):
+                _, doc_id, layer_name = layer_entry.path
+                write(doc_type, doc_id, layer_name, layer)
 
 
-def transform_notice(notice_xml):
+def transform_notice(notice_xml, version_parents=None):
     """The API has a different format for notices than the local XML. We'll
-    need to convert and add appropriate fields"""
+    need to convert and add appropriate fields. `version_parents` caches the
+    version lineage (see utils.parent_versions) of each CFR part; share it
+    between notices to only compute each once"""
+    if version_parents is None:
+        version_parents = {}
     as_dict = notice_xml.as_dict()
     as_dict['versions'] = {}
     for cfr_title, cfr_part in notice_xml.cfr_ref_pairs:
-        version_dir = entry.Version(cfr_title, cfr_part)
-        versions = [v.read() for v in version_dir.sub_entries()]
-        with_parents = zip(versions, Version.parents_of(versions))
-        for version, parent in with_parents:
-            if version.identifier == notice_xml.version_id and parent:
-                as_dict['versions'][cfr_part] = {"left": parent.identifier,
-                                                 "right": version.identifier}
+        if (cfr_title, cfr_part) not in version_parents:
+            version_parents[(cfr_title, cfr_part)] = utils.parent_versions(
+                cfr_title, cfr_part)
+        parents = version_parents[(cfr_title, cfr_part)]
+        parent_id = parents.get(notice_xml.version_id)
+        if parent_id:
+            as_dict['versions'][cfr_part] = {"left": parent_id,
+                                             "right": notice_xml.version_id}
 
     # @todo - SxS and footnotes aren't used outside of CFPB
     add_footnotes(as_dict, notice_xml.xml)
@@ -65,7 +127,19 @@ def write_notices(client, only_title, only_part):
     :param int or None only_title: Filter results to one title
     :param int or None only_part: Filter results to one part
     """
-    for notice_entry in entry.Notice().sub_entries():
+    if only_title is None and only_part is None:
+        notice_entries = entry.Notice().sub_entries()
+    else:
+        # Skip any notices whose recorded references don't match
+        candidates = entry.Notice.referencing(only_title, only_part)
+        notice_entries = (notice_entry
+                          for notice_entry in entry.Notice().sub_entries()
+                          if str(notice_entry) in candidates)
+
+    version_parents = {}
+    # NoticeXMLs are read here, as lxml trees shouldn't be shared between
+    # threads
+    for notice_entry in notice_entries:
         notice_xml = notice_entry.read()
         title_match = only_title is None or any(ref.title == only_title
                                                 for ref in notice_xml.cfr_refs)
@@ -74,28 +148,39 @@ def write_notices(client, only_title, only_part):
         part_match = only_part is None or only_part in cfr_parts
         if title_match and part_match:
             client.notice(notice_entry.path[-1]).write(
-                transform_notice(notice_xml))
+                transform_notice(notice_xml, version_parents))
 
 
 def write_diffs(client, only_title, only_part):
-    for diff_entry in utils.relevant_paths(entry.Diff(), only_title,
-                                           only_part):
+    for diff_entry, diff in decoded(utils.relevant_contents(
+            entry.Diff(), only_title, only_part)):
         _, cfr_part, lhs_id, rhs_id = diff_entry.path
-        diff = diff_entry.read()
         client.diff(cfr_part, lhs_id, rhs_id).write(diff)
 
 
 def write_preambles(client):
-    for preamble_entry in entry.Preamble().sub_entries():
-        preamble = preamble_entry.read()
-        client.preamble(preamble_entry.path[-1]).write(preamble)
+    """Returns the (in progress) writes, keyed by layer doc type and id"""
+    written = {}
+    for preamble_entry, preamble in decoded(
+            entry.Preamble().sub_entries_with_contents()):
+        doc_id = preamble_entry.path[-1]
+        written[('preamble', doc_id)] = client.preamble(doc_id).write(
+            preamble)
+    return written
 
 
 @click.command()
 @click.argument('output', envvar='EREGS_OUTPUT_DIR')
 @click.option('--cfr_title', type=int, help="Limit to one CFR title")
 @click.option('--cfr_part', type=int, help="Limit to one CFR part")
-def write_to(output, cfr_title, cfr_part):
+@click.option('--compact', is_flag=True, default=False,
+              help="When writing files, don't indent the JSON")
+@click.option('--gzip', 'compress', is_flag=True, default=None,
+              help="Gzip the JSON (adding a .gz suffix to files)")
+@click.option('--working-tree/--no-working-tree', default=True,
+              help="When writing to git, whether to update the checked out "
+                   "files or only create commits")
+def write_to(output, cfr_title, cfr_part, compact, compress, working_tree):
     """Export data. Sends all data in the index to an external source.
 
     \b
@@ -106,11 +191,14 @@ def write_to(output, cfr_title, cfr_part):
       repository"""
     logger.info("Export output - %s CFR %s, Destination: %s",
                 cfr_title, cfr_part, output)
-    client = Client(output)
-    write_trees(client, cfr_title, cfr_part)
+    client = Client(output, compact=compact, compress=compress,
+                    working_tree=working_tree)
+    written = write_trees(client, cfr_title, cfr_part)
     if cfr_title is None and cfr_part is None:
-        write_preambles(client)
-    # Note that layers must always be written _after_ the trees they reference
-    write_layers(client, cfr_title, cfr_part)
+        written.update(write_preambles(client))
+    # Note that layers must always be written _after_ the trees they
+    # reference; each waits on its own document's write
+    write_layers(client, cfr_title, cfr_part, written)
     write_notices(client, cfr_title, cfr_part)
     write_diffs(client, cfr_title, cfr_part)
+    client.close()
@@ -4,7 +4,10 @@ See https://www.federalregister.gov/developers/api/v1 - GET "search" method
 """
 import logging
 
-from regparser.index.http_cache import http_client
+from django.conf import settings
+from six.moves.urllib.parse import urlencode
+
+from regparser.index.http_cache import get_all, http_client
 
 FR_BASE = "https://www.federalregister.gov"
 API_BASE = FR_BASE + "/api/v1/"
@@ -13,31 +16,51 @@ FULL_NOTICE_FIELDS = [
     "document_number", "effective_on", "end_page", "full_text_xml_url",
     "html_url", "publication_date", "regulation_id_numbers", "start_page",
     "type", "volume"]
+PER_PAGE = 1000     # the API's maximum
 logger = logging.getLogger(__name__)
 
 
-def fetch_notice_json(cfr_title, cfr_part, only_final=False,
-                      max_effective_date=None):
-    """Search through all articles associated with this part. Right now,
-    limited to 1000; could use paging to fix this in the future."""
+def _page_url(params, page):
+    """Encode the search params (including page number) into a url"""
+    query = sorted(params.items()) + [("page", page)]
+    return API_BASE + "articles?" + urlencode(query, doseq=True)
+
+
+def iter_notice_json(cfr_title, cfr_part, only_final=False,
+                     max_effective_date=None, min_publication_date=None):
+    """Search through all articles associated with this part, generating
+    results in order (oldest first). After the first page, the remaining
+    pages are requested several at a time"""
     params = {
         "conditions[cfr][title]": cfr_title,
         "conditions[cfr][part]": cfr_part,
-        "per_page": 1000,
+        "per_page": PER_PAGE,
         "order": "oldest",
         "fields[]": FULL_NOTICE_FIELDS}
     if only_final:
         params["conditions[type][]"] = 'RULE'
     if max_effective_date:
         params["conditions[effective_date][lte]"] = max_effective_date
-    url = API_BASE + "articles"
-    logger.info("Fetching notices - URL: %s Params: %r", url, params)
-    response = http_client().get(url, params=params).json()
+    if min_publication_date:
+        params["conditions[publication_date][gte]"] = min_publication_date
+    logger.info("Fetching notices - Params: %r", params)
+    response = http_client().get(_page_url(params, 1)).json()
     logger.debug("Fetching notices response - %r", response)
-    if 'results' in response:
-        return response['results']
-    else:
-        return []
+    for result in response.get('results', []):
+        yield result
+
+    remaining = list(range(2, response.get('total_pages', 1) + 1))
+    batch_size = settings.HTTP_MAX_PER_HOST
+    for start in range(0, len(remaining), batch_size):
+        pages = remaining[start:start + batch_size]
+        for response in get_all([_page_url(params, page) for page in pages]):
+            for result in response.json().get('results', []):
+                yield result
+
+
+def fetch_notice_json(*args, **kwargs):
+    """All results of `iter_notice_json`, as a list"""
+    return list(iter_notice_json(*args, **kwargs))
 
 
 def meta_data(document_number, fields=None):
@@ -0,0 +1,15 @@
+"""Grammars are constructed when their modules are imported, which is a
+significant part of our start up time. Long-running processes (e.g. workers)
+can pay that cost once, up front, via `warm_up`"""
+from importlib import import_module
+
+MODULES = ('regparser.grammar.amdpar', 'regparser.grammar.appendix',
+           'regparser.grammar.atomic', 'regparser.grammar.delays',
+           'regparser.grammar.terms', 'regparser.grammar.tokens',
+           'regparser.grammar.unified')
+
+
+def warm_up():
+    """Construct all of the grammars"""
+    for module_name in MODULES:
+        import_module(module_name)
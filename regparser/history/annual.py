@@ -8,8 +8,9 @@ from datetime import date
 import requests
 from cached_property import cached_property
 
-from regparser.index.http_cache import http_client
+from regparser.index.http_cache import host_limit, http_client, http_map
 from regparser.tree.xml_parser.xml_wrapper import XMLWrapper
+from regparser.web.index.models import AnnualVolume
 from regparser.web.settings import parser as settings
 
 CFR_BULK_URL = ("https://www.gpo.gov/fdsys/bulkdata/CFR/{year}/title-{title}/"
@@ -30,6 +31,11 @@ PART_SPAN_REGEX = re.compile(
     r'|((?P<single_part>\d+) \(.*\))'
     r'.*)',
     flags=re.IGNORECASE)
+# The <PARTS> tag is near the beginning of each volume, so we needn't
+# download the (often very large) remainder
+PROBE_BYTES = 64 * 1024
+# How many volumes to probe at once (subject to settings.HTTP_MAX_PER_HOST)
+PROBE_CONCURRENCY = 4
 logger = logging.getLogger(__name__)
 
 
@@ -39,25 +45,50 @@ class Volume(namedtuple('Volume', ['year', 'title', 'vol_num'])):
         return CFR_BULK_URL.format(year=self.year, title=self.title,
                                    volume=self.vol_num)
 
+    def _get(self, **headers):
+        """Stream the volume, avoiding the HTTP cache (which would download
+        all of it)"""
+        logger.debug("GET %s", self.url)
+        client = http_client()
+        with client.cache_disabled():
+            return client.get(self.url, stream=True, headers=headers)
+
     @cached_property
     def response(self):
-        logger.debug("GET %s", self.url)
-        return http_client().get(self.url, stream=True)
+        """Only the beginning of the volume"""
+        return self._get(Range='bytes=0-{0}'.format(PROBE_BYTES - 1))
 
-    @property
+    @cached_property
     def exists(self):
-        return self.response.status_code == 200
+        return self.response.status_code in (requests.codes.ok,
+                                             requests.codes.partial_content)
+
+    @staticmethod
+    def _parts_line(response, max_bytes=None):
+        """Find the <PARTS> line within the first `max_bytes` of the response
+        (or all of it). Returns None if it's not present"""
+        bytes_read = 0
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if '<PARTS>' in line:
+                    return line
+                # The server may ignore our Range header
+                bytes_read += len(line) + 1
+                if max_bytes and bytes_read >= max_bytes:
+                    return None
+        finally:
+            response.close()
 
     @cached_property
     def part_span(self):
         """Calculate and memoize the range of parts this volume covers"""
         _part_span = False
-        part_string = ''
+        part_string = self._parts_line(self.response, PROBE_BYTES)
+        if not part_string:
+            # Not near the beginning, as expected. Before concluding there
+            # isn't one (which we'd record), check the whole volume
+            part_string = self._parts_line(self._get())
 
-        for line in self.response.iter_lines(decode_unicode=True):
-            if '<PARTS>' in line:
-                part_string = line
-                break
         if part_string:
             match = PART_SPAN_REGEX.match(part_string)
             if match and match.group('span'):
@@ -78,6 +109,17 @@ class Volume(namedtuple('Volume', ['year', 'title', 'vol_num'])):
             _part_span = (1, None)
         return _part_span
 
+    @classmethod
+    def from_model(cls, model):
+        """Construct a Volume from its AnnualVolume record, without HTTP"""
+        volume = cls(model.year, model.title, model.vol_num)
+        volume.exists = True
+        if model.part_start is None:
+            volume.part_span = False
+        else:
+            volume.part_span = (model.part_start, model.part_end)
+        return volume
+
     @property
     def publication_date(self):
         return date(self.year, publication_month(self.title), 1)
@@ -142,14 +184,53 @@ def date_of_annual_after(title, eff_date):
         return publication_date.replace(year=eff_date.year + 1)
 
 
+def _probe(volume):
+    """Fetch the information we need about this volume"""
+    with host_limit(volume.url):
+        if volume.exists:
+            volume.part_span
+    return volume
+
+
+def probe_volumes(year, title, vol_nums):
+    """Concurrently probe GPO for the requested volumes, recording those
+    which exist. Missing volumes aren't recorded as they may be published
+    later"""
+    volumes = [Volume(year, title, vol_num) for vol_num in vol_nums]
+    volumes = http_map(_probe, volumes)
+    # Write from this thread, as database connections are per-thread
+    for volume in volumes:
+        if volume.exists:
+            part_start, part_end = volume.part_span or (None, None)
+            AnnualVolume.objects.update_or_create(
+                year=year, title=title, vol_num=volume.vol_num,
+                defaults={'part_start': part_start, 'part_end': part_end})
+    return volumes
+
+
+def volumes_of(year, title):
+    """Generate the volumes of this annual edition in order. Volumes we've
+    seen before are read from our records; the remainder are probed (several
+    at a time), stopping after the first which doesn't exist"""
+    known = {model.vol_num: Volume.from_model(model)
+             for model in AnnualVolume.objects.filter(year=year, title=title)}
+    vol_num = 1
+    while True:
+        if vol_num not in known:
+            to_probe = range(vol_num, vol_num + PROBE_CONCURRENCY)
+            for volume in probe_volumes(year, title, to_probe):
+                known[volume.vol_num] = volume
+        volume = known[vol_num]
+        if not volume.exists:
+            return
+        yield volume
+        vol_num += 1
+
+
 def find_volume(year, title, part):
     """Annual editions have multiple volume numbers. Try to find the volume
     that we care about"""
-    vol_num = 1
-    volume = Volume(year, title, vol_num)
-    while volume.exists:
+    for volume in volumes_of(year, title):
         if volume.should_contain(part):
             return volume
-        vol_num += 1
-        volume = Volume(year, title, vol_num)
     return None
@@ -1,4 +1,5 @@
 import logging
+import os
 
 import networkx
 from django.db import transaction
@@ -29,20 +30,6 @@ class Graph(object):
         self.deserialize()
         self.rebuild()
 
-    @transaction.atomic
-    def serialize(self):
-        """Convert the in-memory self._graph into db records"""
-        Dependency.objects.all().delete()
-
-        existing = {node.label for node in DependencyNode.objects.all()}
-        new_vertices = set(self._graph.nodes()) - existing
-        DependencyNode.objects.bulk_create(
-            DependencyNode(label=label) for label in new_vertices)
-
-        Dependency.objects.bulk_create(
-            Dependency(depender_id=depender, target_id=target)
-            for (depender, target) in self._graph.edges())
-
     @transaction.atomic
     def deserialize(self):
         """Convert db records into the in-memory self._graph"""
@@ -53,11 +40,22 @@ class Graph(object):
             (e.depender_id, e.target_id)
             for e in Dependency.objects.all())
 
+    @transaction.atomic
+    def serialize_edge(self, input_key, output_key):
+        """Store a single edge (and its vertices), leaving edges added by
+        others (e.g. concurrently running commands, whose graphs were loaded
+        before or after ours) intact"""
+        for label in (input_key, output_key):
+            DependencyNode.objects.get_or_create(label=label)
+        Dependency.objects.get_or_create(depender_id=input_key,
+                                         target_id=output_key)
+
     def add(self, output_entry, input_entry):
         """Add a dependency where output tuple relies on input_tuple"""
-        self._graph.add_edge(str(input_entry), str(output_entry))
+        input_key, output_key = str(input_entry), str(output_entry)
+        self._graph.add_edge(input_key, output_key)
         self.rebuild()
-        self.serialize()    # @todo: make this incremental
+        self.serialize_edge(input_key, output_key)
 
     def __contains__(self, key):
         """Does the graph contain a particular node?"""
@@ -111,6 +109,23 @@ class Graph(object):
             if self.node(dependency).get('stale'):
                 raise Missing(key, self.node(dependency)['stale'])
 
+    def labels_in(self, directory):
+        """All nodes directly within this directory"""
+        directory = str(directory)
+        return [node for node in self._graph.nodes()
+                if os.path.dirname(node) == directory]
+
+    def missing_inputs(self, entries):
+        """Which nodes, that any of these entries depend on (directly or
+        indirectly), have never been built?"""
+        ancestors = set()
+        for key in map(str, entries):
+            if key in self._graph:
+                ancestors.update(networkx.ancestors(self._graph, key))
+        built = set(DBEntry.objects.filter(label_id__in=ancestors)
+                    .values_list('label_id', flat=True))
+        return sorted(ancestors - built)
+
     def is_stale(self, entry):
         """Determine if a file needs to be rebuilt"""
         return bool(self.node(str(entry)).get('stale'))
@@ -1,20 +1,27 @@
 import json
 import logging
 import os
+from collections import OrderedDict
 
 from django.conf import settings
+from django.db import transaction
 from lxml import etree
 
 from regparser.history.versions import Version as VersionStruct
 from regparser.notice.encoder import AmendmentEncoder
 from regparser.notice.xml import NoticeXML
-from regparser.tree.struct import (FullNodeEncoder, frozen_node_decode_hook,
-                                   full_node_decode_hook)
+from regparser.tree import columnar
+from regparser.tree.struct import (FrozenNode, FullNodeEncoder, Node,
+                                   frozen_node_decode_hook,
+                                   frozen_node_from_dict,
+                                   full_node_decode_hook, full_node_from_dict,
+                                   full_node_to_dict)
 from regparser.tree.xml_parser.xml_wrapper import XMLWrapper
 from regparser.web.index.models import Entry as DBEntry
-from regparser.web.index.models import DependencyNode
+from regparser.web.index.models import DependencyNode, NoticeCFRRef
 
 logger = logging.getLogger(__name__)
+CONTENTS_BATCH = 100
 
 
 class Entry(object):
@@ -59,18 +66,48 @@ class Entry(object):
         """Default implementation; treat the content as bytes"""
         return content
 
-    def sub_entries(self):
-        # @todo optimization point: use db indexes/similar to speed up this
-        # query
+    def _sub_entry_rows(self, with_contents=False):
+        """Pair each DB row under this entry with its Entry"""
         prefix = str(self) + os.sep
-        for entry in DBEntry.objects.filter(label__label__startswith=prefix):
-            # Note: implicitly ordering by label in the DB model
-            suffix = entry.label_id[len(prefix):]
+        # Note: implicitly ordering by label in the DB model
+        query = DBEntry.objects.filter(label__label__startswith=prefix)
+        if with_contents:
+            # Include the (usually deferred) contents, without caching rows
+            query = query.defer(None).iterator()
+        for db_entry in query:
+            suffix = db_entry.label_id[len(prefix):]
             sub_entry = self
             for suffix_part in suffix.split(os.sep):
                 sub_entry = sub_entry / suffix_part
+            yield sub_entry, db_entry
+
+    def sub_entries(self):
+        # @todo optimization point: use db indexes/similar to speed up this
+        # query
+        for sub_entry, _ in self._sub_entry_rows():
             yield sub_entry
 
+    def sub_entries_with_contents(self, keep=None):
+        """Like sub_entries, but generates (sub_entry, serialized contents)
+        pairs, fetched in the same query rather than one read per entry. If
+        a `keep` predicate is provided, only the contents of sub entries it
+        accepts are loaded (in batches)"""
+        if keep is None:
+            rows = self._sub_entry_rows(with_contents=True)
+            for sub_entry, db_entry in rows:
+                yield sub_entry, bytes(db_entry.contents)
+            return
+
+        kept = [sub_entry for sub_entry in self.sub_entries()
+                if keep(sub_entry)]
+        for start in range(0, len(kept), CONTENTS_BATCH):
+            batch = kept[start:start + CONTENTS_BATCH]
+            contents = dict(
+                DBEntry.objects.filter(label__in=[str(e) for e in batch])
+                .values_list('label_id', 'contents'))
+            for sub_entry in batch:
+                yield sub_entry, bytes(contents[str(sub_entry)])
+
     def exists(self):
         return DBEntry.objects.filter(label=str(self)).exists()
 
@@ -79,6 +116,35 @@ class Notice(Entry):
     """Processes NoticeXMLs, keyed by notice_xml"""
     PREFIX = 'notice_xml'
 
+    def write(self, content):
+        """Also record the CFR parts the notice references"""
+        with transaction.atomic():
+            super(Notice, self).write(content)
+            NoticeCFRRef.objects.filter(notice_id=str(self)).delete()
+            NoticeCFRRef.objects.bulk_create(
+                NoticeCFRRef(notice_id=str(self), cfr_title=ref.title,
+                             cfr_part=part)
+                for ref in content.cfr_refs for part in ref.parts or [None])
+
+    @classmethod
+    def referencing(cls, cfr_title=None, cfr_part=None):
+        """Notices which reference the CFR title (if provided) and the part
+        (if provided; note it needn't be within that title). Notices with no
+        recorded references (e.g. those written before references were
+        recorded) are included, as we can't know. Returns a set of labels"""
+        refs = NoticeCFRRef.objects
+        labels = set(DBEntry.objects.filter(
+            label__label__startswith=str(cls()) + os.sep,
+            cfr_refs__isnull=True).values_list('label_id', flat=True))
+        matches = set(refs.values_list('notice_id', flat=True))
+        if cfr_title is not None:
+            matches &= set(refs.filter(cfr_title=cfr_title)
+                           .values_list('notice_id', flat=True))
+        if cfr_part is not None:
+            matches &= set(refs.filter(cfr_part=cfr_part)
+                           .values_list('notice_id', flat=True))
+        return labels | matches
+
     def serialize(self, content):
         return etree.tostring(content.xml, encoding='UTF-8')
 
@@ -139,17 +205,221 @@ class _JSONEntry(Entry):
         return json.loads(as_text, object_hook=self.JSON_DECODER)
 
 
-class Tree(_JSONEntry):
-    """Processes Nodes, keyed by tree"""
-    PREFIX = 'tree'
-    JSON_ENCODER = FullNodeEncoder
+class _NodeEntry(Entry):
+    """Base class for trees of Nodes. Rather than a per-object JSON hook, we
+    convert between Nodes and plain dicts in a single (iterative) pass and
+    store compact JSON. Content which isn't a Node tree falls back to the
+    hook-based encoding"""
+    INCLUDE_SOURCE_XML = True
     JSON_DECODER = staticmethod(full_node_decode_hook)
 
+    def serialize(self, content):
+        if isinstance(content, Node) and \
+                settings.EREGS_TREE_FORMAT == 'columnar':
+            return columnar.encode(content)
+        if isinstance(content, Node):
+            content = full_node_to_dict(content)
+        as_text = json.dumps(content, cls=FullNodeEncoder, sort_keys=True,
+                             separators=(',', ':'))
+        return as_text.encode('utf-8')  # as bytes
+
+    def from_dict(self, as_dict):
+        return full_node_from_dict(as_dict, self.INCLUDE_SOURCE_XML)
+
+    def from_columnar(self, tree):
+        return tree.node(include_source_xml=self.INCLUDE_SOURCE_XML)
+
+    def deserialize(self, content):
+        if columnar.is_columnar(content):
+            return self.from_columnar(columnar.ColumnarTree(content))
+        as_text = content.decode('utf-8')
+        as_dict = json.loads(as_text)
+        if _is_sectioned(as_dict):
+            return self.from_dict(_assemble(as_dict[SECTIONED],
+                                            self._all_subtrees()))
+        if (isinstance(as_dict, dict) and
+                set(as_dict.keys()) == FullNodeEncoder.FIELDS):
+            return self.from_dict(as_dict)
+        return json.loads(as_text, object_hook=self.JSON_DECODER)
+
+    def _all_subtrees(self):
+        """Fetch every Subtree record associated with this entry in a single
+        query"""
+        prefix = str(Subtree(*self.path)) + os.sep
+        rows = DBEntry.objects.filter(label__label__startswith=prefix)\
+            .values_list('label_id', 'contents')
+        return {label[len(prefix):]: Subtree.deserialize(bytes(contents))
+                for label, contents in rows}
+
+
+SECTIONED = 'sectioned'
+
+
+def _is_sectioned(as_dict):
+    return isinstance(as_dict, dict) and list(as_dict.keys()) == [SECTIONED]
+
+
+def _is_subtree_root(as_dict):
+    """Sections, appendices and the interpretations are each stored as their
+    own record in the 'sectioned' layout"""
+    label = as_dict['label']
+    return len(label) == 2 and (
+        label[1][:1].isdigit() or
+        as_dict['node_type'] in (Node.APPENDIX, Node.INTERP))
+
+
+def _split_subtrees(root_dict):
+    """Replace each subtree root (see above) within a tree dict with a
+    reference to its label id. Returns that skeleton and a dict of label id to
+    subtree dict"""
+    subtrees = OrderedDict()
+    stack = [root_dict]
+    while stack:
+        as_dict = stack.pop()
+        children = []
+        for child in as_dict['children']:
+            if _is_subtree_root(child):
+                label_id = '-'.join(child['label'])
+                subtrees[label_id] = child
+                children.append({'ref': label_id})
+            else:
+                children.append(child)
+                stack.append(child)
+        as_dict['children'] = children
+    return root_dict, subtrees
+
+
+def _refs(skeleton):
+    """Label ids referenced from within a skeleton"""
+    refs, stack = [], [skeleton]
+    while stack:
+        as_dict = stack.pop()
+        for child in reversed(as_dict['children']):
+            if 'ref' in child:
+                refs.append(child['ref'])
+            else:
+                stack.append(child)
+    return refs
+
+
+def _assemble(skeleton, subtrees):
+    """Inverse of _split_subtrees"""
+    stack = [skeleton]
+    while stack:
+        as_dict = stack.pop()
+        stack.extend(child for child in as_dict['children']
+                     if 'ref' not in child)
+        as_dict['children'] = [subtrees[child['ref']] if 'ref' in child
+                               else child for child in as_dict['children']]
+    return skeleton
+
+
+def _find_dict(root_dict, label_id):
+    """Find the tree dict with this label id, skipping over references"""
+    stack = [root_dict]
+    while stack:
+        as_dict = stack.pop()
+        if '-'.join(as_dict['label']) == label_id:
+            return as_dict
+        stack.extend(child for child in as_dict['children']
+                     if 'ref' not in child)
+
+
+class Tree(_NodeEntry):
+    """Processes Nodes, keyed by tree. If EREGS_TREE_LAYOUT is 'sectioned',
+    each section, appendix, and interpretation is stored as a separate
+    Subtree record, with the Tree itself only holding references to them.
+    The sectioned layout is always JSON; EREGS_TREE_FORMAT only applies to
+    whole trees"""
+    PREFIX = 'tree'
+
+    def write(self, content):
+        subtree_dir = Subtree(*self.path)
+        with transaction.atomic():
+            # Sections from a previous (sectioned) write may no longer
+            # exist; deleting their nodes also deletes their entries
+            DependencyNode.objects.filter(
+                label__startswith=str(subtree_dir) + os.sep).delete()
+            if isinstance(content, Node) and \
+                    settings.EREGS_TREE_LAYOUT == 'sectioned':
+                if settings.EREGS_TREE_FORMAT == 'columnar':
+                    logger.warning("The sectioned layout is stored as JSON; "
+                                   "ignoring EREGS_TREE_FORMAT for %s", self)
+                skeleton, subtrees = _split_subtrees(
+                    full_node_to_dict(content))
+                for label_id, subtree in subtrees.items():
+                    (subtree_dir / label_id).write(subtree)
+                super(Tree, self).write({SECTIONED: skeleton})
+            else:
+                super(Tree, self).write(content)
+
+    def read_subtree(self, label_id):
+        """Read only the portion of the tree with this label id (or None if
+        it's not present). With the 'sectioned' layout, this only decodes the
+        relevant Subtree record(s)"""
+        content = bytes(DBEntry.objects.get(label=str(self)).contents)
+        if columnar.is_columnar(content):
+            node = columnar.ColumnarTree(content).find(label_id)
+            as_dict = node and full_node_to_dict(node)
+        else:
+            as_dict = json.loads(content.decode('utf-8'))
+            if _is_sectioned(as_dict):
+                as_dict = self._find_in_sectioned(as_dict[SECTIONED],
+                                                  label_id)
+            else:
+                as_dict = _find_dict(as_dict, label_id)
+
+        if as_dict is not None:
+            return self.from_dict(as_dict)
+
+    def _find_in_sectioned(self, skeleton, label_id):
+        subtree_dir = Subtree(*self.path)
+        found = _find_dict(skeleton, label_id)
+        if found:
+            return _assemble(found, {ref: (subtree_dir / ref).read()
+                                     for ref in _refs(found)})
+
+        # Check the most likely record (by label prefix) first
+        refs = sorted(_refs(skeleton), key=lambda ref: not (
+            label_id == ref or label_id.startswith(ref + '-')))
+        for ref in refs:
+            found = _find_dict((subtree_dir / ref).read(), label_id)
+            if found:
+                return found
+
+
+class TreeWithoutXML(Tree):
+    """Like Tree, but drops the source_xml when decoding. Useful for
+    consumers (e.g. writers) which never inspect it"""
+    INCLUDE_SOURCE_XML = False
+
 
 class FrozenTree(Tree):
     """Like Tree, but decodes as FrozenNodes"""
     JSON_DECODER = staticmethod(frozen_node_decode_hook)
 
+    def from_dict(self, as_dict):
+        return frozen_node_from_dict(as_dict)
+
+    def from_columnar(self, tree):
+        return FrozenNode.from_node(tree.node(include_source_xml=False))
+
+
+class Subtree(Entry):
+    """A section, appendix, or interpretation of a Tree stored with the
+    'sectioned' layout, keyed by the tree's path and the label id. The
+    contents are a dict as generated by full_node_to_dict"""
+    PREFIX = 'subtree'
+
+    @staticmethod
+    def serialize(content):
+        as_text = json.dumps(content, sort_keys=True, separators=(',', ':'))
+        return as_text.encode('utf-8')  # as bytes
+
+    @staticmethod
+    def deserialize(content):
+        return json.loads(content.decode('utf-8'))
+
 
 class SxS(_JSONEntry):
     """Processes Section-by-Section analyses, keyed by sxs"""
@@ -177,8 +447,12 @@ class Diff(_JSONEntry):
     PREFIX = 'diff'
 
 
-class Preamble(_JSONEntry):
+class NoticeSearch(_JSONEntry):
+    """Federal Register search results (and the publication date they run
+    through), keyed by fr_search"""
+    PREFIX = 'fr_search'
+
+
+class Preamble(_NodeEntry):
     """Processes notice preambles, keyed by document id"""
     PREFIX = 'preamble'
-    JSON_ENCODER = FullNodeEncoder
-    JSON_DECODER = staticmethod(full_node_decode_hook)
@@ -1,12 +1,31 @@
+import json
 import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
 
 import django_rq
 import requests_cache
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+from six.moves.urllib.parse import urlparse
 
+# Sessions aren't guaranteed to be thread safe, so each thread gets its own
+_local = threading.local()
+# Threads for concurrent requests are shared (see http_map), so that their
+# sessions are too
+POOL_SIZE = 8
+_pool = None
+_pool_lock = threading.Lock()
+_host_locks = defaultdict(lambda: threading.BoundedSemaphore(
+    settings.HTTP_MAX_PER_HOST))
+_host_locks_lock = threading.Lock()
 
-def http_client():
-    config = settings.REQUESTS_CACHE
+
+def _new_client(config):
+    config = dict(config)
     if config.get('backend') == 'redis' and 'connection' not in config:
         config['connection'] = django_rq.get_connection()
     if config.get('backend') == 'sqlite':
@@ -15,4 +34,74 @@ def http_client():
         if not os.path.isdir(parent_dir):
             os.makedirs(parent_dir)
 
-    return requests_cache.CachedSession(**config)
+    session = requests_cache.CachedSession(**config)
+    retry = Retry(total=settings.HTTP_RETRIES,
+                  backoff_factor=settings.HTTP_BACKOFF,
+                  status_forcelist=(500, 502, 503, 504),
+                  # Return the final response (rather than raising), as
+                  # callers inspect status codes
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_maxsize=settings.HTTP_MAX_PER_HOST,
+                          max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def http_client():
+    """A cached session, shared by all calls within this thread so that
+    connections (and the cache backend) are reused. Requests which fail with
+    connection errors or 5XX responses are retried with backoff. A new
+    session is created if the cache settings change"""
+    config = settings.REQUESTS_CACHE
+    key = json.dumps({k: v for k, v in config.items() if k != 'connection'},
+                     sort_keys=True, default=repr)
+    if getattr(_local, 'key', None) != key:
+        _local.client = _new_client(config)
+        _local.key = key
+    return _local.client
+
+
+@contextmanager
+def host_limit(url):
+    """Block until fewer than settings.HTTP_MAX_PER_HOST requests (using this
+    context manager) are in flight to the url's host"""
+    host = urlparse(url).netloc
+    with _host_locks_lock:
+        lock = _host_locks[host]
+    with lock:
+        yield
+
+
+def _mark_pool_thread():
+    _local.in_pool = True
+
+
+def http_map(fn, items):
+    """Call fn on each of the items, several at a time, returning the
+    results in order. Calls run in a pool of threads shared by all callers;
+    as each thread keeps its session (see http_client), connections and the
+    cache backend are reused from one call to the next. Calls made from
+    within the pool run sequentially, rather than waiting on the pool"""
+    global _pool
+    items = list(items)
+    if not items:
+        return []
+    if getattr(_local, 'in_pool', False):
+        return [fn(item) for item in items]
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(POOL_SIZE, initializer=_mark_pool_thread)
+    return _pool.map(fn, items, chunksize=1)
+
+
+def _get(args):
+    url, kwargs = args
+    with host_limit(url):
+        return http_client().get(url, **kwargs)
+
+
+def get_all(urls, **kwargs):
+    """GET each of the urls concurrently, respecting per-host limits. kwargs
+    are passed to each `get`. Returns the responses, in order"""
+    return http_map(_get, [(url, kwargs) for url in urls])
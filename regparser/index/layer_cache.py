@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+
+from regparser.tree.struct import FrozenNode
+from regparser.web.index.models import LayerCacheElement
+
+logger = logging.getLogger(__name__)
+# Part of every key. Bump this when layers change in ways which would
+# invalidate previously cached elements
+CACHE_VERSION = '2'
+
+
+class LayerCache(object):
+    """Persistent cache of layer elements, satisfying the interface expected
+    by `Layer.build(cache=...)`. Elements are keyed by CACHE_VERSION, the
+    layer's class and shorthand, its `cache_key` for the node (configuration
+    and any relevant context), and the node's Merkle hash (which covers its
+    children). Layers which
+    don't opt in (i.e. whose `cache_key` is None) are always processed.
+
+    Lookups for a layer are fetched in bulk when that layer is first seen;
+    new elements are held in memory until `save` is called. The elements of
+    a previously built layer (e.g. for the parent version) can also be
+    `seed`ed into the cache."""
+    QUERY_CHUNK = 500   # keep under SQLite's parameter limit
+
+    def __init__(self):
+        self._layers = {}
+        self._known = {}
+        self._pending = {}
+        self._node_hashes = {}
+        self._trees = []    # keep hashed trees alive so ids aren't reused
+        self.hits, self.misses = 0, 0
+
+    @staticmethod
+    def _hash_tree(tree):
+        """Compute the hash of every node in the tree in one pass. Returns a
+        dict keyed by node id"""
+        node_hashes = {}
+        stack = [(tree, FrozenNode.from_node(tree))]
+        while stack:
+            node, frozen = stack.pop()
+            node_hashes[id(node)] = frozen.hash
+            stack.extend(zip(node.children, frozen.children))
+        return node_hashes
+
+    @staticmethod
+    def _keys(layer, node_hashes):
+        """Map node ids to cache keys for every node of the layer's tree"""
+        keys = {}
+        # Subclasses (e.g. the preamble's KeyTerms) may share a shorthand
+        layer_class = '{0}.{1}'.format(type(layer).__module__,
+                                       type(layer).__name__)
+        stack = [layer.tree]
+        while stack:
+            node = stack.pop()
+            context = layer.cache_key(node)
+            if context is not None:
+                keys[id(node)] = hashlib.sha256(u'\x00'.join([
+                    CACHE_VERSION, layer_class, layer.shorthand, context,
+                    node_hashes[id(node)]
+                ]).encode('utf-8')).hexdigest()
+            stack.extend(node.children)
+        return keys
+
+    def seed(self, parent_layer, parent_elements):
+        """Treat the elements of a layer built over some other tree (e.g. the
+        parent version's) as known. `parent_layer` is a layer of the same
+        class over that tree; it's pre-processed so that its `cache_key`s
+        reflect that tree's context. Nodes which are unchanged (in both their
+        contents and context) will then reuse the parent's elements. Labels
+        which aren't unique within the tree can't be mapped back to a single
+        node, so they're skipped"""
+        parent_layer.pre_process()
+        node_hashes = self._hash_tree(parent_layer.tree)
+        keys = self._keys(parent_layer, node_hashes)
+
+        label_counts = defaultdict(int)
+        nodes = [parent_layer.tree]
+        for node in nodes:
+            label_counts[node.label_id()] += 1
+            nodes.extend(node.children)
+
+        for node in nodes:
+            label_id = node.label_id()
+            if id(node) in keys and label_counts[label_id] == 1:
+                self._known.setdefault(
+                    keys[id(node)], json.dumps(parent_elements.get(label_id)))
+
+    def _start_layer(self, layer):
+        """Compute keys for every node in this layer's tree and load any
+        matching elements"""
+        if id(layer.tree) not in self._node_hashes:
+            self._trees.append(layer.tree)
+            self._node_hashes.update(self._hash_tree(layer.tree))
+        keys = self._keys(layer, self._node_hashes)
+        # Retain a reference to the layer so its id isn't reused
+        self._layers[id(layer)] = (layer, keys)
+
+        to_load = list(set(keys.values()) - set(self._known))
+        for start in range(0, len(to_load), self.QUERY_CHUNK):
+            query = LayerCacheElement.objects.filter(
+                key__in=to_load[start:start + self.QUERY_CHUNK])
+            for key, contents in query.values_list('key', 'contents'):
+                self._known[key] = contents
+
+    def fetch_or_process(self, layer, node, derived=None):
+        """Look up the layer element for this node, processing it if needed.
+        `derived` is passed along to `process_derived` if present"""
+        if id(layer) not in self._layers:
+            self._start_layer(layer)
+        _, keys = self._layers[id(layer)]
+        key = keys.get(id(node))
+        if key is not None and key in self._known:
+            self.hits += 1
+            return json.loads(self._known[key])
+
+        if derived is None:
+            layer_element = layer.process(node)
+        else:
+            layer_element = layer.process_derived(node, derived)
+        if key is None:
+            return layer_element
+
+        self.misses += 1
+        # Round trip through JSON so that misses and hits look the same
+        self._known[key] = self._pending[key] = json.dumps(layer_element)
+        return json.loads(self._known[key])
+
+    def save(self):
+        """Persist any newly computed elements"""
+        logger.debug("Layer cache: %s hits, %s misses", self.hits,
+                     self.misses)
+        elements = [LayerCacheElement(key=key, contents=contents)
+                    for key, contents in self._pending.items()]
+        try:
+            with transaction.atomic():
+                LayerCacheElement.objects.bulk_create(
+                    elements, batch_size=self.QUERY_CHUNK)
+        except IntegrityError:
+            # Another process beat us to some of these
+            for element in elements:
+                LayerCacheElement.objects.update_or_create(
+                    key=element.key, defaults={'contents': element.contents})
+        self._pending = {}
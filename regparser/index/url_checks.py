@@ -0,0 +1,43 @@
+"""Checking whether content exists at a URL (e.g. for images) is slow, so we
+check many at once and remember the results, both positive and negative, for
+settings.URL_CHECK_TTL seconds"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from regparser.index.http_cache import host_limit, http_map
+from regparser.web.index.models import CheckedUrl
+
+QUERY_CHUNK = 500   # keep under SQLite's parameter limit
+
+
+def _known(urls):
+    """Unexpired results for these urls"""
+    cutoff = timezone.now() - timedelta(seconds=settings.URL_CHECK_TTL)
+    results = {}
+    for start in range(0, len(urls), QUERY_CHUNK):
+        query = CheckedUrl.objects.filter(
+            url__in=urls[start:start + QUERY_CHUNK], checked__gte=cutoff)
+        results.update(query.values_list('url', 'exists'))
+    return results
+
+
+def check_all(urls, check_url):
+    """Map each url to whether content exists there. Unknown (or expired)
+    urls are checked concurrently via `check_url`, which should return a
+    truthy value if the content exists"""
+    urls = list(set(urls))
+    results = _known(urls)
+    to_check = [url for url in urls if url not in results]
+    if to_check:
+        def check(url):
+            with host_limit(url):
+                return url, bool(check_url(url))
+        checked = http_map(check, to_check)
+        # Write from this thread, as database connections are per-thread
+        for url, exists in checked:
+            CheckedUrl.objects.update_or_create(
+                url=url, defaults={'exists': exists})
+            results[url] = exists
+    return results
@@ -0,0 +1,56 @@
+"""Rather than each layer walking the tree on its own, build several layers
+in a single traversal, sharing values derived from each node between them"""
+from cached_property import cached_property
+
+from regparser.citations import Label
+from regparser.layer.layer import Layer
+from regparser.layer.paragraph_markers import marker_of
+
+
+class DerivedValues(object):
+    """Values derived from a node which several layers need. Each is computed
+    at most once per node, and only if requested"""
+    def __init__(self, node):
+        self.node = node
+
+    @cached_property
+    def marker(self):
+        return marker_of(self.node)
+
+    @cached_property
+    def citation_label(self):
+        return Label.from_node(self.node)
+
+
+def _is_fusible(layer):
+    """Layers which customize the traversal itself must build on their own"""
+    layer_class = type(layer)
+    return (layer_class.build is Layer.build and
+            layer_class.builder is Layer.builder)
+
+
+def build_layers(layers, cache=None):
+    """Equivalent to calling `build(cache)` on each of the layers, but visits
+    each node only once. All of the layers must share the same tree. Returns
+    the resulting layer dicts, in the same order as the layers"""
+    fusible = [layer for layer in layers if _is_fusible(layer)]
+    for layer in fusible:
+        layer.pre_process()
+
+    if fusible:
+        stack = [fusible[0].tree]
+        while stack:
+            node = stack.pop()
+            derived = DerivedValues(node)
+            for layer in fusible:
+                if cache:
+                    layer_element = cache.fetch_or_process(layer, node,
+                                                           derived)
+                else:
+                    layer_element = layer.process_derived(node, derived)
+                if layer_element:
+                    layer.layer[node.label_id()] = layer_element
+            stack.extend(reversed(node.children))
+
+    return [layer.layer if _is_fusible(layer) else layer.build(cache)
+            for layer in layers]
@@ -1,3 +1,9 @@
+import json
+
+from cached_property import cached_property
+
+from regparser.web.settings import parser as settings
+
 # using relative imports due to funkiness in regparser/layer/__init__.py
 from . import external_types
 from .layer import Layer
@@ -8,10 +14,25 @@ class ExternalCitationParser(Layer):
     `external_types` for specific types of external citations"""
     shorthand = 'external-citations'
 
+    @cached_property
+    def _config(self):
+        return json.dumps(settings.CUSTOM_CITATIONS, sort_keys=True)
+
+    def cache_key(self, node):
+        """Citations depend on the node and any custom citations"""
+        return self._config
+
+    @cached_property
+    def finders(self):
+        return [finder() for finder in external_types.ALL]
+
     def process(self, node):
+        # Finders are relatively expensive; skip those which can't match
+        lowered = node.text.lower()
         citations = [cite
-                     for finder in external_types.ALL
-                     for cite in finder().find(node)]
+                     for finder in self.finders
+                     if finder.could_match(lowered)
+                     for cite in finder.find(node)]
 
         layer_elements = []
         for text, locations, representative in self.convert_to_search_replace(
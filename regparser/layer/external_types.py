@@ -19,6 +19,16 @@ Cite = namedtuple('Cite', ['cite_type', 'start', 'end', 'components', 'url'])
 class FinderBase(six.with_metaclass(abc.ABCMeta)):
     """Base class for all of the external citation parsers. Defines the
     interface they must implement."""
+    # Strings, one of which must be present (ignoring case) for the finder to
+    # match anything. Used to skip text cheaply; None disables this filter
+    TRIGGERS = None
+
+    def could_match(self, lowered_text):
+        """Quick test of whether `find` might find something in this (lower
+        cased) text"""
+        return self.TRIGGERS is None or any(
+            trigger in lowered_text for trigger in self.TRIGGERS)
+
     @abc.abstractproperty
     def CITE_TYPE(self):    # noqa - this is a property
         """A constant to represent the citations this produces."""
@@ -42,6 +52,7 @@ class CFRFinder(FinderBase):
     """Code of Federal Regulations. Explicitly ignore any references within
     this part"""
     CITE_TYPE = 'CFR'
+    TRIGGERS = ('cfr',)
 
     def find(self, node):
         for cit in cfr_citations(node.text):
@@ -80,6 +91,7 @@ class FDSYSFinder(six.with_metaclass(abc.ABCMeta)):
 class USCFinder(FDSYSFinder, FinderBase):
     """U.S. Code"""
     CITE_TYPE = 'USC'
+    TRIGGERS = ('u.s.c.',)
     GRAMMAR = QuickSearchable(
         Word(string.digits).setResultsName("title") +
         "U.S.C." +
@@ -91,6 +103,7 @@ class USCFinder(FDSYSFinder, FinderBase):
 class PublicLawFinder(FDSYSFinder, FinderBase):
     """Public Law"""
     CITE_TYPE = 'PUBLIC_LAW'
+    TRIGGERS = ('public',)
     GRAMMAR = QuickSearchable(
         Marker("Public") + Marker("Law") +
         Word(string.digits).setResultsName("congress") + Suppress("-") +
@@ -101,6 +114,7 @@ class PublicLawFinder(FDSYSFinder, FinderBase):
 class StatutesFinder(FDSYSFinder, FinderBase):
     """Statutes at large"""
     CITE_TYPE = 'STATUTES_AT_LARGE'
+    TRIGGERS = ('stat.',)
     GRAMMAR = QuickSearchable(
         Word(string.digits).setResultsName("volume") + Suppress("Stat.") +
         Word(string.digits).setResultsName("page"))
@@ -112,6 +126,10 @@ class CustomFinder(FinderBase):
     CITE_TYPE = 'OTHER'
     _cached_regexes = {}
 
+    def could_match(self, lowered_text):
+        return any(needle.lower() in lowered_text
+                   for needle in settings.CUSTOM_CITATIONS)
+
     def find(self, node):
         for needle, url in settings.CUSTOM_CITATIONS.items():
             if needle not in self._cached_regexes:
@@ -127,6 +145,7 @@ class UrlFinder(FinderBase):
     """Any raw urls in the text"""
     CITE_TYPE = 'OTHER'
     REGEX = re.compile(r'https?:\/\/\S+')
+    TRIGGERS = ('http',)
     PUNCTUATION = """.,;?'")-"""
 
     def find(self, node):
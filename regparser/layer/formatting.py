@@ -1,6 +1,7 @@
 """Find and abstracts formatting information from the regulation tree. In many
 ways, this is like a markdown parser."""
 import abc
+import hashlib
 import re
 from collections import OrderedDict
 
@@ -271,6 +272,16 @@ class Formatting(Layer):
     information"""
     shorthand = 'formatting'
 
+    def cache_key(self, node):
+        """Tables may be derived from the source XML, which isn't part of the
+        node's hash. Only XML containing tables needs to be hashed"""
+        source_xml = node.source_xml_as_text()
+        if source_xml is None:
+            return 'no-xml'     # tables come from the tagged_text
+        elif 'GPOTABLE' not in source_xml:
+            return ''
+        return hashlib.sha256(source_xml.encode('utf-8')).hexdigest()
+
     def process(self, node):
         layer_el = []
         for table_el in node_to_table_xml_els(node):
@@ -7,6 +7,7 @@ from collections import defaultdict
 import requests
 
 from regparser import content
+from regparser.index import url_checks
 from regparser.index.http_cache import http_client
 from regparser.layer.layer import Layer
 from regparser.web.settings import parser as settings
@@ -26,21 +27,33 @@ def check_url(url):
         return url
 
 
-def gid_to_url(gid):
-    """Take a few guesses as to where this image may be. This will be
+def candidate_urls(gid):
+    """Where this image may be, in order of preference. This will be
     simplified once FR.gov adds image data to their API"""
+    urls = []
     override = content.ImageOverrides().get(gid)
-    if override and check_url(override):
+    if override:
+        urls.append(override)
+    default = settings.DEFAULT_IMAGE_URL
+    png = settings.DEFAULT_IMAGE_URL.replace('.gif', '.png')
+    urls.extend([default % gid, default % gid.lower(), png % gid,
+                 png % gid.lower()])
+    return urls
+
+
+def gid_to_url(gid, url_exists=check_url):
+    """Take a few guesses as to where this image may be. `url_exists` can be
+    replaced if the urls have already been checked"""
+    override = content.ImageOverrides().get(gid)
+    if override and url_exists(override):
         return override
     elif override:
         logger.warning("Overridden image 404s: %s->%s", gid, override)
 
-    default = settings.DEFAULT_IMAGE_URL
-    png = settings.DEFAULT_IMAGE_URL.replace('.gif', '.png')
-    urls = [default % gid, default % gid.lower(), png % gid, png % gid.lower()]
+    urls = candidate_urls(gid)[1 if override else 0:]
     url = ""    # ensure variable is always defined
     for url in urls:
-        if check_url(url):
+        if url_exists(url):
             return url
 
     logger.warning("No image could be found for %s. Tried:\n%s",
@@ -53,9 +66,48 @@ class Graphics(Layer):
     ext = re.compile(r'\.(png|gif|jpg)$')
     shorthand = 'graphics'
 
+    def __init__(self, tree, **context):
+        super(Graphics, self).__init__(tree, **context)
+        self.url_exists = check_url
+
+    def pre_process(self):
+        """Find the image (and thumbnail) urls for the whole tree up front,
+        checking many at once rather than one at a time while processing.
+        Results are remembered between runs (see
+        regparser.index.url_checks)"""
+        gids = set()
+        stack = [self.tree]
+        while stack:
+            node = stack.pop()
+            gids.update(match.group('gid')
+                        for match in Graphics.gid.finditer(node.text))
+            stack.extend(node.children)
+        if not gids:
+            return
+
+        # Check candidates in order of preference, only trying the next
+        # for those gids which weren't found; each round checks all of the
+        # remaining gids at once
+        checked = {}
+        remaining = {gid: candidate_urls(gid) for gid in gids}
+        while remaining:
+            checked.update(url_checks.check_all(
+                [urls[0] for urls in remaining.values()], check_url))
+            remaining = {gid: urls[1:] for gid, urls in remaining.items()
+                         if len(urls) > 1 and not checked[urls[0]]}
+        urls = [gid_to_url(gid, checked.get) for gid in gids]
+        checked.update(url_checks.check_all(
+            (self.thumb_url(url) for url in urls), check_url))
+        self.url_exists = checked.get
+
+    @classmethod
+    def thumb_url(cls, url):
+        return cls.ext.sub(r'.thumb\g<0>', url)
+
     def check_for_thumb(self, url):
-        thumb_url = self.ext.sub(r'.thumb\g<0>', url)
-        return check_url(thumb_url)
+        thumb_url = self.thumb_url(url)
+        if self.url_exists(thumb_url):
+            return thumb_url
 
     def process(self, node):
         """If this node has a marker for an image in it, note where to get
@@ -67,7 +119,7 @@ class Graphics(Layer):
         layer_el = []
         for text in matches_by_text:
             match = matches_by_text[text][0]
-            url = gid_to_url(match.group('gid'))
+            url = gid_to_url(match.group('gid'), self.url_exists)
             layer_el_vals = {
                 'text': match.group(0),
                 'url': url,
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import json
 import logging
 
 from regparser.citations import Label, internal_citations
@@ -16,6 +18,7 @@ class InternalCitationParser(Layer):
         self.cfr_title = cfr_title
         self.known_citations = set()
         self.verify_citations = True
+        self._known_digest = None
 
     def pre_process(self):
         """As a preprocessing step, run through the entire tree, collecting
@@ -24,9 +27,24 @@ class InternalCitationParser(Layer):
             self.known_citations.add(tuple(node.label))
         walk(self.tree, per_node)
 
+    def cache_key(self, node):
+        """Citations are verified against the labels in the tree, so any
+        structural change invalidates them"""
+        if self._known_digest is None:
+            as_text = json.dumps(sorted(self.known_citations))
+            self._known_digest = hashlib.sha256(
+                as_text.encode('utf-8')).hexdigest()
+        return u'{0}:{1}:{2}'.format(self.cfr_title, self.verify_citations,
+                                     self._known_digest)
+
     def process(self, node):
-        citations_list = self.parse(node.text,
-                                    label=Label.from_node(node),
+        return self._citations(node, Label.from_node(node))
+
+    def process_derived(self, node, derived):
+        return self._citations(node, derived.citation_label)
+
+    def _citations(self, node, label):
+        citations_list = self.parse(node.text, label=label,
                                     title=str(self.cfr_title))
         if citations_list:
             return citations_list
@@ -1,10 +1,14 @@
 from __future__ import unicode_literals
 
+import json
 import re
 
+from cached_property import cached_property
+
 from regparser.layer.layer import Layer
 from regparser.layer.paragraph_markers import marker_of
 from regparser.layer.terms import Terms
+from regparser.web.settings import parser as settings
 
 KEYTERM_RE = re.compile(r'<E T="03">(?P<keyterm>[^<]*?)</E>', re.UNICODE)
 TRIM_FROM_KEYTERM = ['See also', 'See']
@@ -30,9 +34,21 @@ def keyterm_in_text(tagged_text):
 class KeyTerms(Layer):
     shorthand = 'keyterms'
 
+    @cached_property
+    def _config(self):
+        """Definitions (which are excluded) can be configured"""
+        return json.dumps(settings.INCLUDE_DEFINITIONS_IN, sort_keys=True)
+
+    def cache_key(self, node):
+        return self._config
+
     @classmethod
-    def keyterm_in_node(cls, node, ignore_definitions=True):
-        tagged = node.tagged_text.replace(marker_of(node), '', 1).strip()
+    def keyterm_in_node(cls, node, ignore_definitions=True, marker=None):
+        """Find the keyterm in a node. `marker` can be provided if the node's
+        paragraph marker has already been computed"""
+        if marker is None:
+            marker = marker_of(node)
+        tagged = node.tagged_text.replace(marker, '', 1).strip()
         keyterm = keyterm_in_text(tagged)
 
         if keyterm and not (ignore_definitions and
@@ -51,7 +67,14 @@ class KeyTerms(Layer):
     def process(self, node):
         """ Get keyterms if we have text in the node that preserves the
         <E> tags. """
-        keyterm = self.keyterm_in_node(node)
+        return self._element(self.keyterm_in_node(node))
+
+    def process_derived(self, node, derived):
+        return self._element(self.keyterm_in_node(node,
+                                                  marker=derived.marker))
+
+    @staticmethod
+    def _element(keyterm):
         if keyterm:
             return [{
                 "key_term": keyterm,
@@ -36,6 +36,21 @@ class Layer(six.with_metaclass(abc.ABCMeta)):
 
         raise NotImplementedError()
 
+    def process_derived(self, node, derived):
+        """Variant of `process` used when building several layers at once
+        (see regparser.layer.engine). `derived` holds values computed from
+        the node which are shared between layers; layers may override this to
+        use them. Overrides must remain equivalent to `process`"""
+        return self.process(node)
+
+    def cache_key(self, node):
+        """Layers may opt in to caching (see regparser.index.layer_cache) by
+        returning a string which, combined with the node's fields and those
+        of its descendants, determines the result of `process`. Any relevant
+        configuration or context (e.g. from `pre_process`) must be included.
+        None indicates the result can't be cached"""
+        return None
+
     def builder(self, node, cache=None):
         if cache:
             layer_element = cache.fetch_or_process(self, node)
@@ -64,10 +79,12 @@ class Layer(six.with_metaclass(abc.ABCMeta)):
             text_to_matches[text[start_fn(match):end_fn(match)]].append(match)
 
         for match_text, matches in sorted(text_to_matches.items()):
+            starts = {start_fn(match) for match in matches}
             locations, location = [], 0
             idx = text.find(match_text)
-            while idx != -1:
-                if any(start_fn(match) == idx for match in matches):
+            # Stop searching once every match has been located
+            while idx != -1 and len(locations) < len(starts):
+                if idx in starts:
                     locations.append(location)
                 location += 1
                 idx = text.find(match_text, idx + 1)
@@ -31,8 +31,18 @@ def marker_of(node):
 class ParagraphMarkers(Layer):
     shorthand = 'paragraph-markers'
 
+    def cache_key(self, node):
+        """Markers depend only on the node itself"""
+        return ''
+
     def process(self, node):
         """Look for any leading paragraph markers."""
-        marker = marker_of(node)
+        return self._element(marker_of(node))
+
+    def process_derived(self, node, derived):
+        return self._element(derived.marker)
+
+    @staticmethod
+    def _element(marker):
         if marker:
             return [{"text": marker, "locations": [0]}]
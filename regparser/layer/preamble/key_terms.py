@@ -7,9 +7,10 @@ class KeyTerms(BaseKeyTerms):
     """The CFR KeyTerms layer does _almost_ exactly what we want."""
 
     @classmethod
-    def keyterm_in_node(cls, node, ignore_definitions=True):
+    def keyterm_in_node(cls, node, ignore_definitions=True, marker=None):
         """Find the keyterm in a node. Requires a paragraph marker be present
-        (to limit false positives)"""
+        (to limit false positives). Preamble markers differ from those in the
+        CFR, so any provided `marker` is ignored"""
         marker = marker_of(node)
         if marker:
             tagged = node.tagged_text.replace(marker, '', 1).strip()
@@ -214,12 +214,13 @@ class Terms(Layer):
         search_terms = sorted(search_terms, key=lambda x: len(x[0]),
                               reverse=True)
 
+        lowered = text.lower()
         matches = []
         for term, ref in search_terms:
             re_term = r'\b' + re.escape(term) + r'\b'
             offsets = [
                 (m.start(), m.end())
-                for m in re.finditer(re_term, text.lower())]
+                for m in re.finditer(re_term, lowered)]
             safe_offsets = []
             for start, end in offsets:
                 #   Start is contained in an existing def
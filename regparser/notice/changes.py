@@ -24,7 +24,8 @@ def node_to_dict(node):
 
     node_dict = {}
     for k, v in node.__dict__.items():
-        if k not in ('children', 'source_xml'):
+        # private fields include the source_xml storage
+        if k != 'children' and not k.startswith('_'):
             node_dict[k] = v
     return node_dict
 
@@ -450,15 +450,17 @@ def local_copies(url):
     return []
 
 
-def notice_xmls_for_url(notice_url):
-    """Find, preprocess, and return the XML(s) associated with a particular FR
-    notice url"""
+def notice_xml_sources(notice_url):
+    """Find the raw XML(s) associated with a particular FR notice url.
+    Returns a list of (contents, source) pairs"""
     local_notices = local_copies(notice_url)
     if local_notices:
         logger.info("using local xml for %s", notice_url)
+        sources = []
         for local_notice_file in local_notices:
             with open(local_notice_file, 'rb') as f:
-                yield NoticeXML(f.read(), local_notice_file).preprocess()
+                sources.append((f.read(), local_notice_file))
+        return sources
     else:
         # ignore initial slash
         path_parts = urlparse(notice_url).path[1:].split('/')
@@ -469,7 +471,14 @@ def notice_xmls_for_url(notice_url):
         if response.status_code != requests.codes.ok:
             logger.info('failed. fetching from %s', notice_url)
             response = client.get(notice_url)
-        yield NoticeXML(response.content, notice_url).preprocess()
+        return [(response.content, notice_url)]
+
+
+def notice_xmls_for_url(notice_url):
+    """Find, preprocess, and return the XML(s) associated with a particular FR
+    notice url"""
+    for contents, source in notice_xml_sources(notice_url):
+        yield NoticeXML(contents, source).preprocess()
 
 
 def xmls_for_url(notice_url):
@@ -3,6 +3,26 @@ from collections import defaultdict
 
 from stevedore.extension import ExtensionManager
 
+# Scanning entry points is slow, so we only do so once per namespace
+_registry = {}
+
+
+def extensions(namespace):
+    """All of the (stevedore) extensions registered in this namespace. Scans
+    are cached for the life of the process; see `reload`"""
+    if namespace not in _registry:
+        _registry[namespace] = tuple(ExtensionManager(namespace))
+    return _registry[namespace]
+
+
+def reload(namespace=None):
+    """Forget cached scans of this namespace (or of all namespaces), e.g. if
+    plugins have been installed or mocked out"""
+    if namespace is None:
+        _registry.clear()
+    else:
+        _registry.pop(namespace, None)
+
 
 def update_dictionary(namespace, original):
     """
@@ -11,7 +31,7 @@ def update_dictionary(namespace, original):
     """
     result = defaultdict(list, original)
 
-    for extension in ExtensionManager(namespace):
+    for extension in extensions(namespace):
         assert isinstance(extension.plugin, dict)
         for key, value in extension.plugin.items():
             result[key].extend(value)
@@ -21,15 +41,15 @@ def update_dictionary(namespace, original):
 def instantiate_if_possible(namespace, method_name=None):
     """We'll sometimes want to mix pure functions with state-holding object
     instances. This functions combines the two into a single interface."""
-    extensions = []
-    for extension in ExtensionManager(namespace):
+    instances = []
+    for extension in extensions(namespace):
         if inspect.isclass(extension.plugin) and method_name is None:
             # assume the plugin object is a callable
-            extensions.append(extension.plugin())
+            instances.append(extension.plugin())
         elif inspect.isclass(extension.plugin):
-            extensions.append(getattr(extension.plugin(), method_name))
+            instances.append(getattr(extension.plugin(), method_name))
         else:
-            extensions.append(extension.plugin)
-    extensions = list(sorted(extensions,
-                             key=lambda e: getattr(e, 'plugin_order', 0)))
-    return extensions
+            instances.append(extension.plugin)
+    instances = list(sorted(instances,
+                            key=lambda e: getattr(e, 'plugin_order', 0)))
+    return instances
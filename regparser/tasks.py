@@ -1,12 +1,26 @@
 import logging
 
 import django_rq
-from rq import get_current_job
+from rq import Worker, get_current_job
 from six import StringIO
 
+from regparser import grammar
+from regparser.commands.retry import sub_commands
 from regparser.web.management.commands import eregs
 
 
+class WarmWorker(Worker):
+    """Workers fork a new process for each job; construct the grammars and
+    import all of the commands before that point so jobs needn't repeat the
+    work. Use via
+        python manage.py rqworker --worker-class regparser.tasks.WarmWorker
+    """
+    def __init__(self, *args, **kwargs):
+        super(WarmWorker, self).__init__(*args, **kwargs)
+        grammar.warm_up()
+        sub_commands()
+
+
 def run_eregs_command(eregs_args):
     """Run `eregs *eregs_args`, capturing all of the logs and storing them in
     Redis"""
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from six.moves import BaseHTTPServer, socketserver
+
+StubRequest = namedtuple('StubRequest', ['method', 'path', 'headers', 'body'])
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Records each request, responding with the next status queued for its
+    path in `server.statuses` (200 if there are none). Requests for paths
+    starting with /slow take a little while, so that the number in flight
+    can be tracked"""
+    def respond(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        headers = {key.lower(): self.headers[key] for key in self.headers}
+        with server.lock:
+            server.requests.append(
+                StubRequest(self.command, self.path, headers, body))
+            server.in_flight += 1
+            server.max_in_flight = max(server.in_flight, server.max_in_flight)
+            statuses = server.statuses.get(self.path)
+            status = statuses.pop(0) if statuses else 200
+        if self.path.startswith('/slow'):
+            time.sleep(0.05)
+        with server.lock:
+            server.in_flight -= 1
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    do_GET = do_POST = respond  # noqa - names are defined by the base class
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def url(self, path):
+        return 'http://127.0.0.1:{0}{1}'.format(self.server_address[1], path)
+
+    @property
+    def paths(self):
+        return [request.path for request in self.requests]
+
+
+@contextmanager
+def stub_server():
+    """Run a local HTTP server (see StubHandler) for the duration of the
+    block, for tests which need real sockets"""
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server.lock = threading.Lock()
+    server.requests, server.statuses = [], {}
+    server.in_flight, server.max_in_flight = 0, 0
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,189 @@
+"""A compact, binary representation of Node trees. Rather than nested JSON,
+nodes are stored as a struct-of-arrays: one column per field, with every
+string (label components, node types, text, etc.) interned into a single
+table. Nodes are stored in pre-order, so each subtree is a contiguous range of
+rows; this lets a reader decode a single section without touching the rest of
+the regulation.
+
+Layout (all integers are little-endian uint32):
+    header: MAGIC, node count, string count, label reference count
+    string offsets: string count + 1 entries into the string blob
+    node columns: len(COLUMNS) columns, each node count entries
+    label references: indexes into the string table
+    string blob: concatenated, UTF-8 encoded strings
+"""
+from __future__ import absolute_import
+
+import struct
+
+from regparser.tree.struct import Node
+
+MAGIC = b'EREGSCT1'
+HEADER = struct.Struct('<8sIII')
+NONE = 0xFFFFFFFF   # stand-in for None/no parent
+COLUMNS = ('parent', 'subtree_end', 'label_start', 'label_len', 'node_type',
+           'text', 'title', 'tagged_text', 'source_xml')
+_COL_IDX = {column: idx for idx, column in enumerate(COLUMNS)}
+
+
+def is_columnar(content):
+    """Does this binary content look like our format?"""
+    return content[:len(MAGIC)] == MAGIC
+
+
+def encode(root):
+    """Convert a tree of Nodes into bytes"""
+    strings, string_idxs = [], {}
+
+    def intern(value):
+        if value is None:
+            return NONE
+        if value not in string_idxs:
+            string_idxs[value] = len(strings)
+            strings.append(value)
+        return string_idxs[value]
+
+    columns = {column: [] for column in COLUMNS}
+    label_refs = []
+    stack = [(root, NONE)]
+    while stack:
+        node, parent_idx = stack.pop()
+        node_idx = len(columns['parent'])
+        columns['parent'].append(parent_idx)
+        columns['subtree_end'].append(node_idx + 1)
+        columns['label_start'].append(len(label_refs))
+        columns['label_len'].append(len(node.label))
+        label_refs.extend(intern(part) for part in node.label)
+        columns['node_type'].append(intern(node.node_type))
+        columns['text'].append(intern(node.text))
+        columns['title'].append(intern(node.title))
+        columns['tagged_text'].append(intern(node.tagged_text))
+        columns['source_xml'].append(intern(node.source_xml_as_text()))
+        stack.extend((child, node_idx) for child in reversed(node.children))
+
+    # Children always follow their parents, so one backwards pass suffices
+    subtree_end = columns['subtree_end']
+    for node_idx in range(len(subtree_end) - 1, 0, -1):
+        parent_idx = columns['parent'][node_idx]
+        subtree_end[parent_idx] = max(subtree_end[parent_idx],
+                                      subtree_end[node_idx])
+
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = [0]
+    for as_bytes in encoded:
+        offsets.append(offsets[-1] + len(as_bytes))
+
+    node_count = len(columns['parent'])
+    parts = [HEADER.pack(MAGIC, node_count, len(strings), len(label_refs)),
+             _pack_ints(offsets)]
+    parts.extend(_pack_ints(columns[column]) for column in COLUMNS)
+    parts.append(_pack_ints(label_refs))
+    parts.extend(encoded)
+    return b''.join(parts)
+
+
+def _pack_ints(values):
+    return struct.pack('<{0}I'.format(len(values)), *values)
+
+
+class ColumnarTree(object):
+    """Lazy reader for the encoded format. Accepts any buffer (bytes,
+    memoryview, mmap); fields are only decoded when a node is requested"""
+    def __init__(self, content):
+        self.content = content
+        magic, self.node_count, self.string_count, label_ref_count = \
+            HEADER.unpack_from(content, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a columnar tree")
+        self._offsets_start = HEADER.size
+        self._columns_start = self._offsets_start + 4 * (self.string_count + 1)
+        self._label_refs_start = (self._columns_start +
+                                  4 * len(COLUMNS) * self.node_count)
+        self._strings_start = self._label_refs_start + 4 * label_ref_count
+        self._strings = {}
+        self._label_index = None
+
+    def __len__(self):
+        return self.node_count
+
+    def _column(self, column, start, end):
+        """Values for a contiguous range of nodes"""
+        offset = self._columns_start + 4 * (
+            _COL_IDX[column] * self.node_count + start)
+        return struct.unpack_from('<{0}I'.format(end - start), self.content,
+                                  offset)
+
+    def _string(self, string_idx):
+        if string_idx == NONE:
+            return None
+        if string_idx not in self._strings:
+            start, end = struct.unpack_from(
+                '<2I', self.content, self._offsets_start + 4 * string_idx)
+            # bytes() of a memoryview is its repr in Python 2
+            as_bytes = memoryview(self.content)[self._strings_start + start:
+                                                self._strings_start + end]
+            self._strings[string_idx] = as_bytes.tobytes().decode('utf-8')
+        return self._strings[string_idx]
+
+    def _labels(self, start, end):
+        """Labels (as lists of strings) for a contiguous range of nodes"""
+        label_starts = self._column('label_start', start, end)
+        label_lens = self._column('label_len', start, end)
+        if not label_starts:
+            return []
+        first = label_starts[0]
+        last = label_starts[-1] + label_lens[-1]
+        refs = struct.unpack_from('<{0}I'.format(last - first), self.content,
+                                  self._label_refs_start + 4 * first)
+        return [[self._string(ref)
+                 for ref in refs[label_start - first:
+                                 label_start - first + label_len]]
+                for label_start, label_len in zip(label_starts, label_lens)]
+
+    def index_of(self, label_id):
+        """Find the row for a node by its label_id. Only labels are decoded
+        to build this lookup"""
+        if self._label_index is None:
+            self._label_index = {
+                '-'.join(label): node_idx for node_idx, label
+                in enumerate(self._labels(0, self.node_count))}
+        return self._label_index.get(label_id)
+
+    def child_label_ids(self, node_idx=0):
+        """Label ids for the immediate children of a node, without decoding
+        any other fields"""
+        end = self._column('subtree_end', node_idx, node_idx + 1)[0]
+        parents = self._column('parent', node_idx, end)
+        labels = self._labels(node_idx, end)
+        return ['-'.join(label) for label, parent in zip(labels, parents)
+                if parent == node_idx]
+
+    def node(self, node_idx=0, include_source_xml=True):
+        """Decode the subtree rooted at this row into Nodes"""
+        end = self._column('subtree_end', node_idx, node_idx + 1)[0]
+        columns = {column: self._column(column, node_idx, end)
+                   for column in COLUMNS}
+        labels = self._labels(node_idx, end)
+
+        built = []
+        for offset, label in enumerate(labels):
+            node = Node(text=self._string(columns['text'][offset]),
+                        label=label,
+                        title=self._string(columns['title'][offset]),
+                        node_type=self._string(columns['node_type'][offset]),
+                        tagged_text=self._string(
+                            columns['tagged_text'][offset]))
+            source_xml = self._string(columns['source_xml'][offset])
+            if include_source_xml and source_xml:
+                node._source_xml_text = source_xml
+            if offset:
+                parent = built[columns['parent'][offset] - node_idx]
+                parent.children.append(node)
+            built.append(node)
+        return built[0]
+
+    def find(self, label_id, include_source_xml=True):
+        """Decode only the subtree with this label_id (or None)"""
+        node_idx = self.index_of(label_id)
+        if node_idx is not None:
+            return self.node(node_idx, include_source_xml)
@@ -1,5 +1,6 @@
 import hashlib
 import re
+from collections import OrderedDict
 from json import JSONEncoder
 
 import six
@@ -48,11 +49,55 @@ class Node(object):
             repr(self.title), repr(self.node_type)
         )
 
+    @property
+    def source_xml(self):
+        """Nodes decoded from the index hold on to their XML as text, only
+        parsing it if it is requested"""
+        if self._source_xml_text is not None:
+            self._source_xml = etree.fromstring(self._source_xml_text)
+            self._source_xml_text = None
+        return self._source_xml
+
+    @source_xml.setter
+    def source_xml(self, value):
+        self._source_xml = value
+        self._source_xml_text = None
+
+    def source_xml_as_text(self):
+        """Serialized source_xml, avoiding a parse if we've not needed one"""
+        if self._source_xml_text is not None:
+            return self._source_xml_text
+        elif self._source_xml is not None:
+            return etree.tounicode(self._source_xml)
+
+    def _sort_key(self):
+        """Fields in the same order as __repr__. Children are compared
+        element-wise, so ordering stops at the first differing child"""
+        return (self.text, self.children, self.label, self.title or '',
+                self.node_type)
+
     def __lt__(self, other):
-        return repr(self) < repr(other)
+        return self._sort_key() < other._sort_key()
 
     def __eq__(self, other):
-        return repr(self) == repr(other)
+        """Field-wise equality. Scalar fields are checked before descending
+        into children so that mismatches exit early without serializing
+        either subtree"""
+        if self is other:
+            return True
+        if not isinstance(other, Node):
+            return NotImplemented
+        return (self.node_type == other.node_type and
+                self.label == other.label and
+                self.title == other.title and
+                self.text == other.text and
+                self.children == other.children)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
 
     @property
     def cfr_part(self):
@@ -104,7 +149,8 @@ class NodeEncoder(JSONEncoder):
             fields = dict(obj.__dict__)
             if obj.title is None:
                 del fields['title']
-            for field in ('tagged_text', 'source_xml', 'child_labels'):
+            for field in ('tagged_text', '_source_xml', '_source_xml_text',
+                          'child_labels'):
                 if field in fields:
                     del fields[field]
             return fields
@@ -119,9 +165,8 @@ class FullNodeEncoder(JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Node):
             result = {field: getattr(obj, field, None)
-                      for field in self.FIELDS}
-            if obj.source_xml is not None:
-                result['source_xml'] = etree.tounicode(obj.source_xml)
+                      for field in self.FIELDS - {'source_xml'}}
+            result['source_xml'] = obj.source_xml_as_text()
             return result
         return super(FullNodeEncoder, self).default(obj)
 
@@ -130,9 +175,10 @@ def full_node_decode_hook(d):
     """Convert a JSON object into a full Node"""
     if set(d.keys()) == FullNodeEncoder.FIELDS:
         params = dict(d)
+        source_xml = params.pop('source_xml')
         node = Node(**params)
-        if node.source_xml:
-            node.source_xml = etree.fromstring(node.source_xml)
+        if source_xml:
+            node._source_xml_text = source_xml
         return node
     return d
 
@@ -147,6 +193,75 @@ def frozen_node_decode_hook(d):
     return d
 
 
+def full_node_to_dict(root, include_source_xml=True):
+    """Convert a tree of Nodes into nested dicts with the same fields as
+    FullNodeEncoder. Unlike the encoder, this does not rely on a `default`
+    callback per node and does not recurse, so the result can be handed to
+    the (C-accelerated) json.dumps directly."""
+    result = None
+    stack = [(root, None)]
+    while stack:
+        node, siblings = stack.pop()
+        as_dict = {'text': node.text, 'children': [], 'label': node.label,
+                   'title': node.title, 'node_type': node.node_type,
+                   'tagged_text': node.tagged_text, 'source_xml': None}
+        if include_source_xml:
+            as_dict['source_xml'] = node.source_xml_as_text()
+
+        if siblings is None:
+            result = as_dict
+        else:
+            siblings.append(as_dict)
+        stack.extend((child, as_dict['children'])
+                     for child in reversed(node.children))
+    return result
+
+
+def full_node_from_dict(root_dict, include_source_xml=True):
+    """Inverse of full_node_to_dict. Any source_xml is left as text until the
+    Node's source_xml is accessed; if include_source_xml is False, it's
+    dropped entirely."""
+    root = None
+    stack = [(root_dict, None)]
+    while stack:
+        as_dict, parent = stack.pop()
+        node = Node(text=as_dict['text'], label=as_dict['label'],
+                    title=as_dict['title'], node_type=as_dict['node_type'],
+                    tagged_text=as_dict['tagged_text'])
+        if include_source_xml and as_dict.get('source_xml'):
+            node._source_xml_text = as_dict['source_xml']
+
+        if parent is None:
+            root = node
+        else:
+            parent.children.append(node)
+        stack.extend((child, node) for child in reversed(as_dict['children']))
+    return root
+
+
+def frozen_node_from_dict(root_dict):
+    """Like full_node_from_dict, but builds FrozenNodes. As FrozenNodes must
+    be constructed after their children, this walks the dicts in post-order"""
+    built = []
+    stack = [(root_dict, False)]
+    while stack:
+        as_dict, children_built = stack.pop()
+        if children_built:
+            split = len(built) - len(as_dict['children'])
+            children, built[split:] = built[split:], []
+            fresh = FrozenNode(
+                text=as_dict['text'], children=children,
+                label=as_dict['label'], title=as_dict['title'],
+                node_type=as_dict['node_type'],
+                tagged_text=as_dict['tagged_text'])
+            built.append(fresh.prototype())
+        else:
+            stack.append((as_dict, True))
+            stack.extend((child, False)
+                         for child in reversed(as_dict['children']))
+    return built[0]
+
+
 def walk(node, fn):
     """Perform fn for every node in the tree. Pre-order traversal. fn must
     be a function that accepts a root node."""
@@ -195,49 +310,50 @@ def find_parent(root, label):
 
 def merge_duplicates(nodes):
     """Given a list of nodes with the same-length label, merge any
-    duplicates (by combining their children)"""
-    found_pair = None
-    for lidx, lhs in enumerate(nodes):
-        for ridx, rhs in enumerate(nodes[lidx + 1:], lidx + 1):
-            if lhs.label == rhs.label:
-                found_pair = (lidx, ridx)
-    if found_pair:
-        lidx, ridx = found_pair
-        lhs, rhs = nodes[lidx], nodes[ridx]
-        lhs.children.extend(rhs.children)
-        return merge_duplicates(nodes[:ridx] + nodes[ridx + 1:])
-    else:
-        return nodes
+    duplicates (by combining their children). The first node with each label
+    is retained, in its original position"""
+    by_label = OrderedDict()
+    for node in nodes:
+        key = tuple(node.label)
+        if key in by_label:
+            by_label[key].children.extend(node.children)
+        else:
+            by_label[key] = node
+    return list(by_label.values())
 
 
 def treeify(nodes):
     """Given a list of nodes, convert those nodes into the appropriate tree
     structure based on their labels. This assumes that all nodes will fall
-    under a set of 'root' nodes, which have the min-length label."""
+    under a set of 'root' nodes, which have the min-length label. Rather than
+    scanning the full list once per root, we group nodes by the label prefix
+    they share with a root."""
     if not nodes:
         return nodes
 
-    min_len, with_min = len(nodes[0].label), []
+    min_len = min(len(node.label) for node in nodes)
+    roots = merge_duplicates([node for node in nodes
+                              if len(node.label) == min_len])
+
+    # Interpretation roots ("1-Interp") claim everything under "1"
+    root_by_prefix = {}
+    for root in roots:
+        prefix = tuple(root.label)
+        if prefix and prefix[-1] == Node.INTERP_MARK:
+            prefix = prefix[:-1]
+        root_by_prefix[prefix] = root
 
+    prefix_lens = {len(prefix) for prefix in root_by_prefix}
+    children_by_root = {id(root): [] for root in roots}
     for node in nodes:
-        if len(node.label) == min_len:
-            with_min.append(node)
-        elif len(node.label) < min_len:
-            min_len = len(node.label)
-            with_min = [node]
-    with_min = merge_duplicates(with_min)
-
-    roots = []
-    for root in with_min:
-        label = root.label
-        if root.label[-1] == Node.INTERP_MARK:
-            label = root.label[:-1]
-
-        def is_child(node):
-            return node.label[:len(label)] == label
-        children = [n for n in nodes if n.label != root.label and is_child(n)]
-        root.children = root.children + treeify(children)
-        roots.append(root)
+        label = tuple(node.label)
+        for prefix_len in prefix_lens:
+            root = root_by_prefix.get(label[:prefix_len])
+            if root is not None and node.label != root.label:
+                children_by_root[id(root)].append(node)
+
+    for root in roots:
+        root.children = root.children + treeify(children_by_root[id(root)])
     return roots
 
 
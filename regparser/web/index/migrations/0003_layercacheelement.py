@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('index', '0002_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LayerCacheElement',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('contents', models.TextField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('index', '0003_layercacheelement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnualVolume',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('title', models.IntegerField()),
+                ('vol_num', models.IntegerField()),
+                ('part_start', models.IntegerField(null=True)),
+                ('part_end', models.IntegerField(null=True)),
+            ],
+            options={
+                'ordering': ['year', 'title', 'vol_num'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='annualvolume',
+            unique_together=set([('year', 'title', 'vol_num')]),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('index', '0004_annualvolume'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckedUrl',
+            fields=[
+                ('url', models.CharField(max_length=512, primary_key=True, serialize=False)),
+                ('exists', models.BooleanField()),
+                ('checked', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
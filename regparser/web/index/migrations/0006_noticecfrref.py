@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('index', '0005_checkedurl'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoticeCFRRef',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cfr_title', models.IntegerField()),
+                ('cfr_part', models.IntegerField(null=True)),
+                ('notice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cfr_refs', to='index.Entry')),
+            ],
+        ),
+    ]
@@ -26,3 +26,42 @@ class Entry(models.Model):
 
     class Meta:
         ordering = ['label']
+
+
+class LayerCacheElement(models.Model):
+    """Layer elements, keyed by a digest of the layer, its context, and the
+    node it describes. See regparser.index.layer_cache"""
+    key = models.CharField(max_length=64, primary_key=True)
+    contents = models.TextField()
+
+
+class AnnualVolume(models.Model):
+    """Which parts each (existing) annual edition volume covers. Discovering
+    this requires probing GPO, so we retain the results. A volume whose span
+    couldn't be determined has no part_start. See regparser.history.annual"""
+    year = models.IntegerField()
+    title = models.IntegerField()
+    vol_num = models.IntegerField()
+    part_start = models.IntegerField(null=True)
+    part_end = models.IntegerField(null=True)   # null indicates "to end"
+
+    class Meta:
+        ordering = ['year', 'title', 'vol_num']
+        unique_together = ('year', 'title', 'vol_num')
+
+
+class CheckedUrl(models.Model):
+    """Whether content exists at a URL, as of when it was checked. See
+    regparser.index.url_checks"""
+    url = models.CharField(max_length=512, primary_key=True)
+    exists = models.BooleanField()
+    checked = models.DateTimeField(auto_now=True)
+
+
+class NoticeCFRRef(models.Model):
+    """A CFR title and part which a notice in the index references, recorded
+    when the notice is written so that notices can be filtered without
+    parsing their XML. `cfr_part` is null for titles without parts"""
+    notice = models.ForeignKey(Entry, related_name='cfr_refs')
+    cfr_title = models.IntegerField()
+    cfr_part = models.IntegerField(null=True)
@@ -65,6 +65,9 @@ class Command(BaseCommand):
             docker run -p 6379:6379 -d redis
         2. start a worker process
             python manage.py rqworker
+           or, to construct grammars once rather than for each job,
+            python manage.py rqworker \\
+                --worker-class regparser.tasks.WarmWorker
         3. run an asynchronous command
             python manage.py async_eregs pipeline 27 479 async_output_dir
         4. check the status of your jobs:
@@ -1,13 +1,16 @@
 import logging
 import os
+import pkgutil
 import sys
+from importlib import import_module
 
 import click
 import coloredlogs
-import ipdb
+from django.apps import apps
 from django.core import management
 from django.db import connections
 from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
 from djclick.adapter import BaseRegistrator, DjangoCommandMixin
 
 from regparser.commands.retry import RetryingCommand
@@ -21,19 +24,40 @@ class DjangoCommandRegistrator(BaseRegistrator):
     cls = type('RetryDjangoCommand', (DjangoCommandMixin, RetryingCommand), {})
 
 
+def disk_migrations():
+    """All migrations on disk, as (app label, migration name) pairs. Unlike
+    Django's MigrationLoader, this only lists the migration modules; it
+    doesn't import them or build a graph"""
+    migrations = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            module = import_module(module_name)
+        except ImportError:
+            continue
+        for _, name, _ in pkgutil.iter_modules(getattr(module, '__path__',
+                                                       [])):
+            if name[0] not in '_.~':
+                migrations.add((app_config.label, name))
+    return migrations
+
+
 @DjangoCommandRegistrator()
 @click.option('--debug/--no-debug', default=False)
 def cli(debug):
     log_level = logging.INFO
     if debug:
         log_level = logging.DEBUG
+        import ipdb     # slow to import, so only do so when needed
         sys.excepthook = lambda t, v, tb: ipdb.post_mortem(tb)
     coloredlogs.install(
         level=log_level,
         fmt=os.getenv("COLOREDLOGS_LOG_FORMAT", DEFAULT_LOG_FORMAT))
 
-    connection = connections['default']
-    loader = MigrationLoader(connection, ignore_no_migrations=True)
-    all_migrations = set(loader.disk_migrations.keys())
-    if all_migrations != loader.applied_migrations:
+    # Any mismatch (including false alarms, e.g. from squashed migrations)
+    # falls through to `migrate`, which knows the details
+    recorder = MigrationRecorder(connections['default'])
+    if disk_migrations() != recorder.applied_migrations():
         management.call_command('migrate', noinput=True)
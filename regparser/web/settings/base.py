@@ -133,12 +133,41 @@ RQ_QUEUES = {
 
 
 EREGS_INDEX_ROOT = os.environ.get('EREGS_CACHE_DIR', '.eregs_index')
+# How trees are stored in the index: 'json' or 'columnar' (a compact, binary
+# format which can be partially decoded). Either can be read regardless.
+EREGS_TREE_FORMAT = os.environ.get('EREGS_TREE_FORMAT', 'json')
+# 'whole' trees are stored as a single record. The 'sectioned' layout stores
+# each section, appendix, and interpretation as its own record, so that they
+# can be read individually; it is always stored as JSON, whatever the
+# EREGS_TREE_FORMAT. Either can be read regardless.
+EREGS_TREE_LAYOUT = os.environ.get('EREGS_TREE_LAYOUT', 'whole')
 
 REQUESTS_CACHE = {
     'backend': 'sqlite',
     'cache_name': os.path.join(EREGS_INDEX_ROOT, 'http_cache'),
     'expire_after': 60 * 60 * 24 * 3      # 3 days
 }
+# Limit concurrent requests to any one host (see regparser.index.http_cache)
+HTTP_MAX_PER_HOST = 4
+# Connection errors and 5XX responses are retried with exponential backoff;
+# HTTP_BACKOFF is the base delay, in seconds
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+# How long to trust a check of whether a URL (e.g. an image) exists
+URL_CHECK_TTL = 60 * 60 * 24 * 7    # 1 week
+# Uploads to a regulations-core API (see regparser.api_writer) run this many
+# at a time; bodies can optionally be gzipped, if the server accepts that
+API_WRITER_CONCURRENCY = 4
+API_WRITER_GZIP = False
+# Files written by an export (see regparser.api_writer.FSExporter) at a time
+FS_WRITER_CONCURRENCY = 8
+# Tasks the `pipeline` command runs at a time (see
+# regparser.commands.scheduler). Concurrent tasks write to the index at the
+# same time, which SQLite handles poorly; raise this with e.g. Postgres
+PIPELINE_WORKERS = 1
+# Missing dependencies (see regparser.commands.retry) resolved at a time.
+# As above, resolutions write to the index
+RESOLUTION_WORKERS = 1
 
 FILE_UPLOAD_HANDLERS = [
     "django.core.files.uploadhandler.TemporaryFileUploadHandler"]
@@ -4,3 +4,4 @@ REQUESTS_CACHE = {
     'backend': 'memory',
     'expire_after': 0   # immediately expire
 }
+HTTP_BACKOFF = 0
@@ -1,13 +1,21 @@
+import gzip
 import json
 import os
 import shutil
 import tempfile
+import time
 from unittest import TestCase
 
-from regparser.api_writer import (APIWriteContent, Client, FSWriteContent,
-                                  GitWriteContent, Repo)
+import pytest
+import six
+
+from regparser.api_writer import (APIUploader, APIWriteContent, APIWriteError,
+                                  BackgroundWriter, Client, FSExporter,
+                                  FSWriteContent, GitWriteContent, Repo,
+                                  WriteError, write_atomically)
 from regparser.notice.amdparser import Amendment
 from regparser.test_utils.http_mixin import HttpMixin
+from regparser.test_utils.http_stub import stub_server as run_stub_server
 from regparser.tree.struct import Node
 
 
@@ -152,6 +160,75 @@ class GitWriteContentTest(TestCase):
         self.assertEqual(0, len(commit.parents))
 
 
+def git_tree():
+    return Node('Root text', label=['1111'], title='Regulation Joe',
+                children=[Node('Sect', label=['1111', '1'], children=[
+                    Node('(a) A', label=['1111', '1', 'a']),
+                    Node('(b) B', label=['1111', '1', 'b'])])])
+
+
+def test_git_write_incremental(tmpdir):
+    """Only files which have changed should be rewritten; removed nodes'
+    files (and empty directories) should be deleted"""
+    tree = git_tree()
+    GitWriteContent(str(tmpdir), 'regulation', '1111', 'v1').write(tree)
+    repo_dir = tmpdir.join('regulation', '1111')
+    inodes = {path: repo_dir.join(*path.split('/')).stat().ino
+              for path in ('index.md', '1/index.md', '1/a/index.md')}
+
+    tree.children[0].children[0].text = '(a) Changed'
+    tree.children[0].children = tree.children[0].children[:1]
+    GitWriteContent(str(tmpdir), 'regulation', '1111', 'v2').write(tree)
+
+    assert repo_dir.join('index.md').stat().ino == inodes['index.md']
+    assert repo_dir.join('1', 'a', 'index.md').stat().ino \
+        != inodes['1/a/index.md']
+    assert repo_dir.join('1', 'a', 'index.md').read().endswith('(a) Changed')
+    assert not repo_dir.join('1', 'b').exists()
+
+    repo = Repo(str(repo_dir))
+    assert not repo.is_dirty(untracked_files=True)
+    changed = {diff.a_path for diff in repo.head.commit.diff('HEAD~1')}
+    # "1" changed, as it now has only one child
+    assert changed == {'1/index.md', '1/a/index.md', '1/b/index.md'}
+
+
+def test_git_write_no_working_tree(tmpdir):
+    """Commits can be built without touching the working tree"""
+    client = Client('git://' + str(tmpdir), working_tree=False)
+    client.regulation('1111', 'v1').write(git_tree())
+
+    repo_dir = tmpdir.join('regulation', '1111')
+    assert [p.basename for p in repo_dir.listdir()] == ['.git']
+    commit = Repo(str(repo_dir)).head.commit
+    assert commit.message == 'v1'
+    blob = commit.tree / '1' / 'b' / 'index.md'
+    assert blob.data_stream.read().decode('utf-8').endswith('(b) B')
+
+
+def test_git_write_then_working_tree(tmpdir, monkeypatch):
+    """Deleting files which were never checked out shouldn't fail, and
+    unchanged blobs shouldn't be stored again"""
+    tree = git_tree()
+    Client('git://' + str(tmpdir), working_tree=False).regulation(
+        '1111', 'v1').write(tree)
+    stored = []
+    store_blob = GitWriteContent._store_blob
+    monkeypatch.setattr(GitWriteContent, '_store_blob', staticmethod(
+        lambda repo, contents: stored.append(contents) or
+        store_blob(repo, contents)))
+
+    tree.children[0].children = tree.children[0].children[:1]
+    GitWriteContent(str(tmpdir), 'regulation', '1111', 'v2').write(tree)
+    assert not tmpdir.join('regulation', '1111', '1', 'b').exists()
+    commit = Repo(str(tmpdir.join('regulation', '1111'))).head.commit
+    assert commit.message == 'v2'
+    # Only "1" changed, as it now has only one child
+    blob = commit.tree / '1' / 'index.md'
+    assert stored == [blob.data_stream.read()]
+    assert GitWriteContent.blob_sha(stored[0]) == blob.binsha
+
+
 def test_regulation(tmpdir):
     reg_writer = Client(str(tmpdir)).regulation("lablab", "docdoc")
     assert reg_writer.path == str(
@@ -208,3 +285,138 @@ def test_writer_class_api():
     client = Client('https://example.com/then/more')
     assert client.base == 'https://example.com/then/more'
     assert client.writer_class == APIWriteContent
+
+
+@pytest.fixture
+def stub_server():
+    with run_stub_server() as server:
+        yield server
+
+
+def test_client_api_writes(stub_server):
+    """Writes to an API are sent concurrently, but have all completed after
+    a flush"""
+    client = Client(stub_server.url('/slow'))
+    for idx in range(10):
+        client.notice(str(idx)).write({'idx': idx})
+    client.flush()
+
+    assert sorted(stub_server.paths) == sorted(
+        '/slow/notice/{0}'.format(idx) for idx in range(10))
+    assert all(request.method == 'POST' for request in stub_server.requests)
+    assert all(request.headers['content-type'] == 'application/json'
+               for request in stub_server.requests)
+    bodies = [json.loads(request.body.decode('utf-8'))
+              for request in stub_server.requests]
+    assert sorted(body['idx'] for body in bodies) == list(range(10))
+    assert 1 < stub_server.max_in_flight <= 4
+    client.close()
+
+
+def test_uploader_failures(stub_server):
+    """Server errors are retried; the remaining failures are collected and
+    raised together"""
+    stub_server.statuses.update({'/a': [503], '/b': [400], '/c': [404]})
+    uploader = APIUploader()
+    for path in ('/a', '/b', '/c', '/d'):
+        uploader.queue(stub_server.url(path), b'{}')
+    with pytest.raises(APIWriteError) as excinfo:
+        uploader.flush()
+
+    failed = sorted(url for url, _ in excinfo.value.failures)
+    assert failed == [stub_server.url('/b'), stub_server.url('/c')]
+    assert sorted(stub_server.paths) == ['/a', '/a', '/b', '/c', '/d']
+    uploader.flush()    # failures were cleared
+    uploader.close()
+
+
+def test_uploader_gzip(stub_server):
+    """Bodies can optionally be compressed"""
+    uploader = APIUploader(compress=True)
+    uploader.queue(stub_server.url('/path'), b'{"some": "json"}')
+    uploader.close()
+
+    request = stub_server.requests[0]
+    assert request.headers['content-encoding'] == 'gzip'
+    unzipped = gzip.GzipFile(fileobj=six.BytesIO(request.body)).read()
+    assert unzipped == b'{"some": "json"}'
+
+
+def test_fs_exporter_skips_unchanged(tmpdir):
+    """Files are only replaced if their contents change"""
+    client = Client(str(tmpdir))
+    client.notice('a').write({'some': 'value'})
+    client.notice('b').write({'other': 'value'})
+    client.close()
+    path_a, path_b = tmpdir.join('notice', 'a'), tmpdir.join('notice', 'b')
+    inode_a, inode_b = path_a.stat().ino, path_b.stat().ino
+
+    client = Client(str(tmpdir))
+    client.notice('a').write({'some': 'value'})
+    client.notice('b').write({'other': 'changed'})
+    exporter = client.background
+    client.close()
+    assert (exporter.written, exporter.skipped) == (1, 1)
+    assert path_a.stat().ino == inode_a
+    assert path_b.stat().ino != inode_b
+    assert json.loads(path_b.read()) == {'other': 'changed'}
+    assert [p.basename for p in tmpdir.join('notice').listdir()] \
+        in (['a', 'b'], ['b', 'a'])  # no temporary files left behind
+
+
+def test_write_atomically_permissions(tmpdir):
+    """Files get the usual permissions, i.e. those allowed by the umask"""
+    old_umask = os.umask(0o027)
+    try:
+        write_atomically(str(tmpdir.join('file')), b'content')
+    finally:
+        os.umask(old_umask)
+    assert tmpdir.join('file').stat().mode & 0o777 == 0o640
+
+
+def test_fs_exporter_compact_gzip(tmpdir):
+    """Files can be written without whitespace, and gzipped"""
+    client = Client(str(tmpdir), compact=True, compress=True)
+    client.regulation('111', 'vvv').write({'b': [1, 2], 'a': 'value'})
+    client.close()
+
+    with gzip.open(str(tmpdir.join('regulation', '111', 'vvv.gz'))) as f:
+        assert f.read() == b'{"a":"value","b":[1,2]}'
+
+
+def test_fs_exporter_failures(tmpdir):
+    """Failed writes are collected and raised together"""
+    tmpdir.join('blocker').write('a file, not a directory')
+    exporter = FSExporter()
+    exporter.queue(str(tmpdir.join('blocker', 'a')), b'{}')
+    exporter.queue(str(tmpdir.join('fine')), b'{}')
+    with pytest.raises(WriteError) as excinfo:
+        exporter.close()
+    assert len(excinfo.value.failures) == 1
+    assert tmpdir.join('fine').read() == '{}'
+
+
+def test_background_writer_after():
+    """Writes can wait on earlier ones; if those fail, so do the dependents"""
+    order = []
+
+    class Writer(BackgroundWriter):
+        ERRORS = (ValueError,)
+
+        def send(self, target, body):
+            if target == 'slow':
+                time.sleep(0.05)
+            if body == b'fail':
+                raise ValueError()
+            order.append(target)
+
+    writer = Writer(concurrency=4)
+    slow = writer.queue('slow', b'')
+    failing = writer.queue('fails', b'fail')
+    writer.queue('after-slow', b'', after=[slow])
+    writer.queue('after-failing', b'', after=[failing])
+    with pytest.raises(WriteError) as excinfo:
+        writer.close()
+    assert order == ['slow', 'after-slow']
+    assert sorted(target for target, _ in excinfo.value.failures) == [
+        'after-failing', 'fails']
@@ -0,0 +1,17 @@
+from click.testing import CliRunner
+
+from regparser.commands.import_times import import_times
+
+
+def test_import_times():
+    """Each module should be timed. Too-slow imports fail the command"""
+    result = CliRunner().invoke(import_times, ['json', 'regparser.grammar'])
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0].endswith('s json')
+    assert lines[1].endswith('s regparser.grammar')
+
+    result = CliRunner().invoke(import_times,
+                                ['json', '--max-seconds', '0'])
+    assert result.exit_code == 1
+    assert 'Slower than 0.0s: json' in result.output
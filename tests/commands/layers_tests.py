@@ -2,11 +2,12 @@ from datetime import date
 
 import pytest
 
-from regparser.commands import layers
+from regparser.commands import layers, utils
 from regparser.history.versions import Version
 from regparser.index import dependency, entry
 from regparser.notice.citation import Citation
 from regparser.tree.struct import Node
+from regparser.web.index.models import Entry as DBEntry
 
 
 @pytest.mark.django_db
@@ -55,3 +56,39 @@ def test_process_preamble_layers():
     layers.process_preamble_layers(['graphics'], preamble_entry)
 
     assert entry.Layer.preamble('111_222', 'graphics').exists()
+
+
+def _raw(layer_entry):
+    return bytes(DBEntry.objects.get(label=str(layer_entry)).contents)
+
+
+@pytest.mark.django_db
+def test_process_cfr_layers_incremental():
+    """Reusing the parent's layers should give the same output as a full
+    rebuild"""
+    entry.Version(12, 1000, 'v1').write(
+        Version('v1', date(2001, 1, 1), Citation(1, 1)))
+    entry.Version(12, 1000, 'v2').write(
+        Version('v2', date(2002, 2, 2), Citation(2, 2)))
+    parent_tree = Node(label=['1000'], children=[
+        Node('(a) See paragraph (b)', label=['1000', '1', 'a']),
+        Node('(b) Something', label=['1000', '1', 'b'])])
+    tree = Node(label=['1000'], children=[
+        Node('(a) See paragraph (b)', label=['1000', '1', 'a']),
+        Node('(b) Changed', label=['1000', '1', 'b'])])
+    entry.Tree(12, 1000, 'v1').write(parent_tree)
+    entry.Tree(12, 1000, 'v2').write(tree)
+    names = ['internal-citations', 'paragraph-markers']
+
+    assert utils.parent_versions(12, 1000) == {'v1': None, 'v2': 'v1'}
+    layers.process_cfr_layers(names, 12, entry.Version(12, 1000, 'v1'))
+    layers.process_cfr_layers(names, 12, entry.Version(12, 1000, 'v2'))
+    layer_dir = entry.Layer.cfr(12, 1000, 'v2')
+    full = {name: _raw(layer_dir / name)
+            for name in names}
+    assert full['paragraph-markers']
+
+    layers.process_cfr_layers(names, 12, entry.Version(12, 1000, 'v2'),
+                              entry.Version(12, 1000, 'v1'))
+    for name in names:
+        assert _raw(layer_dir / name) == full[name]
@@ -0,0 +1,108 @@
+import pytest
+from click.testing import CliRunner
+from mock import Mock
+
+from regparser.commands import pipeline
+from regparser.commands.annual_editions import LastVersionInYear
+from regparser.index import entry
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Replace each of the pipeline's steps with a function recording its
+    calls"""
+    calls = []
+
+    def stage(name):
+        def fn(*args, **kwargs):
+            calls.append((name,) + tuple(sorted(kwargs.items())) + args)
+        return fn
+
+    for command in ('annual_version', 'preprocess_notices', 'versions',
+                    'fill_with_rules', 'write_to'):
+        monkeypatch.setattr(pipeline, command, stage(command))
+    monkeypatch.setattr(pipeline.annual_editions, 'last_versions',
+                        Mock(return_value=[LastVersionInYear('v1', 2001),
+                                           LastVersionInYear('v2', 2002)]))
+    monkeypatch.setattr(pipeline.annual_editions, 'process_if_needed',
+                        stage('annual_edition'))
+    monkeypatch.setattr(pipeline.layers, 'build_cfr_layers',
+                        lambda tree_entry: calls.append(('layers',
+                                                         tree_entry.path)))
+    monkeypatch.setattr(pipeline.diffs, 'tree_ids',
+                        Mock(return_value=['v1', 'v2']))
+    monkeypatch.setattr(pipeline.diffs, 'process_diffs', stage('diffs'))
+    return calls
+
+
+@pytest.mark.django_db
+def test_pipeline(stages):
+    """Each stage should run, expanding into per-year and per-version
+    tasks. Layers of an annual edition's tree needn't wait for the other
+    trees"""
+    for version_id in ('v1', 'v2', 'v3'):
+        entry.Entry('tree', 11, 222, version_id).write(b'')
+    result = CliRunner().invoke(pipeline.pipeline, ['11', '222', 'out'])
+    assert result.exception is None
+
+    params = (('cfr_part', 222), ('cfr_title', 11))
+    assert stages == [
+        ('preprocess_notices',) + params + (('processes', 1),),
+        ('versions',) + params,
+        ('annual_edition', 11, 222, [LastVersionInYear('v1', 2001)]),
+        ('layers', ('11', '222', 'v1')),
+        ('annual_edition', 11, 222, [LastVersionInYear('v2', 2002)]),
+        ('layers', ('11', '222', 'v2')),
+        ('fill_with_rules',) + params,
+        ('layers', ('11', '222', 'v3')),
+        ('diffs', 11, 222, [('v1', 'v1'), ('v1', 'v2')]),
+        ('diffs', 11, 222, [('v2', 'v1'), ('v2', 'v2')]),
+        ('write_to',) + params + (('output', 'out'),),
+    ]
+
+
+@pytest.mark.django_db
+def test_pipeline_layers_wait_on_their_tree(stages):
+    """An annual edition's layers depend on that edition alone; derived
+    trees' layers and the diffs wait for fill_with_rules"""
+    tasks = {task.name: task
+             for task in pipeline.tree_tasks(Mock(), 11, 222, 'p: ')}
+    assert tasks['p: layers/v1'].deps == ['p: annual_editions/2001']
+    assert tasks['p: layers/v2'].deps == ['p: annual_editions/2002']
+    assert tasks['p: fill_with_rules'].deps == [
+        'p: annual_editions/2001', 'p: annual_editions/2002']
+    assert tasks['p: layers'].deps == ['p: fill_with_rules']
+    assert tasks['p: diffs'].deps == ['p: fill_with_rules']
+
+
+@pytest.mark.django_db
+def test_pipeline_only_latest_multiple_parts(stages):
+    """Each part should get its own stages"""
+    pipeline.diffs.tree_ids.return_value = []
+    result = CliRunner().invoke(pipeline.pipeline, [
+        '11', '222', 'out', '--only-latest', '--part', '333'])
+    assert result.exception is None
+
+    for cfr_part in (222, 333):
+        params = (('cfr_part', cfr_part), ('cfr_title', 11))
+        assert [call for call in stages if call[1:3] == params] == [
+            ('annual_version',) + params,
+            ('write_to',) + params + (('output', 'out'),)]
+
+
+@pytest.mark.django_db
+def test_pipeline_failure(stages, monkeypatch):
+    """If one part fails, the others should still be processed, but the
+    error should be raised"""
+    def annual_version(cfr_title, cfr_part):
+        if cfr_part == 222:
+            raise ValueError("Bad part")
+        stages.append(('annual_version', cfr_part))
+    monkeypatch.setattr(pipeline, 'annual_version', annual_version)
+    pipeline.diffs.tree_ids.return_value = []
+
+    result = CliRunner().invoke(pipeline.pipeline, [
+        '11', '222', 'out', '--only-latest', '--part', '333'])
+    assert isinstance(result.exception, ValueError)
+    assert [call[0] for call in stages] == ['annual_version', 'write_to']
+    assert ('cfr_part', 333) in stages[1]
@@ -0,0 +1,79 @@
+from datetime import date
+
+import pytest
+from click.testing import CliRunner
+from lxml import etree
+from mock import Mock
+
+from regparser.commands import preprocess_notices
+from regparser.index import entry
+from regparser.test_utils.xml_builder import XMLBuilder
+
+
+def example_xml(effdate_str=""):
+    with XMLBuilder("ROOT") as ctx:
+        ctx.CONTENT()
+        ctx.P()
+        with ctx.EFFDATE():
+            ctx.P(effdate_str)
+    return etree.tostring(ctx.xml)
+
+
+def example_meta(document_number):
+    return {'effective_on': '2008-08-08',
+            'publication_date': '2007-07-07',
+            'full_text_xml_url': 'some://url/' + document_number,
+            'volume': 45,
+            'start_page': 111,
+            'end_page': 222}
+
+
+@pytest.fixture
+def fake_downloads(monkeypatch):
+    monkeypatch.setattr(preprocess_notices, 'fetch_version_ids',
+                        Mock(return_value=['1', '2', '3']))
+    monkeypatch.setattr(preprocess_notices.federalregister, 'meta_data',
+                        Mock(side_effect=lambda doc, _: example_meta(doc)))
+    sources = {
+        'some://url/1': [(example_xml(), 'one')],
+        'some://url/2': [(example_xml('Effective January 1, 2011'), 'a'),
+                         (example_xml('Effective February 2, 2012'), 'b')],
+        'some://url/3': [(example_xml(), 'three')],
+    }
+    notice_xml_sources = Mock(side_effect=sources.get)
+    monkeypatch.setattr(preprocess_notices, 'notice_xml_sources',
+                        notice_xml_sources)
+    return notice_xml_sources
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('processes', ['1', '2'])
+def test_preprocess_notices(fake_downloads, processes):
+    """Each missing notice should be written, including those which are
+    split by effective date"""
+    entry.Notice('3').write(
+        preprocess_notices.NoticeXML(example_xml(), 'three'))
+    result = CliRunner().invoke(preprocess_notices.preprocess_notices,
+                                ['11', '222', '--processes', processes])
+    assert result.exception is None
+
+    assert [call[0][0] for call in fake_downloads.call_args_list] == [
+        'some://url/1', 'some://url/2']
+    written = {e.path[-1] for e in entry.Notice().sub_entries()}
+    assert written == {'1', '2_20110101', '2_20120202', '3'}
+    assert entry.Notice('1').read().effective == date(2008, 8, 8)
+    assert entry.Notice('2_20120202').read().effective == date(2012, 2, 2)
+    assert entry.Notice('2_20110101').read().fr_volume == 45
+
+
+@pytest.mark.django_db
+def test_preprocess_notices_none_missing(monkeypatch):
+    """If all of the notices are present, nothing should be fetched"""
+    monkeypatch.setattr(preprocess_notices, 'fetch_version_ids',
+                        Mock(return_value=[]))
+    download = Mock()
+    monkeypatch.setattr(preprocess_notices, 'download', download)
+    result = CliRunner().invoke(preprocess_notices.preprocess_notices,
+                                ['11', '222'])
+    assert result.exception is None
+    assert not download.called
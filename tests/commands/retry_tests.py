@@ -0,0 +1,75 @@
+from importlib import import_module
+
+import pytest
+from mock import Mock
+
+from regparser.commands import retry
+from regparser.index import dependency, entry
+
+
+def test_load_sub_command(monkeypatch):
+    """Only the requested command's module should be imported"""
+    importer = Mock(side_effect=import_module)
+    monkeypatch.setattr(retry, 'import_module', importer)
+    command = retry.load_sub_command('clear')
+    assert command.name == 'clear'
+    importer.assert_called_once_with('regparser.commands.clear')
+
+    assert retry.load_sub_command('utils') is None     # not a command
+    assert retry.load_sub_command('not-a-module') is None
+    assert importer.call_count == 2
+
+
+def test_list_commands():
+    """All commands should be listed, but not supporting modules"""
+    names = retry.RetryingCommand().list_commands(None)
+    assert 'clear' in names
+    assert 'layers' in names
+    assert 'utils' not in names
+
+
+@pytest.mark.django_db
+def test_plan_resolutions():
+    """All of the inputs missing for siblings of the failing entry should be
+    resolved, as long as a resolver exists"""
+    graph = dependency.Graph()
+    version_dir = entry.Version('11', '222')
+    for doc_number in ('a', 'b', 'c'):
+        graph.add(version_dir / doc_number, entry.Notice(doc_number))
+    graph.add(version_dir / 'c', entry.Entry('unresolvable'))
+    graph.add(entry.Version('11', '333', 'z'), entry.Notice('z'))
+    entry.Entry(entry.Notice.PREFIX, 'c').write(b'present')
+
+    missing = dependency.Missing(str(version_dir / 'b'),
+                                 str(entry.Notice('b')))
+    resolvers = retry.plan_resolutions(missing)
+    assert [r.match.group('doc_number') for r in resolvers] == ['b', 'a']
+
+
+def test_plan_resolutions_unresolvable():
+    """If the failing dependency can't be resolved, there's no plan"""
+    missing = dependency.Missing('key', 'unresolvable')
+    assert retry.plan_resolutions(missing) == []
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_or_resolve(monkeypatch, settings, workers):
+    """All of the planned resolutions should run before a single retry"""
+    settings.RESOLUTION_WORKERS = workers
+    resolvers = [Mock(), Mock(), Mock()]
+    monkeypatch.setattr(retry, 'plan_resolutions',
+                        Mock(return_value=resolvers))
+    cmd = Mock(side_effect=[dependency.Missing('key', 'dep'), None])
+    retry.run_or_resolve(cmd)
+    assert cmd.call_count == 2
+    assert all(r.resolution.call_count == 1 for r in resolvers)
+
+
+def test_run_or_resolve_no_progress(monkeypatch):
+    """If the same dependency is missing after resolving, give up"""
+    monkeypatch.setattr(retry, 'plan_resolutions',
+                        Mock(return_value=[Mock()]))
+    cmd = Mock(side_effect=dependency.Missing('key', 'dep'))
+    with pytest.raises(dependency.Missing):
+        retry.run_or_resolve(cmd)
+    assert cmd.call_count == 2
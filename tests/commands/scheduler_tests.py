@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from regparser.commands.scheduler import Scheduler, Task
+
+
+def recorder(calls, name, result=None):
+    def fn():
+        calls.append(name)
+        return result
+    return fn
+
+
+def test_run_in_dependency_order():
+    """Tasks should only run after their dependencies"""
+    calls = []
+    scheduler = Scheduler()
+    scheduler.add('c', recorder(calls, 'c'))
+    scheduler.add('a', recorder(calls, 'a'), ['c'])
+    scheduler.add('b', recorder(calls, 'b'), ['a', 'c'])
+    scheduler.run()
+    assert calls == ['c', 'a', 'b']
+    assert scheduler.done == {'a', 'b', 'c'}
+
+
+def test_add_unknown_or_duplicate():
+    scheduler = Scheduler()
+    scheduler.add('a', lambda: None)
+    with pytest.raises(ValueError):
+        scheduler.add('a', lambda: None)
+    with pytest.raises(ValueError):
+        scheduler.add('b', lambda: None, ['a', 'zzz'])
+
+
+def test_new_tasks():
+    """Tasks returned by a task should be run; dependents of that task should
+    wait for them"""
+    calls = []
+    scheduler = Scheduler()
+    scheduler.add('expand', recorder(calls, 'expand', [
+        Task('child1', recorder(calls, 'child1'), ()),
+        Task('child2', recorder(calls, 'child2'), ['child1']),
+    ]))
+    scheduler.add('after', recorder(calls, 'after'), ['expand'])
+    scheduler.run()
+    assert calls == ['expand', 'child1', 'child2', 'after']
+
+
+def test_failures():
+    """Dependents of a failed task should be skipped, but other tasks should
+    still run. The failure is then raised"""
+    calls = []
+
+    def fail():
+        raise KeyError('boom')
+
+    scheduler = Scheduler()
+    scheduler.add('fail', fail)
+    scheduler.add('skipped', recorder(calls, 'skipped'), ['fail'])
+    scheduler.add('independent', recorder(calls, 'independent'))
+    with pytest.raises(KeyError):
+        scheduler.run()
+    assert calls == ['independent']
+    assert list(scheduler.failed) == ['fail']
+
+
+def test_concurrent():
+    """Independent tasks should run at the same time, up to the number of
+    workers"""
+    lock = threading.Lock()
+    state = {'running': 0, 'max_running': 0}
+
+    def task():
+        with lock:
+            state['running'] += 1
+            state['max_running'] = max(state['running'],
+                                       state['max_running'])
+        time.sleep(0.05)
+        with lock:
+            state['running'] -= 1
+
+    scheduler = Scheduler()
+    for name in 'abcd':
+        scheduler.add(name, task)
+    scheduler.run(workers=2)
+    assert state['max_running'] == 2
+    assert scheduler.done == set('abcd')
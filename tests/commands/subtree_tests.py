@@ -0,0 +1,25 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from regparser.commands.subtree import subtree
+from regparser.index import entry
+from regparser.tree.struct import Node
+
+
+@pytest.mark.django_db
+def test_subtree():
+    """The requested node should be printed; missing labels are an error"""
+    tree = Node('root', label=['1111'], children=[
+        Node('sec 1', label=['1111', '1'], children=[
+            Node('(a)', label=['1111', '1', 'a'])])])
+    entry.Tree('12', '1111', 'vvv').write(tree)
+
+    result = CliRunner().invoke(subtree, ['12', '1111', 'vvv', '1111-1-a'])
+    assert result.exit_code == 0
+    assert json.loads(result.output)['text'] == '(a)'
+
+    result = CliRunner().invoke(subtree, ['12', '1111', 'vvv', '1111-2'])
+    assert result.exit_code != 0
+    assert '1111-2 not found' in result.output
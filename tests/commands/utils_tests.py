@@ -0,0 +1,37 @@
+import pytest
+
+from regparser.commands import utils
+from regparser.index import entry
+
+
+@pytest.fixture
+def layers():
+    for cfr_title, cfr_part in ((11, 222), (11, 333), (12, 222)):
+        entry.Layer.cfr(cfr_title, cfr_part, 'v1', 'terms').write(
+            {'part': cfr_part})
+
+
+def relevant(only_title, only_part):
+    return [(sub_entry.path, sub_entry.deserialize(contents))
+            for sub_entry, contents
+            in utils.relevant_contents(entry.Layer.cfr(), only_title,
+                                       only_part)]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('only_title, only_part, expected', [
+    (None, None, [(11, 222), (11, 333), (12, 222)]),
+    (11, None, [(11, 222), (11, 333)]),
+    (11, 222, [(11, 222)]),
+    (None, 222, [(11, 222), (12, 222)]),
+])
+def test_relevant_contents(layers, only_title, only_part, expected):
+    """Only entries matching the title and part should be returned, with
+    their contents"""
+    assert relevant(only_title, only_part) == [
+        (('cfr', str(cfr_title), str(cfr_part), 'v1', 'terms'),
+         {'part': cfr_part})
+        for cfr_title, cfr_part in expected]
+    assert [sub_entry.path for sub_entry in utils.relevant_paths(
+        entry.Layer.cfr(), only_title, only_part)] == [
+        path for path, _ in relevant(only_title, only_part)]
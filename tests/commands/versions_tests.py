@@ -52,6 +52,32 @@ def test_fetch_version_ids_skip_no_xml(monkeypatch):
     assert ['1', '3'] == versions.fetch_version_ids('title', 'part', path)
 
 
+@pytest.mark.django_db
+def test_sync_final_rules(monkeypatch):
+    """Later syncs should only request documents published since the last,
+    merging them with the earlier results"""
+    fetch = Mock(return_value=[
+        {'document_number': '1', 'publication_date': '2001-01-01'},
+        {'document_number': '2', 'publication_date': '2002-02-02'}])
+    monkeypatch.setattr(versions, 'fetch_notice_json', fetch)
+    assert [r['document_number']
+            for r in versions.sync_final_rules('11', '222')] == ['1', '2']
+    assert fetch.call_args[1]['min_publication_date'] is None
+
+    fetch.return_value = [
+        {'document_number': '2', 'publication_date': '2002-02-02',
+         'full_text_xml_url': 'updated'},
+        {'document_number': '3', 'publication_date': '2003-03-03'}]
+    results = versions.sync_final_rules('11', '222')
+    assert fetch.call_args[1]['min_publication_date'] == '2002-02-02'
+    assert [r['document_number'] for r in results] == ['1', '2', '3']
+    assert results[1]['full_text_xml_url'] == 'updated'
+
+    fetch.return_value = []
+    assert versions.sync_final_rules('11', '222') == results
+    assert fetch.call_args[1]['min_publication_date'] == '2003-03-03'
+
+
 def test_delays():
     """For NoticeXMLs which cause delays to other NoticeXMLs, we'd like to get
     a dictionary of delayed -> Delay(delayer, delayed_until)"""
@@ -196,3 +196,75 @@ def test_transform_notice(monkeypatch):
 
     assert write_to.add_footnotes.called
     assert write_to.process_sxs.called
+
+
+def test_decoded(monkeypatch):
+    """Contents should be decoded in batches, preserving order"""
+    monkeypatch.setattr(write_to, 'DECODE_BATCH', 3)
+    index_entry = Mock()
+    index_entry.deserialize.side_effect = lambda contents: contents * 2
+    pairs = [(index_entry, idx) for idx in range(8)]
+    assert [obj for _, obj in write_to.decoded(pairs)] == [
+        idx * 2 for idx in range(8)]
+    assert list(write_to.decoded([])) == []
+
+
+def test_decoded_closes_connections(monkeypatch):
+    """Each decoding thread should close its database connection"""
+    monkeypatch.setattr(write_to, 'connections', Mock())
+    index_entry = Mock()
+    pairs = [(index_entry, idx) for idx in range(8)]
+    assert len(list(write_to.decoded(pairs))) == 8
+    assert write_to.connections.close_all.call_count == write_to.DECODE_THREADS
+
+
+@pytest.mark.django_db
+def test_layers_wait_on_their_trees():
+    """Each layer should be written after the tree it references"""
+    entry.Tree('12', '1000', 'v2').write(Node('v2'))
+    entry.Layer.cfr('12', '1000', 'v2', 'layer1').write({'1': 1})
+    entry.Layer.cfr('12', '1000', 'v3', 'layer1').write({'3': 3})
+    client = Mock()
+    written = write_to.write_trees(client, None, None)
+    assert list(written) == [('cfr', 'v2/1000')]
+
+    write_to.write_layers(client, None, None, written)
+    tree_write = client.regulation.return_value.write.return_value
+    layer_writes = client.layer.return_value.write.call_args_list
+    assert [call[1]['after'] for call in layer_writes] == [[tree_write], []]
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('integration')
+def test_write_notices_filters_without_parsing(monkeypatch):
+    """Only notices whose recorded references match should be read"""
+    original_read, read = entry.Notice.read, []
+
+    def tracking_read(notice_entry):
+        read.append(notice_entry.path[-1])
+        return original_read(notice_entry)
+    monkeypatch.setattr(entry.Notice, 'read', tracking_read)
+    client = Mock()
+    write_to.write_notices(client, 12, 1000)
+    assert sorted(read) == ['v2', 'v3']
+    assert sorted(call[0][0] for call in client.notice.call_args_list) == [
+        'v2', 'v3']
+
+
+@pytest.mark.django_db
+def test_transform_notice_lineage_cached(monkeypatch):
+    """The version lineage of each part should only be computed once"""
+    parent_versions = Mock(return_value={'v1': None, 'v2': 'v1'})
+    monkeypatch.setattr(write_to.utils, 'parent_versions', parent_versions)
+    monkeypatch.setattr(write_to, 'add_footnotes', Mock())
+    monkeypatch.setattr(write_to, 'process_sxs', Mock())
+    version_parents = {}
+    results = []
+    for version_id in ('v1', 'v2'):
+        notice_xml = Mock(version_id=version_id, cfr_ref_pairs=[(11, 222)])
+        notice_xml.as_dict.return_value = {}
+        results.append(write_to.transform_notice(notice_xml, version_parents))
+
+    assert parent_versions.call_count == 1
+    assert results[0]['versions'] == {}
+    assert results[1]['versions'] == {222: {'left': 'v1', 'right': 'v2'}}
@@ -1,6 +1,9 @@
 import re
 from unittest import TestCase
 
+from mock import Mock
+from six.moves.urllib.parse import parse_qs, urlparse
+
 from regparser import federalregister
 from regparser.test_utils.http_mixin import HttpMixin
 
@@ -27,3 +30,48 @@ class FederalRegisterTest(HttpMixin, TestCase):
         """If a document isn't present, expect an exception"""
         self.expect_json_http(status=404)
         self.assertRaises(Exception, federalregister.meta_data, 'doc-num')
+
+
+def page_of(url):
+    return int(parse_qs(urlparse(url).query)['page'][0])
+
+
+def test_iter_notice_json_pages(monkeypatch, settings):
+    """All pages should be requested, with results generated in order"""
+    settings.HTTP_MAX_PER_HOST = 2
+
+    def response(url):
+        page = page_of(url)
+        return Mock(url=url, json=Mock(return_value={
+            'total_pages': 5, 'results': [page * 10, page * 10 + 1]}))
+    get_all = Mock(side_effect=lambda urls: [response(url) for url in urls])
+    client = Mock()
+    client.return_value.get.side_effect = response
+    monkeypatch.setattr(federalregister, 'http_client', client)
+    monkeypatch.setattr(federalregister, 'get_all', get_all)
+
+    results = federalregister.fetch_notice_json(
+        11, 222, only_final=True, min_publication_date='2001-01-01')
+    assert results == [10, 11, 20, 21, 30, 31, 40, 41, 50, 51]
+    # page 1 on its own, then batches of 2
+    batches = [[page_of(url) for url in call[0][0]]
+               for call in get_all.call_args_list]
+    assert batches == [[2, 3], [4, 5]]
+    params = parse_qs(urlparse(client.return_value.get.call_args[0][0]).query)
+    assert params['conditions[type][]'] == ['RULE']
+    assert params['conditions[publication_date][gte]'] == ['2001-01-01']
+    assert params['fields[]'] == federalregister.FULL_NOTICE_FIELDS
+
+
+def test_iter_notice_json_lazy(monkeypatch):
+    """Later pages aren't requested until needed"""
+    client = Mock()
+    client.return_value.get.return_value.json.return_value = {
+        'total_pages': 3, 'results': [1, 2]}
+    get_all = Mock()
+    monkeypatch.setattr(federalregister, 'http_client', client)
+    monkeypatch.setattr(federalregister, 'get_all', get_all)
+
+    results = federalregister.iter_notice_json(11, 222)
+    assert next(results) == 1
+    assert not get_all.called
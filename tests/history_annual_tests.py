@@ -2,10 +2,12 @@
 import re
 from unittest import TestCase
 
-from mock import Mock, patch
+import pytest
+from mock import MagicMock, Mock, patch
 
 from regparser.history import annual
 from regparser.test_utils.http_mixin import HttpMixin
+from regparser.web.index.models import AnnualVolume
 
 
 class HistoryAnnualVolumeTests(HttpMixin, TestCase):
@@ -137,31 +139,67 @@ class HistoryAnnualVolumeTests(HttpMixin, TestCase):
         assert http_client.return_value.get.call_count == 3
 
 
-class HistoryAnnualTests(TestCase):
-    @patch('regparser.history.annual.Volume')
-    def test_find_volume(self, mock_volume):
-        v1 = Mock()
-        v1.exists = True
-        v1.should_contain.return_value = False
-
-        v2 = Mock()
-        v2.exists = True
-        v2.should_contain.return_value = True
-
-        v3 = Mock()
-        v3.exists = False
-
-        def side_effect(year, title, vol_num):
-            if vol_num > 3:
-                return v2
-            return v1
-        mock_volume.side_effect = side_effect
-
-        self.assertEqual(annual.find_volume(2000, 11, 3), v2)
-
-        def side_effect(year, title, vol_num):
-            if vol_num > 3:
-                return v3
-            return v1
-        mock_volume.side_effect = side_effect
-        self.assertEqual(annual.find_volume(2000, 11, 3), None)
+def fake_probe(spans, probed):
+    """Replace HTTP probes with these part spans (by volume number)"""
+    def probe(volume):
+        probed.append(volume.vol_num)
+        volume.exists = volume.vol_num in spans
+        if volume.exists:
+            volume.part_span = spans[volume.vol_num]
+        return volume
+    return probe
+
+
+@pytest.mark.django_db
+def test_find_volume(monkeypatch):
+    """Volumes should be probed concurrently and recorded, so subsequent
+    lookups require no HTTP"""
+    probed = []
+    monkeypatch.setattr(annual, 'PROBE_CONCURRENCY', 2)
+    monkeypatch.setattr(annual, '_probe', fake_probe(
+        {1: (1, 100), 2: (101, 200), 3: (201, 300)}, probed))
+
+    assert annual.find_volume(2000, 11, 150).vol_num == 2
+    assert probed == [1, 2]
+    assert annual.find_volume(2000, 11, 250).vol_num == 3
+    assert probed == [1, 2, 3, 4]
+    assert annual.find_volume(2000, 11, 350) is None
+    assert probed == [1, 2, 3, 4, 4, 5]
+    assert AnnualVolume.objects.count() == 3
+
+    monkeypatch.setattr(annual, '_probe', Mock(side_effect=AssertionError))
+    volume = annual.find_volume(2000, 11, 10)
+    assert volume.vol_num == 1
+    assert volume.part_span == (1, 100)
+    assert volume.exists
+
+
+@pytest.mark.django_db
+def test_find_volume_unparseable(monkeypatch):
+    """Volumes with unparseable part spans never contain the part"""
+    probed = []
+    monkeypatch.setattr(annual, '_probe', fake_probe(
+        {1: False, 2: (1, None)}, probed))
+    assert annual.find_volume(2000, 11, 1).vol_num == 2
+
+    monkeypatch.setattr(annual, '_probe', Mock(side_effect=AssertionError))
+    assert annual.find_volume(2000, 11, 1).vol_num == 2
+
+
+def test_part_span_beyond_probe(monkeypatch):
+    """If the <PARTS> aren't near the beginning of the volume, we should
+    look through the whole thing before assuming it covers every part"""
+    beginning = Mock(status_code=206)
+    beginning.iter_lines.return_value = ['<CFRDOC>'] + ['x' * 1024] * 64
+    whole = Mock(status_code=200)
+    whole.iter_lines.return_value = beginning.iter_lines.return_value + [
+        '<PARTS>Parts 200 to 219</PARTS>']
+    client = MagicMock()
+    client.get.side_effect = [beginning, whole]
+    monkeypatch.setattr(annual, 'http_client', Mock(return_value=client))
+
+    volume = annual.Volume(2001, 12, 1)
+    assert volume.part_span == (200, 219)
+    assert 'Range' in client.get.call_args_list[0][1]['headers']
+    assert 'Range' not in client.get.call_args_list[1][1]['headers']
+    assert beginning.close.called and whole.close.called
@@ -76,6 +76,18 @@ class DependencyGraphTests(TestCase):
                 dependency.Graph().dependencies(str(self.depender)),
                 [str(self.dependency / 1), str(self.dependency / 2)])
 
+    def test_dependencies_added_concurrently(self):
+        """Graphs loaded before another adds a dependency shouldn't drop that
+        dependency when they add their own"""
+        with self.dependency_graph() as dgraph:
+            other = dependency.Graph()
+            dgraph.add(self.depender, self.dependency / '1')
+            other.add(self.depender, self.dependency / '2')
+            six.assertCountEqual(
+                self,
+                dependency.Graph().dependencies(str(self.depender)),
+                [str(self.dependency / 1), str(self.dependency / 2)])
+
     def assert_rebuilt_state(self, graph, path, **kwargs):
         """Shorthand to verify that stale values are set appropriately.
         For example, self.assert_rebuilt_state(graph, path, a='a', b='ab')
@@ -131,3 +143,19 @@ class DependencyGraphTests(TestCase):
             self._touch(c, 3000)
             # C and D have been updated, but C's been updated after D
             self.assert_rebuilt_state(graph, path, a='', b='', c='', d='c')
+
+    def test_missing_inputs(self):
+        """We should find all of the unbuilt nodes that entries (indirectly)
+        depend on"""
+        with self.dependency_graph() as graph:
+            path = entry.Entry('path')
+            a, b, c, d, e = [path / char for char in 'abcde']
+            b.write(b'bbb')
+            graph.add(c, a)
+            graph.add(c, b)
+            graph.add(d, c)
+            graph.add(e, a)
+            self.assertEqual(graph.missing_inputs([d]), [str(a), str(c)])
+            self.assertEqual(graph.missing_inputs([b]), [])
+            self.assertEqual(sorted(graph.labels_in(path)),
+                             [str(n) for n in (a, b, c, d, e)])
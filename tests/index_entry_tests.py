@@ -1,10 +1,16 @@
+import json
+import os
 from datetime import date
 
 import pytest
+from lxml import etree
 
 from regparser.history.versions import Version
 from regparser.index import entry
 from regparser.notice.citation import Citation
+from regparser.notice.xml import NoticeXML, TitlePartsRef
+from regparser.tree.struct import FrozenNode, FullNodeEncoder, Node
+from regparser.web.index.models import DependencyNode
 
 
 @pytest.mark.django_db
@@ -21,3 +27,186 @@ def test_iterator():
     actual = [child.path[-1] for child in path.sub_entries()]
 
     assert ['2222', '3333', '1111'] == actual
+
+
+@pytest.mark.django_db
+def test_tree_round_trip():
+    """Trees are decoded back into Nodes. The source_xml can optionally be
+    skipped"""
+    tree = Node('root', label=['1111'], children=[
+        Node('child', label=['1111', '1'], source_xml=etree.fromstring('<P/>'))
+    ])
+    entry.Tree('12', '1111', 'vvv').write(tree)
+
+    result = entry.Tree('12', '1111', 'vvv').read()
+    assert result == tree
+    assert result.children[0].source_xml.tag == 'P'
+
+    result = entry.TreeWithoutXML('12', '1111', 'vvv').read()
+    assert result == tree
+    assert result.children[0].source_xml is None
+
+    result = entry.FrozenTree('12', '1111', 'vvv').read()
+    assert result == FrozenNode.from_node(tree)
+
+
+@pytest.mark.django_db
+def test_tree_legacy_format():
+    """Trees written by the hook-based encoder can still be read"""
+    tree = Node('root', label=['1111'], children=[Node('child')])
+    as_json = json.dumps(tree, cls=FullNodeEncoder, indent=4)
+    entry.Entry('tree', '12', '1111', 'vvv').write(as_json.encode('utf-8'))
+
+    assert entry.Tree('12', '1111', 'vvv').read() == tree
+
+
+@pytest.mark.django_db
+def test_tree_columnar(settings):
+    """Trees can be stored in the columnar format; subtrees of either format
+    can be read on their own"""
+    tree = Node('root', label=['1111'], children=[
+        Node('child', label=['1111', '1'])])
+    settings.EREGS_TREE_FORMAT = 'columnar'
+    entry.Tree('12', '1111', 'columnar').write(tree)
+    settings.EREGS_TREE_FORMAT = 'json'
+    entry.Tree('12', '1111', 'json').write(tree)
+
+    for version_id in ('columnar', 'json'):
+        assert entry.Tree('12', '1111', version_id).read() == tree
+        assert entry.FrozenTree('12', '1111', version_id).read() == \
+            FrozenNode.from_node(tree)
+        assert entry.Tree('12', '1111', version_id).read_subtree(
+            '1111-1') == tree.children[0]
+
+
+def sectioned_tree():
+    return Node('root', label=['1111'], children=[
+        Node('Subpart', label=['1111', 'Subpart', 'A'],
+             node_type=Node.SUBPART, children=[
+                 Node('sec 1', label=['1111', '1'], children=[
+                     Node('(a)', label=['1111', '1', 'a'])]),
+                 Node('sec 2', label=['1111', '2'])]),
+        Node('App A', label=['1111', 'A'], node_type=Node.APPENDIX),
+        Node('Interp', label=['1111', 'Interp'], node_type=Node.INTERP,
+             children=[Node('1 interp', label=['1111', '1', 'Interp'],
+                            node_type=Node.INTERP)])])
+
+
+@pytest.mark.django_db
+def test_tree_sectioned(settings):
+    """Sections, appendices, and interpretations are stored separately, but
+    reading the tree reassembles them"""
+    settings.EREGS_TREE_LAYOUT = 'sectioned'
+    tree = sectioned_tree()
+    tree_entry = entry.Tree('12', '1111', 'vvv')
+    tree_entry.write(tree)
+
+    subtrees = [sub.path[-1]
+                for sub in entry.Subtree('12', '1111', 'vvv').sub_entries()]
+    assert subtrees == ['1111-1', '1111-2', '1111-A', '1111-Interp']
+
+    assert tree_entry.read() == tree
+    assert entry.FrozenTree('12', '1111', 'vvv').read() == \
+        FrozenNode.from_node(tree)
+
+
+@pytest.mark.django_db
+def test_tree_sectioned_rewrite(settings):
+    """Rewriting a tree shouldn't leave sections of the old one behind"""
+    settings.EREGS_TREE_LAYOUT = 'sectioned'
+    tree_entry = entry.Tree('12', '1111', 'vvv')
+    tree_entry.write(sectioned_tree())
+    tree = Node('root', label=['1111'], children=[
+        Node('sec 2', label=['1111', '2'])])
+    tree_entry.write(tree)
+
+    subtrees = [sub.path[-1]
+                for sub in entry.Subtree('12', '1111', 'vvv').sub_entries()]
+    assert subtrees == ['1111-2']
+    assert tree_entry.read() == tree
+    # The dependency graph shouldn't retain the old sections either
+    subtree_dir = str(entry.Subtree('12', '1111', 'vvv'))
+    assert list(DependencyNode.objects.filter(
+        label__startswith=subtree_dir + os.sep).values_list(
+        'label', flat=True)) == [os.path.join(subtree_dir, '1111-2')]
+
+    settings.EREGS_TREE_LAYOUT = 'whole'
+    tree_entry.write(tree)
+    assert not list(entry.Subtree('12', '1111', 'vvv').sub_entries())
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('layout,tree_format', [
+    ('whole', 'json'), ('whole', 'columnar'), ('sectioned', 'json')])
+def test_read_subtree(settings, layout, tree_format):
+    settings.EREGS_TREE_LAYOUT = layout
+    settings.EREGS_TREE_FORMAT = tree_format
+    tree = sectioned_tree()
+    tree_entry = entry.Tree('12', '1111', 'vvv')
+    tree_entry.write(tree)
+
+    subpart = tree.children[0]
+    assert tree_entry.read_subtree('1111-Subpart-A') == subpart
+    assert tree_entry.read_subtree('1111-1') == subpart.children[0]
+    assert tree_entry.read_subtree('1111-1-a') == \
+        subpart.children[0].children[0]
+    assert tree_entry.read_subtree('1111-1-Interp') == \
+        tree.children[2].children[0]
+    assert tree_entry.read_subtree('1111-3') is None
+
+
+@pytest.mark.django_db
+def test_sub_entries_with_contents():
+    """Contents should be paired with their sub-entries"""
+    path = entry.Entry('some', 'path')
+    (path / 'a').write(b'aaa')
+    (path / 'b' / 'c').write(b'ccc')
+    entry.Entry('some', 'other').write(b'elsewhere')
+
+    pairs = [(sub_entry.path, contents)
+             for sub_entry, contents in path.sub_entries_with_contents()]
+    assert pairs == [(('some', 'path', 'a'), b'aaa'),
+                     (('some', 'path', 'b', 'c'), b'ccc')]
+
+
+@pytest.mark.django_db
+def test_sub_entries_with_contents_keep(monkeypatch):
+    """Only the kept sub-entries should be paired with contents, batch by
+    batch"""
+    monkeypatch.setattr(entry, 'CONTENTS_BATCH', 2)
+    path = entry.Entry('some', 'path')
+    for name in 'abcde':
+        (path / name).write(name.encode('utf-8'))
+
+    pairs = [(sub_entry.path[-1], contents)
+             for sub_entry, contents in path.sub_entries_with_contents(
+                 keep=lambda sub_entry: sub_entry.path[-1] != 'b')]
+    assert pairs == [('a', b'a'), ('c', b'c'), ('d', b'd'), ('e', b'e')]
+
+
+@pytest.mark.django_db
+def test_notice_referencing():
+    """Notices should be found via their recorded CFR references; those
+    without any recorded are always included"""
+    def notice(version_id, refs):
+        notice_xml = NoticeXML(etree.fromstring('<ROOT />'))
+        notice_xml.cfr_refs = [TitlePartsRef(title, parts)
+                               for title, parts in refs]
+        entry.Notice(version_id).write(notice_xml)
+
+    notice('a', [(11, [222, 333])])
+    notice('b', [(11, [444]), (12, [222])])
+    notice('c', [(12, [])])
+    entry.Entry(entry.Notice.PREFIX, 'legacy').write(b'<ROOT />')
+
+    def labels(*args):
+        return sorted(os.path.basename(label)
+                      for label in entry.Notice.referencing(*args))
+
+    assert labels(11, 222) == ['a', 'b', 'legacy']
+    assert labels(12) == ['b', 'c', 'legacy']
+    assert labels(None, 444) == ['b', 'legacy']
+    assert labels(13) == ['legacy']
+
+    notice('a', [(13, [1])])     # rewriting replaces the references
+    assert labels(11, 222) == ['b', 'legacy']
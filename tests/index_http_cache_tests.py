@@ -0,0 +1,62 @@
+import pytest
+
+from regparser.index import http_cache
+from regparser.test_utils.http_stub import stub_server as run_stub_server
+
+
+@pytest.fixture
+def stub_server():
+    with run_stub_server() as server:
+        yield server
+
+
+def test_client_reused(settings):
+    """The same session should be reused until the settings change"""
+    client = http_cache.http_client()
+    assert http_cache.http_client() is client
+    settings.REQUESTS_CACHE = dict(settings.REQUESTS_CACHE, expire_after=1)
+    assert http_cache.http_client() is not client
+
+
+def test_retries(stub_server):
+    """5XX responses should be retried"""
+    stub_server.statuses['/flaky'] = [503]
+    response = http_cache.http_client().get(stub_server.url('/flaky'))
+    assert response.status_code == 200
+    assert stub_server.paths == ['/flaky', '/flaky']
+
+
+def test_get_all(stub_server, settings):
+    """Responses should be returned in order, never exceeding the per-host
+    limit"""
+    settings.HTTP_MAX_PER_HOST = 2
+    urls = [stub_server.url('/slow/{0}'.format(i)) for i in range(6)]
+    responses = http_cache.get_all(urls)
+    assert [r.url for r in responses] == urls
+    assert all(r.status_code == 200 for r in responses)
+    assert stub_server.max_in_flight <= 2
+
+
+def test_get_all_reuses_sessions(stub_server, monkeypatch):
+    """Threads (and so their sessions) should be shared between calls"""
+    created = []
+    new_client = http_cache._new_client
+
+    def tracking_new_client(config):
+        created.append(config)
+        return new_client(config)
+    monkeypatch.setattr(http_cache, '_new_client', tracking_new_client)
+
+    for _ in range(3):
+        http_cache.get_all(
+            [stub_server.url('/{0}'.format(i)) for i in range(4)])
+    assert len(stub_server.paths) == 12
+    assert len(created) <= http_cache.POOL_SIZE
+
+
+def test_http_map_nested():
+    """Calls from within the pool shouldn't wait on the pool"""
+    def outer(i):
+        return http_cache.http_map(lambda j: i * j, range(3))
+    assert http_cache.http_map(outer, range(http_cache.POOL_SIZE * 2)) == [
+        [0, i, 2 * i] for i in range(http_cache.POOL_SIZE * 2)]
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+from mock import Mock
+
+from regparser.index import layer_cache
+from regparser.index.layer_cache import LayerCache
+from regparser.layer import engine
+from regparser.layer.internal_citations import InternalCitationParser
+from regparser.layer.paragraph_markers import ParagraphMarkers
+from regparser.tree.struct import Node
+from regparser.web.index.models import LayerCacheElement
+
+
+def example_tree():
+    return Node(label=['1111'], children=[
+        Node('(a) Some text', label=['1111', 'a']),
+        Node('(b) More text', label=['1111', 'b'])])
+
+
+@pytest.mark.django_db
+def test_cache_reused_across_instances():
+    """Elements computed once should be reused by later builds"""
+    expected = ParagraphMarkers(example_tree()).build()
+
+    cache = LayerCache()
+    assert ParagraphMarkers(example_tree()).build(cache) == expected
+    cache.save()
+    assert LayerCacheElement.objects.count() == 3   # includes "None"s
+
+    layer = ParagraphMarkers(example_tree())
+    layer.process = Mock()
+    cache = LayerCache()
+    assert layer.build(cache) == expected
+    assert not layer.process.called
+    assert cache.hits == 3
+
+
+@pytest.mark.django_db
+def test_cache_changed_nodes():
+    """Only modified nodes (and their ancestors) should be reprocessed"""
+    cache = LayerCache()
+    ParagraphMarkers(example_tree()).build(cache)
+    cache.save()
+
+    tree = example_tree()
+    tree.children[1].text = '(b) Changed text'
+    layer = ParagraphMarkers(tree)
+    processed = []
+
+    def process(node):
+        processed.append(node.label_id())
+        return ParagraphMarkers.process(layer, node)
+    layer.process = process
+    cache = LayerCache()
+    assert layer.build(cache) == ParagraphMarkers(example_tree()).build()
+    assert set(processed) == {'1111', '1111-b'}
+
+
+@pytest.mark.django_db
+def test_cache_opt_in():
+    """Layers which don't provide a cache key are always processed"""
+    layer = ParagraphMarkers(example_tree())
+    layer.cache_key = Mock(return_value=None)
+    cache = LayerCache()
+    layer.build(cache)
+    cache.save()
+    assert LayerCacheElement.objects.count() == 0
+    assert cache.hits == cache.misses == 0
+
+
+@pytest.mark.django_db
+def test_seed():
+    """Unchanged nodes should reuse the seeded elements"""
+    parent_tree = example_tree()
+    parent_elements = ParagraphMarkers(parent_tree).build()
+    cache = LayerCache()
+    cache.seed(ParagraphMarkers(parent_tree), parent_elements)
+
+    tree = example_tree()
+    tree.children[1].text = '(b) Changed text'
+    layer = ParagraphMarkers(tree)
+    processed = []
+
+    def process_derived(node, derived):
+        processed.append(node.label_id())
+        return ParagraphMarkers.process_derived(layer, node, derived)
+    layer.process_derived = process_derived
+    assert engine.build_layers([layer], cache) == [parent_elements]
+    assert set(processed) == {'1111', '1111-b'}
+    assert cache.hits == 1
+
+
+@pytest.mark.django_db
+def test_seed_context_changed():
+    """If a node's context changes (here, the citations which are valid), it
+    must be reprocessed even if the node itself is unchanged"""
+    parent_tree = Node(label=['1111'], children=[
+        Node(u'See § 1111.2', label=['1111', '1'])])
+    parent_layer = InternalCitationParser(parent_tree, cfr_title=12)
+    cache = LayerCache()
+    cache.seed(InternalCitationParser(parent_tree, cfr_title=12),
+               parent_layer.build())
+
+    tree = Node(label=['1111'], children=[
+        Node(u'See § 1111.2', label=['1111', '1']),
+        Node('Now it exists', label=['1111', '2'])])
+    expected = InternalCitationParser(tree, cfr_title=12).build()
+    assert expected
+    result = InternalCitationParser(tree, cfr_title=12).build(cache)
+    # Cached elements have been through JSON, converting tuples into lists
+    assert json.dumps(result) == json.dumps(expected)
+    assert cache.hits == 0
+
+
+@pytest.mark.django_db
+def test_cache_keyed_by_class_and_version(monkeypatch):
+    """Layers sharing a shorthand shouldn't share elements, nor should
+    elements survive a change in CACHE_VERSION"""
+    class Subclass(ParagraphMarkers):
+        pass
+
+    cache = LayerCache()
+    ParagraphMarkers(example_tree()).build(cache)
+    cache.save()
+
+    layer = Subclass(example_tree())
+    cache = LayerCache()
+    layer.build(cache)
+    assert cache.hits == 0
+    cache.save()
+
+    monkeypatch.setattr(layer_cache, 'CACHE_VERSION', 'other')
+    cache = LayerCache()
+    ParagraphMarkers(example_tree()).build(cache)
+    assert cache.hits == 0
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from mock import Mock
+
+from regparser.index import url_checks
+from regparser.web.index.models import CheckedUrl
+
+
+@pytest.mark.django_db
+def test_check_all():
+    """Both positive and negative results should be remembered"""
+    check_url = Mock(side_effect=lambda url: url == 'http://a')
+    assert url_checks.check_all(['http://a', 'http://b', 'http://a'],
+                                check_url) == {'http://a': True,
+                                               'http://b': False}
+    assert check_url.call_count == 2
+
+    assert url_checks.check_all(['http://a', 'http://b', 'http://c'],
+                                check_url) == {'http://a': True,
+                                               'http://b': False,
+                                               'http://c': False}
+    assert check_url.call_count == 3
+
+
+@pytest.mark.django_db
+def test_check_all_expired(settings):
+    """Results older than the TTL should be rechecked"""
+    settings.URL_CHECK_TTL = 60
+    CheckedUrl.objects.create(url='http://a', exists=False)
+    CheckedUrl.objects.filter(url='http://a').update(
+        checked=timezone.now() - timedelta(seconds=120))
+    check_url = Mock(return_value=True)
+
+    assert url_checks.check_all(['http://a'], check_url) == {'http://a': True}
+    assert CheckedUrl.objects.get(url='http://a').exists
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from regparser.layer import engine
+from regparser.layer.internal_citations import InternalCitationParser
+from regparser.layer.key_terms import KeyTerms
+from regparser.layer.layer import Layer
+from regparser.layer.paragraph_markers import ParagraphMarkers
+from regparser.tree.struct import Node
+
+
+def example_tree():
+    return Node(label=['1111'], title='Part 1111', children=[
+        Node(label=['1111', '1'], title=u'§ 1111.1 Stuff', children=[
+            Node('(a) See paragraph (b) of this section',
+                 label=['1111', '1', 'a']),
+            Node('(b) Key. Some text', label=['1111', '1', 'b'],
+                 tagged_text='(b) <E T="03">Key.</E> Some text'),
+        ]),
+        Node(label=['1111', '2'], children=[
+            Node('(a) Cross-ref to 1111.1(a)', label=['1111', '2', 'a'])]),
+    ])
+
+
+def layer_classes():
+    return [
+        ParagraphMarkers,
+        KeyTerms,
+        lambda tree: InternalCitationParser(tree, cfr_title=12),
+    ]
+
+
+def test_build_layers_matches_build():
+    """Building together should give the same results as building each layer
+    independently"""
+    expected = [cls(example_tree()).build() for cls in layer_classes()]
+    tree = example_tree()
+    results = engine.build_layers([cls(tree) for cls in layer_classes()])
+    assert results == expected
+    assert any(result for result in results)
+
+
+class CustomTraversal(Layer):
+    shorthand = 'custom'
+
+    def process(self, node):
+        return None
+
+    def build(self, cache=None):
+        return {'custom': True}
+
+
+def test_build_layers_nonfusible():
+    """Layers which customize `build` aren't fused but still get built, in
+    order"""
+    tree = example_tree()
+    markers = ParagraphMarkers(tree)
+    results = engine.build_layers([CustomTraversal(tree), markers])
+    assert results == [{'custom': True}, ParagraphMarkers(tree).build()]
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from mock import patch
+from mock import Mock, patch
 
 from regparser.layer.external_citations import ExternalCitationParser
 from regparser.tree.struct import Node
@@ -158,3 +158,18 @@ def test_urls():
         citation = get_citation(citations, url)
         assert citation['url'] == url
         assert citation['text'] == url
+
+
+def test_finders_skipped():
+    """Finders which can't match the text shouldn't be run at all"""
+    node = Node("Nothing to see here", label=['1005', '2'])
+    parser = ExternalCitationParser(None)
+    for finder in parser.finders:
+        finder.find = Mock(return_value=[])
+    assert parser.process(node) is None
+    assert not any(finder.find.called for finder in parser.finders)
+
+    node.text = "See 12 U.S.C. 345"
+    parser.process(node)
+    assert [finder.CITE_TYPE for finder in parser.finders
+            if finder.find.called] == ['USC']
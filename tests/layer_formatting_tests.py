@@ -407,6 +407,19 @@ def test_node_to_table_xml_els():
         assert result[0].attrib['unique'] == 'id'
 
 
+def test_cache_key():
+    """Only source XML containing tables should affect the key"""
+    layer = formatting.Formatting(None)
+    plain = layer.cache_key(Node(source_xml=etree.fromstring('<P>a</P>')))
+    assert plain == layer.cache_key(
+        Node(source_xml=etree.fromstring('<P>b</P>')))
+    assert plain != layer.cache_key(Node(tagged_text='a'))
+    table = '<P><GPOTABLE>{0}</GPOTABLE></P>'
+    assert layer.cache_key(Node(source_xml=etree.fromstring(
+        table.format('a')))) != layer.cache_key(
+            Node(source_xml=etree.fromstring(table.format('b'))))
+
+
 class FencedTests(TestCase):
     def test_process(self):
         text = "Content content\n```abc def\nLine 1\nLine 2\n```"
@@ -1,7 +1,9 @@
 from unittest import TestCase
 
-from mock import patch
+import pytest
+from mock import Mock, patch
 
+from regparser.layer import graphics
 from regparser.layer.graphics import Graphics, gid_to_url
 from regparser.test_utils.http_mixin import HttpMixin
 from regparser.tree.struct import Node
@@ -114,3 +116,32 @@ class LayerGraphicsTest(HttpMixin, TestCase):
 
         self.assertEqual(gid_to_url('ABCD123'),
                          'http://example.com/abcd123.png')
+
+
+@pytest.mark.django_db
+def test_pre_process(monkeypatch):
+    """The urls should be checked up front, stopping at the first candidate
+    which exists, and remembered for subsequent builds"""
+    monkeypatch.setattr(settings, 'DEFAULT_IMAGE_URL',
+                        'http://example.com/%s.gif')
+    exists = {'http://example.com/abcd.gif',
+              'http://example.com/abcd.thumb.gif',
+              'http://example.com/XXX.png'}
+    check_url = Mock(side_effect=lambda url: url in exists)
+    monkeypatch.setattr(graphics, 'check_url', check_url)
+    tree = Node(label=['1'], children=[
+        Node("![ex](ABCD)", label=['1', 'a']),
+        Node("![ex](XXX)", label=['1', 'b'])])
+
+    result = graphics.Graphics(tree).build()
+    urls = sorted((el['url'], el.get('thumb_url'))
+                  for elements in result.values() for el in elements)
+    assert urls == [('http://example.com/XXX.png', None),
+                    ('http://example.com/abcd.gif',
+                     'http://example.com/abcd.thumb.gif')]
+    call_count = check_url.call_count
+    # Candidates until one is found (2 and 3, respectively), then thumbnails
+    assert call_count == 7
+
+    assert graphics.Graphics(tree).build() == result
+    assert check_url.call_count == call_count
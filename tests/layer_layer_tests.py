@@ -0,0 +1,22 @@
+from regparser.layer.layer import Layer, SearchReplace
+
+
+def test_convert_to_search_replace():
+    """Offsets should be converted into the indexes of matching instances of
+    each text, grouped and sorted by text"""
+    text = 'abc abc def abc def abcabc'
+    matches = [(4, 7), (12, 15), (8, 11), (23, 26)]
+    results = list(Layer.convert_to_search_replace(
+        matches, text, start_fn=lambda m: m[0], end_fn=lambda m: m[1]))
+    assert results == [
+        SearchReplace('abc', [1, 2, 4], representative=(4, 7)),
+        SearchReplace('def', [0], representative=(8, 11)),
+    ]
+
+
+def test_convert_to_search_replace_overlapping():
+    """Instances of the text may overlap"""
+    text = 'aaaa'
+    results = list(Layer.convert_to_search_replace(
+        [(2, 4)], text, start_fn=lambda m: m[0], end_fn=lambda m: m[1]))
+    assert results == [SearchReplace('aa', [2], representative=(2, 4))]
@@ -0,0 +1,50 @@
+from collections import namedtuple
+
+from mock import Mock
+
+from regparser import plugins
+
+FakeExtension = namedtuple('FakeExtension', ['name', 'plugin'])
+
+
+def test_extensions_cached(monkeypatch):
+    """Entry points should only be scanned once per namespace, until
+    reloaded"""
+    manager = Mock(return_value=[FakeExtension('a', 1)])
+    monkeypatch.setattr(plugins, 'ExtensionManager', manager)
+    monkeypatch.setattr(plugins, '_registry', {})
+
+    assert plugins.extensions('ns') == (FakeExtension('a', 1),)
+    assert plugins.instantiate_if_possible('ns') == [1]
+    assert manager.call_count == 1
+    plugins.extensions('other-ns')
+    assert manager.call_count == 2
+
+    plugins.reload('ns')
+    plugins.extensions('ns')
+    plugins.extensions('other-ns')
+    assert manager.call_count == 3
+    plugins.reload()
+    plugins.extensions('other-ns')
+    assert manager.call_count == 4
+
+
+def test_instantiate_if_possible(monkeypatch):
+    """Classes should be instantiated (each call) and sorted"""
+    class Later(object):
+        plugin_order = 1
+
+        def transform(self):
+            pass
+
+    def earlier():
+        pass
+    monkeypatch.setattr(plugins, '_registry', {'ns': (
+        FakeExtension('later', Later), FakeExtension('earlier', earlier))})
+
+    first = plugins.instantiate_if_possible('ns')
+    assert first[0] is earlier
+    assert isinstance(first[1], Later)
+    assert plugins.instantiate_if_possible('ns')[1] is not first[1]
+    transforms = plugins.instantiate_if_possible('ns', 'transform')
+    assert {fn.__name__ for fn in transforms} == {'earlier', 'transform'}
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import pytest
+from lxml import etree
+
+from regparser.tree import columnar
+from regparser.tree.struct import Node
+
+
+@pytest.fixture
+def tree():
+    return Node('Root text', label=['1111'], title='Part 1111', children=[
+        Node('Section 1', label=['1111', '1'], children=[
+            Node(u'(a) Unicode §', label=['1111', '1', 'a'],
+                 tagged_text=u'(a) <E>Unicode</E> §'),
+            Node('(b) XML', label=['1111', '1', 'b'],
+                 source_xml=etree.fromstring('<P>(b) XML</P>'))]),
+        Node('Appendix', label=['1111', 'A'], node_type=Node.APPENDIX)])
+
+
+def test_round_trip(tree):
+    encoded = columnar.encode(tree)
+    assert columnar.is_columnar(encoded)
+    result = columnar.ColumnarTree(encoded).node()
+    assert result == tree
+    assert result.title == 'Part 1111'
+    assert result.children[0].children[0].tagged_text == \
+        u'(a) <E>Unicode</E> §'
+    assert result.children[0].children[1].source_xml.tag == 'P'
+    assert result.children[1].node_type == Node.APPENDIX
+
+
+def test_find(tree):
+    """We can decode a single subtree"""
+    lazy = columnar.ColumnarTree(memoryview(columnar.encode(tree)))
+    assert len(lazy) == 5
+    assert lazy.find('1111-1') == tree.children[0]
+    assert lazy.find('1111-1-b', include_source_xml=False).source_xml is None
+    assert lazy.find('1111-2') is None
+    assert lazy.child_label_ids() == ['1111-1', '1111-A']
+    assert lazy.child_label_ids(lazy.index_of('1111-1')) == [
+        '1111-1-a', '1111-1-b']
+
+
+def test_not_columnar():
+    assert not columnar.is_columnar(b'{"text": ""}')
+    with pytest.raises(ValueError):
+        columnar.ColumnarTree(b'{"text": "", "label": []}')
@@ -1,5 +1,8 @@
+import json
 from unittest import TestCase
 
+from lxml import etree
+
 from regparser.tree import struct
 from regparser.tree.depth.markers import MARKERLESS
 
@@ -41,6 +44,30 @@ class NodeTest(TestCase):
         self.assertTrue(struct.Node("", label=['111', '22']).is_section())
         self.assertTrue(struct.Node("", label=['111', '22a']).is_section())
 
+    def test_eq(self):
+        """Equality considers the same fields as repr, including children"""
+        def build(child_text='c'):
+            return struct.Node('t', label=['1', '2'], title='T', children=[
+                struct.Node(child_text, label=['1', '2', 'a'])])
+
+        self.assertEqual(build(), build())
+        self.assertNotEqual(build(), build('d'))
+        self.assertNotEqual(build(), struct.Node('t', label=['1', '2']))
+        self.assertFalse(build() == 'not a node')
+        self.assertTrue(build() != 'not a node')
+        # tagged_text and source_xml aren't part of the comparison
+        self.assertEqual(struct.Node('t', tagged_text='<E>t</E>'),
+                         struct.Node('t'))
+
+    def test_lt(self):
+        """Ordering is field-wise, starting with text and then children"""
+        nodes = [struct.Node('b'),
+                 struct.Node('a', children=[struct.Node('z')]),
+                 struct.Node('a', children=[struct.Node('y')]),
+                 struct.Node('a', title='Title')]
+        self.assertEqual(sorted(nodes),
+                         [nodes[3], nodes[2], nodes[1], nodes[0]])
+
 
 class DepthTreeTest(TestCase):
     def test_walk(self):
@@ -167,6 +194,30 @@ class DepthTreeTest(TestCase):
             ])
         ])
 
+    def test_treeify_duplicate_roots(self):
+        """Roots with the same label are merged; descendants are attached to
+        the first of them"""
+        result = struct.treeify([
+            struct.Node('first', label=['1'], children=[1]),
+            struct.Node(label=['2']),
+            struct.Node('second', label=['1'], children=[2]),
+            struct.Node(label=['1', 'a']),
+        ])
+        self.assertEqual(result, [
+            struct.Node('first', label=['1'], children=[
+                1, 2, struct.Node(label=['1', 'a'])]),
+            struct.Node(label=['2']),
+        ])
+
+    def test_merge_duplicates(self):
+        nodes = [struct.Node(label=['1'], children=['a']),
+                 struct.Node(label=['2'], children=['b']),
+                 struct.Node(label=['1'], children=['c']),
+                 struct.Node(label=['1'], children=['d'])]
+        self.assertEqual(struct.merge_duplicates(nodes), [
+            struct.Node(label=['1'], children=['a', 'c', 'd']),
+            struct.Node(label=['2'], children=['b'])])
+
 
 class FrozenNodeTests(TestCase):
     def test_comparison(self):
@@ -253,3 +304,44 @@ class NodeTests(TestCase):
         self.assertTrue(struct.Node.is_markerless_label(['134', 'p33']))
         self.assertFalse(struct.Node.is_markerless_label(['245', '23']))
         self.assertTrue(struct.Node.is_markerless_label(['245', MARKERLESS]))
+
+
+class NodeDictTests(TestCase):
+    def example_tree(self):
+        return struct.Node('root', label=['1'], children=[
+            struct.Node('a', label=['1', 'a'], title='A Title', children=[
+                struct.Node('a-1', label=['1', 'a', '1'],
+                            source_xml=etree.fromstring('<P>a-1</P>'))]),
+            struct.Node('b', label=['1', 'b'], tagged_text='<E>b</E>')])
+
+    def test_full_node_to_dict(self):
+        """Should produce the same structure as FullNodeEncoder"""
+        tree = self.example_tree()
+        expected = json.loads(json.dumps(tree, cls=struct.FullNodeEncoder))
+        self.assertEqual(struct.full_node_to_dict(tree), expected)
+
+        without_xml = struct.full_node_to_dict(tree, include_source_xml=False)
+        child = without_xml['children'][0]['children'][0]
+        self.assertIsNone(child['source_xml'])
+
+    def test_full_node_from_dict(self):
+        """Round trip. The XML is only parsed when accessed"""
+        tree = self.example_tree()
+        result = struct.full_node_from_dict(struct.full_node_to_dict(tree))
+        self.assertEqual(result, tree)
+        self.assertEqual(result.children[1].tagged_text, '<E>b</E>')
+
+        child = result.children[0].children[0]
+        self.assertEqual(child.source_xml_as_text(), '<P>a-1</P>')
+        self.assertIsNone(child._source_xml)
+        self.assertEqual(child.source_xml.text, 'a-1')
+
+        result = struct.full_node_from_dict(struct.full_node_to_dict(tree),
+                                            include_source_xml=False)
+        self.assertIsNone(result.children[0].children[0].source_xml)
+
+    def test_frozen_node_from_dict(self):
+        tree = self.example_tree()
+        result = struct.frozen_node_from_dict(struct.full_node_to_dict(tree))
+        self.assertEqual(result, struct.FrozenNode.from_node(tree))
+        self.assertEqual(result.child_labels, ('1-a', '1-b'))